@@ -0,0 +1,92 @@
+// Shared map generator (WireProtocol.SEEDED).
+// Mirror of server/game/map_generator.py : SharedMapGenerator.
+// Server sends `g;{seed};{item}:{weight},...` once, and `r` round frames after that.
+// Pad generates the map of each round by itself.
+//
+// Test vector :
+//   seed 1200724404 (derive_seed(12345, 0)), weights 0:50,1:15,2:5,4:20,5:10
+//   round 1 -> 4 5 1 5 0 5 5 0 5
+#ifndef MAP_GENERATOR_H
+#define MAP_GENERATOR_H
+
+#include <stdint.h>
+#include <string.h>
+#include <stdlib.h>
+
+const uint8_t MAP_SIZE = 9;
+const uint8_t MAX_ITEMS = 8;
+const uint32_t GOLDEN_GAMMA = 0x9E3779B9UL;
+const uint32_t ZERO_STATE_REPLACEMENT = 0x6D2B79F5UL;
+
+struct MapGenerator {
+  uint32_t seed;
+  uint8_t itemCount;
+  uint8_t items[MAX_ITEMS];
+  uint16_t cumulativeWeights[MAX_ITEMS];
+};
+
+uint32_t mix32(uint32_t x) {
+  x ^= x >> 16;
+  x *= 0x85EBCA6BUL;
+  x ^= x >> 13;
+  x *= 0xC2B2AE35UL;
+  x ^= x >> 16;
+  return x;
+}
+
+// Parse seed data without prefix : "{seed};{item}:{weight},..."
+// `data` is modified by strtok.
+bool setupMapGenerator(MapGenerator &generator, char *data) {
+  char *seedToken = strtok(data, ";");
+  char *weightsToken = strtok(NULL, ";");
+  if (seedToken == NULL || weightsToken == NULL) {
+    return false;
+  }
+  generator.seed = strtoul(seedToken, NULL, 10);
+  generator.itemCount = 0;
+  uint16_t total = 0;
+  char *pair = strtok(weightsToken, ",");
+  while (pair != NULL && generator.itemCount < MAX_ITEMS) {
+    char *sep = strchr(pair, ':');
+    if (sep == NULL) {
+      return false;
+    }
+    *sep = '\0';
+    total += (uint16_t) atoi(sep + 1);
+    generator.items[generator.itemCount] = (uint8_t) atoi(pair);
+    generator.cumulativeWeights[generator.itemCount] = total;
+    generator.itemCount++;
+    pair = strtok(NULL, ",");
+  }
+  return generator.itemCount > 0 && total > 0;
+}
+
+void generateMap(const MapGenerator &generator, uint32_t roundNumber, uint8_t mapData[MAP_SIZE]) {
+  uint32_t state = mix32(generator.seed ^ (roundNumber * GOLDEN_GAMMA));
+  if (state == 0) {
+    state = ZERO_STATE_REPLACEMENT;
+  }
+  uint16_t total = generator.cumulativeWeights[generator.itemCount - 1];
+  for (uint8_t i = 0; i < MAP_SIZE; i++) {
+    state ^= state << 13;
+    state ^= state >> 17;
+    state ^= state << 5;
+    uint16_t slot = state % total;
+    uint8_t item = 0;
+    while (generator.cumulativeWeights[item] <= slot) {
+      item++;
+    }
+    mapData[i] = generator.items[item];
+  }
+}
+
+// Decode binary round frame (header 0xF2 and 2 payload bytes, without line terminator).
+bool decodeRoundFrame(const uint8_t *frame, uint8_t length, uint32_t &roundNumber) {
+  if (length != 3 || frame[0] != 0xF2 || !(frame[1] & 0x80) || !(frame[2] & 0x80)) {
+    return false;
+  }
+  roundNumber = (uint32_t) (frame[1] & 0x7F) | ((uint32_t) (frame[2] & 0x7F) << 7);
+  return true;
+}
+
+#endif
@@ -1,10 +1,26 @@
 import sys
 from log import init_logger, DEBUG
-from server import game, ui
 
-logger = init_logger('wam', DEBUG)
-ui_controller = ui.UIController(logger)
-game_manager = game.GameManager(logger, ui=ui_controller)
-app = ui.WamApp(ui_controller=ui_controller)
+# Everything is created under the main guard : sharded sessions spawn worker processes which import this module,
+# and workers must not import UI (kivy) or connect to pads.
 if __name__ == '__main__':
-    app.run()
+    from server import game, ui
+    logger = init_logger('wam', DEBUG)
+    ui_controller = ui.UIController(logger)
+    if '--split' in sys.argv:
+        # Game engine runs in its own process, and UI reads game state from shared memory.
+        from server.game.engine import EngineProcess
+        game_manager = EngineProcess(logger)
+        game_manager.start()
+        ui_controller.bind_game_manager(game_manager)
+    else:
+        game_manager = game.GameManager(logger, ui=ui_controller)
+        if '--capture' in sys.argv:
+            # Raw serial I/O of every pad is recorded into a ring file. (server/game/capture.py)
+            game_manager.start_capture()
+    app = ui.WamApp(ui_controller=ui_controller)
+    try:
+        app.run()
+    finally:
+        if '--split' in sys.argv:
+            game_manager.close()
@@ -1,3 +1,4 @@
 from .game_object import *
-from .game_data import GameClientData, GameServerData
+from .game_data import GameClientData, GameServerData, GameServerDeltaData, GameSeedData, GameRoundData
+from .snapshot import GameSnapshot
 from .game import GameManager
@@ -0,0 +1,334 @@
+"""
+Shared memory state bridge between game engine process and UI process.
+
+Engine process writes GameSnapshots of its sessions and log texts into a `multiprocessing.shared_memory` block,
+and UI process reads them in place, without pipes or pickling. Each session slot is guarded by a seqlock :
+writer makes the slot's sequence odd while writing and even when done, and reader retries a copy
+whose sequence was odd or changed. Logs are kept in a ring of fixed size entries, each guarded the same way.
+
+Layout (little endian) :
+    header      : magic, version, sessionSlots, players, mapSize, ringSize, eventCount, runningSessions,
+                  handledCommands
+    session slot: sequence, round, timestamp, tickStart, flags, finishCode, winner, loser, count, mapSize,
+                  names (NAME_SIZE bytes each), hp (int32 each), alive, blocked, maps
+    ring entry  : stamp, length, text (EVENT_TEXT_SIZE bytes)
+"""
+from __future__ import annotations
+
+import logging
+import struct
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from typing import Final, Hashable, Optional
+
+from .events import GameEvent, GameEventType
+from .snapshot import GameSnapshot
+
+__all__ = (
+    'NAME_SIZE', 'EVENT_TEXT_SIZE', 'RING_SIZE', 'SESSION_SLOTS',
+    'StateBridge'
+)
+
+MAGIC: Final[bytes] = b'WAMB'
+VERSION: Final[int] = 1
+NAME_SIZE: Final[int] = 32          # bytes of a player name. Longer names are cut.
+EVENT_TEXT_SIZE: Final[int] = 250   # bytes of a log text. Longer texts are cut.
+RING_SIZE: Final[int] = 256         # log texts kept until UI reads them.
+SESSION_SLOTS: Final[int] = 8       # sessions shown at once.
+PLAYERS: Final[int] = 8          # players shown per session. N-player sessions fit up to this many.
+MAP_SIZE: Final[int] = 9
+SPIN_LIMIT: Final[int] = 1000       # retries of a torn read before giving up until next frame.
+
+logger = logging.getLogger('wam.bridge')
+
+# magic, version, sessionSlots, players, mapSize, ringSize, eventCount, runningSessions, handledCommands
+_HEADER: Final[struct.Struct] = struct.Struct('<4sHHBBHIII')
+# sequence, round, timestamp, tickStart, flags, finishCode, winner, loser, count, mapSize
+_SLOT: Final[struct.Struct] = struct.Struct('<IIddBbbbBB2x')
+# stamp, length
+_ENTRY: Final[struct.Struct] = struct.Struct('<IH')
+_EVENT_COUNT_OFFSET: Final[int] = struct.calcsize('<4sHHBBH')
+_RUNNING_OFFSET: Final[int] = _EVENT_COUNT_OFFSET + 4
+_COMMANDS_OFFSET: Final[int] = _RUNNING_OFFSET + 4
+
+FLAG_ACTIVE: Final[int] = 1
+FLAG_FINISHED: Final[int] = 2
+NO_CODE: Final[int] = -128          # finishCode is None.
+NO_PLAYER: Final[int] = -1
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class StateBridge:
+    """
+    Shared memory block of the bridge. UI process creates it, and engine process attaches to it by name.
+    Writer methods (publish, push_log, set_running) are used by a single thread of engine process,
+    and reader methods (read, drain) by UI thread.
+    """
+
+    @classmethod
+    def create(
+            cls,
+            sessionSlots: int = SESSION_SLOTS,
+            players: int = PLAYERS,
+            mapSize: int = MAP_SIZE,
+            ringSize: int = RING_SIZE
+    ) -> StateBridge:
+        slotSize = _align(_SLOT.size + players * (NAME_SIZE + 4 + 2) + players * mapSize)
+        entrySize = _align(_ENTRY.size + EVENT_TEXT_SIZE)
+        size = _align(_HEADER.size) + sessionSlots * slotSize + ringSize * entrySize
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        _HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, sessionSlots, players, mapSize, ringSize, 0, 0, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> StateBridge:
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool = False):
+        magic, version, sessionSlots, players, mapSize, ringSize, _, _, _ = _HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Shared memory {shm.name} is not a StateBridge (version {VERSION})')
+        self.shm = shm
+        self.owner = owner
+        self.sessionSlots = sessionSlots
+        self.players = players
+        self.mapSize = mapSize
+        self.ringSize = ringSize
+        self.slotSize = _align(_SLOT.size + players * (NAME_SIZE + 4 + 2) + players * mapSize)
+        self.entrySize = _align(_ENTRY.size + EVENT_TEXT_SIZE)
+        self.slotsOffset = _align(_HEADER.size)
+        self.ringOffset = self.slotsOffset + sessionSlots * self.slotSize
+        self._buf = shm.buf
+        # Writer state
+        self._slotBySource: dict[Hashable, int] = {}
+        # Slot freed longest ago is reused first, so that UI reads the result of a finished session before reuse.
+        self._freeSlots: deque[int] = deque(range(sessionSlots))
+        self._refused: set[Hashable] = set()   # sources which found every slot held. Logged once.
+        self._eventCount = 0
+        # Reader state
+        self._seenSequences = [0] * sessionSlots
+        self._seenFinished = [False] * sessionSlots
+        self._eventCursor = 0
+        self.lostEvents = 0
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def runningSessions(self) -> int:
+        return struct.unpack_from('<I', self._buf, _RUNNING_OFFSET)[0]
+
+    @property
+    def handledCommands(self) -> int:
+        """
+        Number of commands engine process has handled. UI compares it with commands it sent.
+        """
+        return struct.unpack_from('<I', self._buf, _COMMANDS_OFFSET)[0]
+
+    def close(self):
+        """
+        Detach from shared memory. Owner also removes the block.
+        """
+        self._buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # Writer
+    def _slot_of(self, source: Hashable) -> Optional[int]:
+        slot = self._slotBySource.get(source)
+        if slot is not None:
+            return slot
+        if not self._freeSlots:
+            # Slots of running sessions are never taken over : two writers on a slot would break its seqlock.
+            if source not in self._refused:
+                self._refused.add(source)
+                logger.warning(f'StateBridge >>> Every session slot is held by a running session. Session {source} is not shown.')
+            return None
+        slot = self._freeSlots.popleft()
+        self._refused.discard(source)
+        self._slotBySource[source] = slot
+        return slot
+
+    def release(self, source: Hashable):
+        """
+        Free the slot of a source. Called when its session finished.
+        """
+        slot = self._slotBySource.pop(source, None)
+        if slot is not None:
+            self._freeSlots.append(slot)
+        self._refused.discard(source)
+
+    def publish(self, snapshot: GameSnapshot, source: Hashable = None) -> bool:
+        """
+        Write snapshot of a session into its slot. Slot is freed once a finished snapshot is written.
+        :param snapshot: GameSnapshot to write.
+        :param source: session which published the snapshot. Each running source gets its own slot.
+        :return: False if every slot is held by other running sessions, and snapshot was not written.
+        """
+        slot = self._slot_of(source)
+        if slot is None:
+            if snapshot.finished:
+                self.release(source)
+            return False
+        buf = self._buf
+        offset = self.slotsOffset + slot * self.slotSize
+        players = self.players
+        mapSize = self.mapSize
+        count = min(snapshot.count, players)
+        sequence = struct.unpack_from('<I', buf, offset)[0]
+        struct.pack_into('<I', buf, offset, (sequence + 1) & 0xFFFFFFFF)     # odd : writing.
+
+        names = snapshot.names
+        flags = FLAG_ACTIVE | (FLAG_FINISHED if snapshot.finished else 0)
+        _SLOT.pack_into(
+            buf, offset,
+            (sequence + 1) & 0xFFFFFFFF, snapshot.round & 0xFFFFFFFF, snapshot.timestamp, snapshot.tickStart,
+            flags,
+            NO_CODE if snapshot.finishCode is None else snapshot.finishCode,
+            names.index(snapshot.winner) if snapshot.winner in names else NO_PLAYER,
+            names.index(snapshot.loser) if snapshot.loser in names else NO_PLAYER,
+            count, snapshot.mapSize
+        )
+        position = offset + _SLOT.size
+        for slot in range(players):
+            name = names[slot].encode('utf-8')[:NAME_SIZE] if slot < count else b''
+            buf[position:position + NAME_SIZE] = name.ljust(NAME_SIZE, b'\0')
+            position += NAME_SIZE
+        struct.pack_into(f'<{count}i', buf, position, *snapshot.hp[:count])
+        position += players * 4
+        buf[position:position + count] = snapshot.alive[:count]
+        position += players
+        buf[position:position + count] = snapshot.blocked[:count]
+        position += players
+        mapBytes = min(count * snapshot.mapSize, players * mapSize)
+        buf[position:position + mapBytes] = snapshot.maps[:mapBytes]
+
+        struct.pack_into('<I', buf, offset, (sequence + 2) & 0xFFFFFFFF)     # even : done.
+        if snapshot.finished:
+            self.release(source)
+        return True
+
+    def push_log(self, text: str):
+        """
+        Append log text into the ring. Oldest text is overwritten when the ring is full.
+        """
+        number = self._eventCount
+        offset = self.ringOffset + (number % self.ringSize) * self.entrySize
+        data = text.encode('utf-8')[:EVENT_TEXT_SIZE]
+        buf = self._buf
+        _ENTRY.pack_into(buf, offset, (2 * number + 1) & 0xFFFFFFFF, len(data))
+        buf[offset + _ENTRY.size:offset + _ENTRY.size + len(data)] = data
+        _ENTRY.pack_into(buf, offset, (2 * number + 2) & 0xFFFFFFFF, len(data))
+        self._eventCount = number + 1
+        struct.pack_into('<I', buf, _EVENT_COUNT_OFFSET, self._eventCount & 0xFFFFFFFF)
+
+    def set_running(self, runningSessions: int):
+        struct.pack_into('<I', self._buf, _RUNNING_OFFSET, runningSessions)
+
+    def set_handled_commands(self, count: int):
+        struct.pack_into('<I', self._buf, _COMMANDS_OFFSET, count & 0xFFFFFFFF)
+
+    # Reader
+    def _read_slot(self, slot: int) -> Optional[tuple[int, bytes]]:
+        buf = self._buf
+        offset = self.slotsOffset + slot * self.slotSize
+        for _ in range(SPIN_LIMIT):
+            before = struct.unpack_from('<I', buf, offset)[0]
+            if before & 1:
+                time.sleep(0)
+                continue
+            data = bytes(buf[offset:offset + self.slotSize])
+            if struct.unpack_from('<I', buf, offset)[0] == before:
+                return before, data
+        return None
+
+    def read(self, slot: int) -> Optional[GameSnapshot]:
+        """
+        Read snapshot of the slot.
+        :param slot: session slot.
+        :return: GameSnapshot, or None if slot was never written or writer kept it busy.
+        """
+        result = self._read_slot(slot)
+        if result is None:
+            return None
+        return self._decode(result[1])
+
+    def _decode(self, data: bytes) -> Optional[GameSnapshot]:
+        (
+            _, roundNumber, timestamp, tickStart, flags, finishCode, winner, loser, count, mapSize
+        ) = _SLOT.unpack_from(data, 0)
+        if not flags & FLAG_ACTIVE:
+            return None
+        players = self.players
+        position = _SLOT.size
+        names = tuple(
+            data[position + i * NAME_SIZE:position + (i + 1) * NAME_SIZE].rstrip(b'\0').decode('utf-8', 'replace')
+            for i in range(count)
+        )
+        position += players * NAME_SIZE
+        hp = struct.unpack_from(f'<{count}i', data, position)
+        position += players * 4
+        alive = data[position:position + count]
+        position += players
+        blocked = data[position:position + count]
+        position += players
+        maps = data[position:position + count * mapSize]
+        return GameSnapshot(
+            round=roundNumber, timestamp=timestamp, tickStart=tickStart,
+            names=names, hp=hp, alive=alive, maps=maps, mapSize=mapSize, blocked=blocked,
+            finished=bool(flags & FLAG_FINISHED),
+            finishCode=None if finishCode == NO_CODE else finishCode,
+            winner=names[winner] if 0 <= winner < count else None,
+            loser=names[loser] if 0 <= loser < count else None
+        )
+
+    def drain(self) -> list[GameEvent]:
+        """
+        Read what changed since last call, as GameEvents. Same interface as EventQueue.drain(),
+        so that UI can drain the bridge instead of GameManager.events. Event source is the session slot.
+        :return: log events, then screen or result event of each changed slot.
+        """
+        events = []
+        buf = self._buf
+        eventCount = struct.unpack_from('<I', buf, _EVENT_COUNT_OFFSET)[0]
+        cursor = self._eventCursor
+        if eventCount - cursor > self.ringSize:
+            self.lostEvents += eventCount - cursor - self.ringSize
+            cursor = eventCount - self.ringSize
+        while cursor < eventCount:
+            offset = self.ringOffset + (cursor % self.ringSize) * self.entrySize
+            stamp, length = _ENTRY.unpack_from(buf, offset)
+            data = bytes(buf[offset + _ENTRY.size:offset + _ENTRY.size + length])
+            if stamp == 2 * cursor + 2 and _ENTRY.unpack_from(buf, offset)[0] == stamp:
+                events.append(GameEvent(GameEventType.LOG, data.decode('utf-8', 'replace')))
+            else:
+                self.lostEvents += 1   # overwritten by writer while reading.
+            cursor += 1
+        self._eventCursor = cursor
+
+        for slot in range(self.sessionSlots):
+            sequence = struct.unpack_from('<I', buf, self.slotsOffset + slot * self.slotSize)[0]
+            if sequence == self._seenSequences[slot]:
+                continue
+            result = self._read_slot(slot)
+            if result is None:
+                continue
+            self._seenSequences[slot] = result[0]
+            snapshot = self._decode(result[1])
+            if snapshot is None:
+                continue
+            if snapshot.finished:
+                if not self._seenFinished[slot]:
+                    self._seenFinished[slot] = True
+                    events.append(GameEvent(GameEventType.RESULT, snapshot, slot))
+            else:
+                self._seenFinished[slot] = False
+                events.append(GameEvent(GameEventType.SCREEN, snapshot, slot))
+        return events
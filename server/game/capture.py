@@ -0,0 +1,157 @@
+"""
+Raw serial capture, for debugging wire-level problems of pads.
+Every chunk read from or written to a captured SerialDevice is stamped with time.monotonic_ns()
+and copied into a memory-mapped ring file. Recording a chunk costs a struct pack and a memcpy, without lock or syscall,
+so capture can stay on during an event. Oldest chunks are overwritten when the ring is full.
+
+Capture file layout (little endian) :
+    header  : magic (4s), version (H), slot size (H), slots (I), ports (B), then PORT_SLOTS port names (PORT_NAME_SIZE each)
+    slots   : sequence (Q), timestamp (Q, monotonic_ns), direction (B), port (B), length (H), data
+A chunk longer than one slot is split into consecutive slots. Sequence is written last, and 0 means the slot is empty.
+
+Captures are analyzed offline with `python -m server.game.capture_analysis <capture file>`.
+"""
+from __future__ import annotations
+
+import itertools
+import mmap
+import struct
+import time
+from typing import Final, NamedTuple
+
+__all__ = (
+    'CAPTURE_PATH', 'CAPTURE_SIZE', 'SLOT_SIZE',
+    'DIRECTION_RX', 'DIRECTION_TX',
+    'CapturedChunk',
+    'SerialCapture',
+    'read_capture'
+)
+
+CAPTURE_PATH: Final[str] = 'serial_capture.wamc'
+CAPTURE_SIZE: Final[int] = 16 * 1024 * 1024    # bytes of the ring file.
+SLOT_SIZE: Final[int] = 64
+PORT_SLOTS: Final[int] = 64
+PORT_NAME_SIZE: Final[int] = 64
+MAGIC: Final[bytes] = b'WAMC'
+VERSION: Final[int] = 1
+
+DIRECTION_RX: Final[int] = 0    # pad -> server
+DIRECTION_TX: Final[int] = 1    # server -> pad
+
+_HEADER: Final[struct.Struct] = struct.Struct('<4sHHIB')
+_SLOT: Final[struct.Struct] = struct.Struct('<QQBBH')
+_PORTS_OFFSET: Final[int] = _HEADER.size
+_SLOTS_OFFSET: Final[int] = _PORTS_OFFSET + PORT_SLOTS * PORT_NAME_SIZE
+_SEQUENCE: Final[struct.Struct] = struct.Struct('<Q')
+_SLOT_BODY: Final[struct.Struct] = struct.Struct('<QBBH')   # slot without sequence.
+
+
+class CapturedChunk(NamedTuple):
+    sequence: int
+    timestamp: int      # monotonic_ns
+    direction: int
+    port: str
+    data: bytes
+
+
+class SerialCapture:
+    """
+    Ring-buffered capture file shared by devices. (SerialDevice.start_capture)
+    Reader threads and game threads record into distinct slots, claimed from an atomic counter.
+    """
+
+    def __init__(self, path: str = CAPTURE_PATH, size: int = CAPTURE_SIZE, slotSize: int = SLOT_SIZE):
+        self.path = path
+        self.slotSize = slotSize
+        self.slots = max(1, (size - _SLOTS_OFFSET) // slotSize)
+        self.dataSize = slotSize - _SLOT.size
+        with open(path, 'w+b') as file:
+            file.truncate(_SLOTS_OFFSET + self.slots * slotSize)
+            self._mmap = mmap.mmap(file.fileno(), 0)
+        _HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, slotSize, self.slots, 0)
+        self._ports: dict[str, int] = {}
+        self._sequence = itertools.count(1)     # next() of itertools.count is atomic under GIL.
+
+    def register(self, port: str) -> int:
+        """
+        Get id of the port, registering its name in the file header.
+        """
+        portId = self._ports.get(port)
+        if portId is not None:
+            return portId
+        portId = len(self._ports)
+        if portId >= PORT_SLOTS:
+            raise ValueError(f'SerialCapture can capture up to {PORT_SLOTS} ports')
+        name = port.encode('utf-8')[:PORT_NAME_SIZE]
+        offset = _PORTS_OFFSET + portId * PORT_NAME_SIZE
+        self._mmap[offset:offset + PORT_NAME_SIZE] = name.ljust(PORT_NAME_SIZE, b'\0')
+        self._ports[port] = portId
+        _HEADER.pack_into(self._mmap, 0, MAGIC, VERSION, self.slotSize, self.slots, len(self._ports))
+        return portId
+
+    def record(self, direction: int, portId: int, data: bytes):
+        """
+        Copy a chunk into the ring. Called from serial I/O paths, so it never blocks.
+        """
+        timestamp = time.monotonic_ns()
+        buffer = self._mmap
+        dataSize = self.dataSize
+        try:
+            for start in range(0, max(1, len(data)), dataSize):
+                part = data[start:start + dataSize]
+                sequence = next(self._sequence)
+                offset = _SLOTS_OFFSET + (sequence % self.slots) * self.slotSize
+                _SEQUENCE.pack_into(buffer, offset, 0)     # empty while writing.
+                _SLOT_BODY.pack_into(buffer, offset + 8, timestamp, direction, portId, len(part))
+                buffer[offset + _SLOT.size:offset + _SLOT.size + len(part)] = part
+                _SEQUENCE.pack_into(buffer, offset, sequence)
+        except ValueError:
+            pass    # capture was closed by another thread. I/O must not fail because of capture.
+
+    def flush(self):
+        self._mmap.flush()
+
+    def close(self):
+        if not self._mmap.closed:
+            self._mmap.flush()
+            self._mmap.close()
+
+
+def read_capture(path: str) -> list[CapturedChunk]:
+    """
+    Read every chunk left in a capture file, oldest first. Chunks split into several slots are joined.
+    """
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        magic, version, slotSize, slots, portCount = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a serial capture')
+        if version != VERSION:
+            raise ValueError(f'Unsupported capture version : {version}')
+        ports = []
+        for portId in range(portCount):
+            offset = _PORTS_OFFSET + portId * PORT_NAME_SIZE
+            ports.append(bytes(buffer[offset:offset + PORT_NAME_SIZE]).rstrip(b'\0').decode('utf-8'))
+        entries = []
+        for slot in range(slots):
+            offset = _SLOTS_OFFSET + slot * slotSize
+            sequence, timestamp, direction, portId, length = _SLOT.unpack_from(buffer, offset)
+            if sequence:
+                data = bytes(buffer[offset + _SLOT.size:offset + _SLOT.size + length])
+                entries.append((sequence, timestamp, direction, portId, data))
+    entries.sort()
+    chunks: list[CapturedChunk] = []
+    pending: dict[tuple[int, int], CapturedChunk] = {}      # (direction, port) -> chunk being joined.
+    for sequence, timestamp, direction, portId, data in entries:
+        key = direction, portId
+        previous = pending.get(key)
+        # Parts of a chunk share its timestamp.
+        if previous is not None and previous.timestamp == timestamp:
+            pending[key] = previous._replace(data=previous.data + data)
+            continue
+        if previous is not None:
+            chunks.append(previous)
+        port = ports[portId] if portId < len(ports) else f'port{portId}'
+        pending[key] = CapturedChunk(sequence, timestamp, direction, port, data)
+    chunks.extend(pending.values())
+    chunks.sort(key=lambda chunk: chunk.sequence)
+    return chunks
@@ -0,0 +1,177 @@
+"""
+Offline analysis of raw serial captures. (capture.SerialCapture)
+Frames are reconstructed per pad as SerialDevice splits them, frames corrupted by stray bytes are counted,
+and inter-frame and response latency of each pad are computed from capture timestamps.
+
+Run `python -m server.game.capture_analysis <capture file>` to print a report per pad.
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Iterator, NamedTuple, Optional, Sequence
+
+from .capture import CAPTURE_PATH, DIRECTION_TX, CapturedChunk, read_capture
+from .game_data import GameClientData, GameProtocolData, BINARY_FLAG
+
+__all__ = (
+    'CapturedFrame',
+    'PortReport',
+    'reconstruct_frames',
+    'analyze'
+)
+
+
+class CapturedFrame(NamedTuple):
+    timestamp: int      # monotonic_ns when the frame's line separator was captured.
+    direction: int
+    port: str
+    data: bytes
+
+
+class PortReport(NamedTuple):
+    port: str
+    rxBytes: int
+    txBytes: int
+    rxFrames: int
+    txFrames: int
+    clientFrames: int       # valid client data frames. (c;... and binary)
+    protocolFrames: int
+    otherFrames: int        # printable lines which are not frames. (debug prints of the pad)
+    corruptFrames: int      # frames with stray bytes.
+    recoverableFrames: int  # corrupt frames which are valid once stray bytes are removed.
+    strayBytes: int
+    intervals: tuple[float, ...]    # seconds between consecutive client frames.
+    responses: tuple[float, ...]    # seconds from a server frame to the next client frame.
+
+    @staticmethod
+    def _percentile(values: Sequence[float], rate: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(rate * len(ordered)))]
+
+    def describe(self) -> str:
+        lines = [
+            f'{self.port}',
+            f'    bytes  : rx {self.rxBytes}, tx {self.txBytes}',
+            f'    frames : rx {self.rxFrames} (client {self.clientFrames}, protocol {self.protocolFrames}, '
+            f'other {self.otherFrames}), tx {self.txFrames}',
+            f'    corrupt: {self.corruptFrames} frames ({self.recoverableFrames} recoverable), {self.strayBytes} stray bytes'
+        ]
+        for label, values in (('interval', self.intervals), ('response', self.responses)):
+            if values:
+                lines.append(
+                    f'    {label:<8}: p50 {self._percentile(values, 0.5) * 1000:.2f}ms, '
+                    f'p99 {self._percentile(values, 0.99) * 1000:.2f}ms, max {max(values) * 1000:.2f}ms'
+                )
+        return '\n'.join(lines)
+
+
+def reconstruct_frames(chunks: Sequence[CapturedChunk]) -> Iterator[CapturedFrame]:
+    """
+    Split captured streams into frames on line separator, as SerialDevice does.
+    If the ring has wrapped, stream of each port and direction starts after its first separator,
+    since its first frame may have been cut.
+    """
+    wrapped = bool(chunks) and chunks[0].sequence > 1
+    buffers: dict[tuple[int, str], Optional[bytearray]] = {}
+    for chunk in chunks:
+        key = chunk.direction, chunk.port
+        buffer = buffers.get(key)
+        data = chunk.data
+        if buffer is None and not wrapped:
+            buffer = buffers[key] = bytearray()
+        elif buffer is None:
+            start = data.find(b'\n')
+            if start == -1:
+                continue
+            data = data[start + 1:]
+            buffer = buffers[key] = bytearray()
+        buffer += data
+        end = buffer.find(b'\n')
+        while end != -1:
+            frame = bytes(buffer[:end])
+            if frame.endswith(b'\r'):
+                frame = frame[:-1]
+            yield CapturedFrame(chunk.timestamp, chunk.direction, chunk.port, frame)
+            del buffer[:end + 1]
+            end = buffer.find(b'\n')
+
+
+def _is_printable(frame: bytes) -> bool:
+    return all(0x20 <= byte < 0x7F for byte in frame)
+
+
+def _strip_stray(frame: bytes) -> bytes:
+    return bytes(byte for byte in frame if 0x20 <= byte < 0x7F)
+
+
+def _is_protocol(frame: bytes) -> bool:
+    return GameProtocolData.schema.parse(frame) is not None
+
+
+def analyze(chunks: Sequence[CapturedChunk]) -> dict[str, PortReport]:
+    """
+    Analyze captured chunks per port.
+    :return: port name -> PortReport.
+    """
+    ports = sorted({chunk.port for chunk in chunks})
+    counts = {port: dict.fromkeys(
+        ('rxBytes', 'txBytes', 'rxFrames', 'txFrames', 'clientFrames', 'protocolFrames', 'otherFrames',
+         'corruptFrames', 'recoverableFrames', 'strayBytes'), 0
+    ) for port in ports}
+    intervals: dict[str, list[float]] = {port: [] for port in ports}
+    responses: dict[str, list[float]] = {port: [] for port in ports}
+    lastClient: dict[str, int] = {}
+    lastServer: dict[str, Optional[int]] = {}
+    for chunk in chunks:
+        counts[chunk.port]['txBytes' if chunk.direction == DIRECTION_TX else 'rxBytes'] += len(chunk.data)
+    for frame in reconstruct_frames(chunks):
+        count = counts[frame.port]
+        if frame.direction == DIRECTION_TX:
+            count['txFrames'] += 1
+            lastServer[frame.port] = frame.timestamp
+            continue
+        count['rxFrames'] += 1
+        data = frame.data
+        isBinary = data[:1] == GameClientData.binaryHeaderByte and all(byte & BINARY_FLAG for byte in data)
+        if GameClientData.parse_frame(data) is not None and (isBinary or _is_printable(data)):
+            count['clientFrames'] += 1
+            previous = lastClient.get(frame.port)
+            if previous is not None:
+                intervals[frame.port].append((frame.timestamp - previous) / 1e9)
+            lastClient[frame.port] = frame.timestamp
+            sent = lastServer.get(frame.port)
+            if sent is not None:
+                responses[frame.port].append((frame.timestamp - sent) / 1e9)
+                lastServer[frame.port] = None
+        elif _is_protocol(data):
+            count['protocolFrames'] += 1
+        elif _is_printable(data):
+            count['otherFrames'] += 1
+        else:
+            count['corruptFrames'] += 1
+            stripped = _strip_stray(data)
+            count['strayBytes'] += len(data) - len(stripped)
+            if GameClientData.parse_frame(stripped) is not None or _is_protocol(stripped):
+                count['recoverableFrames'] += 1
+    return {
+        port: PortReport(port, **counts[port], intervals=tuple(intervals[port]), responses=tuple(responses[port]))
+        for port in ports
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Analyze raw serial capture of Whack A Mole pads.')
+    parser.add_argument('capture', nargs='?', default=CAPTURE_PATH)
+    args = parser.parse_args(argv)
+    chunks = read_capture(args.capture)
+    if chunks:
+        span = (chunks[-1].timestamp - chunks[0].timestamp) / 1e9
+        print(f'{args.capture} : {len(chunks)} chunks over {span:.1f}s')
+    for report in analyze(chunks).values():
+        print(report.describe())
+
+
+if __name__ == '__main__':
+    main()
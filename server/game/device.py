@@ -1,23 +1,57 @@
 from __future__ import annotations
 
+import io
+import json
+import logging
+import os
+import queue
+import selectors
+import socket
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import suppress
 from random import randint
 from typing import Optional, Any, Final, ClassVar
 import serial
 from serial.tools.list_ports import comports
+from serial.tools.list_ports_common import ListPortInfo
 
 from timeout import TimeoutContext, ContextTimeoutError
+from .capture import SerialCapture, DIRECTION_RX, DIRECTION_TX
+from .game_data import GameProtocolData, WireProtocol
+
+logger = logging.getLogger('wam.device')
 
 
 class SerialDevice(ABC):
     """
     Hardware device mock model.
     """
+    LINE_SEP: Final[bytes] = b'\n'
+    CARRIAGE_RETURN: Final[bytes] = b'\r'
+    READER_TIMEOUT: Final[float] = 0.05     # seconds a background reader blocks on the port before re-checking stop flag.
+
     name: str
     port: str
     serialPort: serial.Serial
 
+    # Frame buffers
+    _rxBuffer: bytearray        # bytes received, but not yet terminated by LINE_SEP.
+    _rxFrames: deque[bytes]     # complete frames waiting to be consumed.
+
+    # Background reader
+    _inbox: queue.Queue         # frames published by background reader thread.
+    _readerThread: Optional[threading.Thread]
+    _readerStop: threading.Event
+    _hub: Optional[SerialHub]   # shared reader which drains this device instead of its own thread.
+
+    # Raw capture
+    _capture: Optional[SerialCapture]   # every byte read and written is recorded here, if set.
+    _capturePort: int
+
     def connect(self):
         self.serialPort.open()
 
@@ -28,19 +62,193 @@ class SerialDevice(ABC):
     def isConnected(self) -> bool:
         return self.serialPort.isOpen()
 
-    def read_line(self) -> str:
-        buffer: str = ''
+    def _drain(self, blocking: bool = False) -> int:
+        """
+        Read every byte currently waiting on the serial port into the receive buffer, and split complete frames.
+        Partial frames are kept in the buffer until their LINE_SEP arrives on later calls.
+        :param blocking: if True, wait for at least one byte (bounded by serialPort.timeout) when nothing is waiting.
+        :return: number of bytes read from the serial port.
+        """
         if not self.serialPort.isOpen():
             self.serialPort.open()
-        while self.serialPort.inWaiting():
-            byte = self.serialPort.read(1)
-            buffer += byte
-            if byte == b'\n':
-                return buffer
+        waiting: int = self.serialPort.in_waiting
+        if not waiting:
+            if not blocking:
+                return 0
+            waiting = 1
+        chunk: bytes = self.serialPort.read(waiting)
+        if not chunk:
+            return 0
+        if self._capture is not None:
+            self._capture.record(DIRECTION_RX, self._capturePort, chunk)
+        buffer = self._rxBuffer
+        buffer += chunk
+
+        start = 0
+        end = buffer.find(self.LINE_SEP, start)
+        while end != -1:
+            # Arduino's Serial.println() terminates lines with CRLF.
+            frameEnd = end - 1 if end > start and buffer[end - 1] == ord(self.CARRIAGE_RETURN) else end
+            self._rxFrames.append(bytes(buffer[start:frameEnd]))
+            start = end + 1
+            end = buffer.find(self.LINE_SEP, start)
+        if start:
+            del buffer[:start]
+        return len(chunk)
+
+    def read_frames(self) -> list[bytes]:
+        """
+        Drain the serial port and return every complete frame received so far.
+        :return: list of frames, without line terminator. Empty list if no frame is complete yet.
+        """
+        self._drain()
+        frames = list(self._rxFrames)
+        self._rxFrames.clear()
+        return frames
+
+    def read_frame(self) -> Optional[bytes]:
+        """
+        Drain the serial port and return the oldest complete frame.
+        :return: frame without line terminator, or None if no frame is complete yet.
+        """
+        if not self._rxFrames:
+            self._drain()
+        return self._rxFrames.popleft() if self._rxFrames else None
+
+    def read_line(self, encoding: str = 'utf-8') -> Optional[str]:
+        """
+        Read the oldest complete line as string.
+        :param encoding: encoding used to decode the frame.
+        :return: decoded line without line terminator, or None if no frame is complete yet.
+        """
+        frame = self.read_frame()
+        if frame is None:
+            return None
+        return frame.decode(encoding, errors='replace')
+
+    # Background reader
+    @property
+    def isReading(self) -> bool:
+        return self._hub is not None or (self._readerThread is not None and self._readerThread.is_alive())
+
+    def start_reader(self, hub: Optional[SerialHub] = None):
+        """
+        Start background thread which keeps draining the serial port and publishes complete frames into inbox.
+        While reader is running, consume frames with receive_frame() / receive_line() instead of read_*() methods.
+        :param hub: if given, device is drained by the hub's shared thread instead of its own thread.
+        """
+        if self.isReading:
+            return
+        # Drop frames left from the previous reader.
+        self._rxBuffer.clear()
+        self._rxFrames.clear()
+        with suppress(queue.Empty):
+            while True:
+                self._inbox.get_nowait()
+        if hub is not None:
+            self._hub = hub
+            hub.attach(self)
+            return
+        self.serialPort.timeout = self.READER_TIMEOUT
+        self._readerStop.clear()
+        self._readerThread = threading.Thread(
+            target=self._reader_loop,
+            name=f'SerialReader({self.port})',
+            daemon=True
+        )
+        self._readerThread.start()
+
+    def stop_reader(self):
+        """
+        Stop background reader thread, and wait until it exits.
+        """
+        hub = self._hub
+        if hub is not None:
+            self._hub = None
+            hub.detach(self)
+            return
+        if self._readerThread is None:
+            return
+        self._readerStop.set()
+        self._readerThread.join(timeout=self.READER_TIMEOUT * 4)
+        self._readerThread = None
+
+    def _reader_loop(self):
+        while not self._readerStop.is_set():
+            try:
+                self._drain(blocking=True)
+            except serial.serialutil.SerialException as e:
+                logger.warning(f'SerialReader({self.port}) > Serial port closed : {e}')
+                break
+            self._publish_frames()
+
+    def _publish_frames(self):
+        while self._rxFrames:
+            self._inbox.put(self._rxFrames.popleft())
+
+    def receive_frame(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Get the oldest frame published by background reader.
+        :param timeout: seconds to wait for a frame. None waits forever, 0 does not wait at all.
+        :return: frame without line terminator, or None if no frame arrived before timeout.
+        """
+        try:
+            if timeout is not None and timeout <= 0:
+                return self._inbox.get_nowait()
+            return self._inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def receive_frames(self) -> list[bytes]:
+        """
+        Get every frame published by background reader so far, oldest first, without waiting.
+        """
+        frames = []
+        with suppress(queue.Empty):
+            while True:
+                frames.append(self._inbox.get_nowait())
+        return frames
+
+    def receive_line(self, timeout: Optional[float] = None, encoding: str = 'utf-8') -> Optional[str]:
+        """
+        Get the oldest line published by background reader, decoded as string.
+        :param timeout: seconds to wait for a line. None waits forever, 0 does not wait at all.
+        :param encoding: encoding used to decode the frame.
+        :return: decoded line without line terminator, or None if no line arrived before timeout.
+        """
+        frame = self.receive_frame(timeout)
+        if frame is None:
+            return None
+        return frame.decode(encoding, errors='replace')
 
     def write_line(self, line: str, encoding: str = 'utf-8'):
         byte_line = line.encode(encoding)
-        self.serialPort.write(byte_line)
+        if not byte_line.endswith(self.LINE_SEP):
+            byte_line += self.LINE_SEP
+        self._write(byte_line)
+
+    def write_frame(self, frame: bytes):
+        """
+        Write raw frame, terminated by LINE_SEP.
+        :param frame: frame bytes. Must not contain LINE_SEP.
+        """
+        self._write(frame + self.LINE_SEP)
+
+    def _write(self, data: bytes):
+        if self._capture is not None:
+            self._capture.record(DIRECTION_TX, self._capturePort, data)
+        self.serialPort.write(data)
+
+    # Raw capture
+    def start_capture(self, capture: SerialCapture):
+        """
+        Record every byte read from and written to the port into the capture.
+        """
+        self._capturePort = capture.register(self.port)
+        self._capture = capture
+
+    def stop_capture(self):
+        self._capture = None
 
     @classmethod
     @abstractmethod
@@ -59,6 +267,220 @@ class SerialDevice(ABC):
         self.name = name
         self.port = port
         self.serialPort = serial.Serial(port=port, baudrate=baudrate)
+        self._rxBuffer = bytearray()
+        self._rxFrames = deque()
+        self._inbox = queue.Queue()
+        self._readerThread = None
+        self._readerStop = threading.Event()
+        self._hub = None
+        self._capture = None
+        self._capturePort = 0
+
+
+class SerialHub:
+    """
+    Shared I/O layer : one background thread drains every attached device, instead of a reader thread per pad.
+    Ports which have file descriptor (posix) are waited on with selectors. Other ports are polled.
+    Selector is only touched by hub thread : attach() and detach() queue commands and wake the thread up
+    through a socket pair, so that select() never runs while the selector is mutated.
+    Writes are not handled here : each device is written only by the game thread of its session.
+    """
+    POLL_INTERVAL: Final[float] = 0.005     # seconds between polls, and maximum time a select() call blocks.
+    DETACH_TIMEOUT: Final[float] = 0.5      # seconds detach() waits for hub thread to drop the device.
+
+    def __init__(self, name: str = 'SerialHub'):
+        self.name = name
+        self._selector = selectors.DefaultSelector()
+        self._polled: list[SerialDevice] = []       # devices without selectable file descriptor.
+        self._devices: set[SerialDevice] = set()
+        self._lock = threading.Lock()
+        # (attach, device, done) commands, applied by hub thread.
+        self._commands: queue.SimpleQueue[tuple[bool, SerialDevice, Optional[threading.Event]]] = queue.SimpleQueue()
+        self._wakeup, self._waker = socket.socketpair()
+        self._wakeup.setblocking(False)
+        self._waker.setblocking(False)
+        self._selector.register(self._wakeup, selectors.EVENT_READ, None)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def __len__(self) -> int:
+        return len(self._devices)
+
+    @property
+    def isRunning(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def attach(self, device: SerialDevice):
+        """
+        Start draining the device. Complete frames are published into device's inbox.
+        """
+        with self._lock:
+            if device in self._devices:
+                return
+            self._devices.add(device)
+            self._commands.put((True, device, None))
+            if not self.isRunning:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def detach(self, device: SerialDevice):
+        """
+        Stop draining the device. Waits until hub thread dropped it, so the port can be closed right after.
+        """
+        with self._lock:
+            if device not in self._devices:
+                return
+            self._devices.discard(device)
+            done = threading.Event()
+            self._commands.put((False, device, done))
+            running = self.isRunning
+        if not running or threading.current_thread() is self._thread:
+            self._apply_commands()
+            return
+        self._wake()
+        done.wait(self.DETACH_TIMEOUT)
+
+    def stop(self):
+        """
+        Detach every device and stop hub thread.
+        """
+        for device in list(self._devices):
+            self.detach(device)
+        self._stop.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=self.POLL_INTERVAL * 10)
+            self._thread = None
+
+    def _wake(self):
+        with suppress(BlockingIOError, OSError):
+            self._waker.send(b'\0')
+
+    def _apply_commands(self):
+        """
+        Register and unregister queued devices. Called by hub thread, or after hub thread stopped.
+        """
+        with suppress(queue.Empty):
+            while True:
+                attach, device, done = self._commands.get_nowait()
+                if attach:
+                    try:
+                        self._selector.register(device.serialPort.fileno(), selectors.EVENT_READ, device)
+                    except (AttributeError, OSError, ValueError, KeyError, io.UnsupportedOperation,
+                            serial.SerialException):
+                        self._polled.append(device)
+                else:
+                    if device in self._polled:
+                        self._polled.remove(device)
+                    else:
+                        with suppress(KeyError, ValueError, OSError, serial.SerialException):
+                            self._selector.unregister(device.serialPort.fileno())
+                if done is not None:
+                    done.set()
+
+    def _drain(self, device: SerialDevice):
+        if device not in self._devices:     # detached, but its command is not applied yet.
+            return
+        try:
+            device._drain()
+        except (serial.serialutil.SerialException, OSError) as e:
+            logger.warning(f'{self.name}({device.port}) > Serial port closed : {e}')
+            self.detach(device)
+            # Device is no longer drained by the hub. start_reader() may attach it again.
+            device._hub = None
+            return
+        device._publish_frames()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._apply_commands()
+            timeout = self.POLL_INTERVAL if self._polled else None
+            for key, _ in self._selector.select(timeout=timeout):
+                if key.data is None:
+                    with suppress(BlockingIOError, OSError):
+                        while self._wakeup.recv(64):
+                            pass
+                else:
+                    self._drain(key.data)
+            for device in list(self._polled):
+                self._drain(device)
+        self._apply_commands()
+
+
+class PadRegistry:
+    """
+    Persisted registry of known WhackAMole client devices.
+    Devices are identified using USB vid/pid/serial_number, so that known pads can be connected without probing.
+    Devices without USB serial number cannot be told apart, therefore they are never registered.
+    """
+    DEFAULT_PATH: Final[str] = './known_pads.json'
+
+    path: str
+    pads: dict[str, dict[str, Any]]
+
+    @staticmethod
+    def key(port: ListPortInfo) -> Optional[str]:
+        """
+        Get registry key of the port.
+        :param port: port info from comports().
+        :return: `vid:pid:serial_number` key, or None if the port cannot be identified.
+        """
+        if port.vid is None or port.pid is None or not port.serial_number:
+            return None
+        return f'{port.vid:04x}:{port.pid:04x}:{port.serial_number}'
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_PATH) -> PadRegistry:
+        pads = {}
+        with suppress(FileNotFoundError, json.JSONDecodeError):
+            with open(path, 'r', encoding='utf-8') as f:
+                pads = json.load(f)
+        return cls(path, pads)
+
+    def __init__(self, path: str = DEFAULT_PATH, pads: Optional[dict[str, dict[str, Any]]] = None):
+        self.path = path
+        self.pads = pads or {}
+        self._dirty = False
+
+    def __contains__(self, port: ListPortInfo) -> bool:
+        key = self.key(port)
+        return key is not None and key in self.pads
+
+    def add(self, port: ListPortInfo):
+        key = self.key(port)
+        if key is None:
+            return
+        entry = {'description': port.description, 'last_device': port.device}
+        if self.pads.get(key) != entry:
+            self.pads[key] = entry
+            self._dirty = True
+
+    def retain(self, ports: list[ListPortInfo]):
+        """
+        Drop entries of pads which are not plugged in any of the ports.
+        :param ports: ports currently present. (comports())
+        """
+        present = {self.key(port) for port in ports}
+        for key in [key for key in self.pads if key not in present]:
+            del self.pads[key]
+            self._dirty = True
+
+    def remove(self, port: ListPortInfo):
+        key = self.key(port)
+        if key in self.pads:
+            del self.pads[key]
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.pads, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
 
 
 class WhackAMoleClient(SerialDevice):
@@ -67,8 +489,15 @@ class WhackAMoleClient(SerialDevice):
     Communicate using UART Serial.
     """
     BAUDRATE: Final[int] = 9600
+    PROBE_TIMEOUT: Final[float] = 5.0   # seconds to wait for client prefix while probing unknown port.
+    KNOWN_PROBE_TIMEOUT: Final[float] = 1.0     # seconds to wait for client prefix of a pad stored in registry.
+    PROBE_WORKERS: Final[int] = 8
+    NEGOTIATION_TIMEOUT: Final[float] = 1.0     # seconds to wait for pad's protocol answer.
+    SUPPORTED_PROTOCOL: Final[WireProtocol] = WireProtocol.SEEDED
     registeredClients: ClassVar[set] = set()
 
+    protocol: WireProtocol
+
     def __init__(self, name: str, port: str, clientNumber: int):
         """
 
@@ -79,33 +508,115 @@ class WhackAMoleClient(SerialDevice):
         """
         super(WhackAMoleClient, self).__init__(name, port, self.BAUDRATE)
         self.clientNumber: int = clientNumber
+        self.protocol = WireProtocol.TEXT
         WhackAMoleClient.registeredClients.add(self)
 
+    # Protocol negotiation
+    def request_protocol(self):
+        """
+        Send the highest protocol version server supports. Pad answers with the version it will use.
+        """
+        self.write_line(GameProtocolData(self.SUPPORTED_PROTOCOL).serialize())
+
+    def await_protocol(self, timeout: float = NEGOTIATION_TIMEOUT) -> WireProtocol:
+        """
+        Wait for pad's answer to request_protocol(). Background reader must be running.
+        Pads which do not answer in time (older firmware) keep using WireProtocol.TEXT.
+        :param timeout: seconds to wait for answer.
+        :return: negotiated protocol.
+        """
+        prefix = (GameProtocolData.prefix + ';').encode('ascii')
+        deadline = time.monotonic() + timeout
+        self.protocol = WireProtocol.TEXT
+        while (remaining := deadline - time.monotonic()) > 0:
+            frame = self.receive_frame(remaining)
+            if frame is None:
+                break
+            if frame.startswith(prefix):
+                answer = GameProtocolData.deserialize(frame.decode('ascii', errors='replace'))
+                self.protocol = min(answer.protocol, self.SUPPORTED_PROTOCOL)
+                break
+        logger.info(f'{self.name} ({self.port}) > Negotiated protocol : {self.protocol.name}')
+        return self.protocol
+
+    def negotiate_protocol(self, timeout: float = NEGOTIATION_TIMEOUT) -> WireProtocol:
+        self.request_protocol()
+        return self.await_protocol(timeout)
+
     @classmethod
-    def search(cls) -> list[WhackAMoleClient]:
+    def probe(cls, port: ListPortInfo, timeout: Optional[float] = None) -> bool:
+        """
+        Check if device on the port is WhackAMole client, by reading its first 2 bytes.
+        :param port: port to probe.
+        :param timeout: seconds to wait for the prefix. PROBE_TIMEOUT if not given.
+        :return: True if the device sent client prefix (`c;`).
+        """
+        log = [
+            f'Found Serial Port : {port.name} ({port.device})',
+            f'│ Human Readable Description : {port.description}',
+            f'│ vid={port.vid}, pid={port.pid}, serial_number={port.serial_number}'
+        ]
+        found = False
+        try:
+            serialPort = serial.Serial(
+                port=port.device, baudrate=cls.BAUDRATE, timeout=cls.PROBE_TIMEOUT if timeout is None else timeout
+            )
+            log.append('├ Try read 2 bytes')
+            resp = serialPort.read(2)
+            log.append(f'├ resp = {resp}')
+            if resp.startswith(b'c;'):
+                log.append(f'└ Found WhackAMole Client device! Registering...')
+                found = True
+            else:
+                log.append(f'└ Not a WhackAMole Client device. Skipping...')
+            serialPort.close()
+        except serial.serialutil.SerialException:
+            log.append(f'└ Cannot open serial port {port.name} ({port.device}). Skipping...')
+        # Log probe at once, so that logs of parallel probes are not interleaved.
+        logger.debug('\n'.join(log))
+        return found
+
+    @classmethod
+    def search(cls, registry: Optional[PadRegistry] = None) -> list[WhackAMoleClient]:
+        """
+        Search WhackAMole clients on every serial port.
+        Every port is probed in parallel. Pads stored in registry are only probed briefly, to check that
+        the port still belongs to the pad. Entries of pads which failed the probe or are unplugged are pruned.
+        :param registry: registry of known pads. Default registry file is used if not given.
+        :return: list of connected WhackAMoleClient objects.
+        """
+        registry = registry or PadRegistry.load()
+        ports: list[ListPortInfo] = list(comports(include_links=True))
+        logger.info(f'Found Serial ports : {[p.name for p in ports]}')
+        registry.retain(ports)
+
+        known: set[int] = set()
+        for i, port in enumerate(ports):
+            if port in registry:
+                logger.info(f'Found known WhackAMole Client device : {port.name} ({port.device})')
+                known.add(i)
+
+        def probe(i: int) -> bool:
+            return cls.probe(ports[i], cls.KNOWN_PROBE_TIMEOUT if i in known else cls.PROBE_TIMEOUT)
+
+        found: list[int] = []
+        if ports:
+            with ThreadPoolExecutor(
+                max_workers=min(cls.PROBE_WORKERS, len(ports)),
+                thread_name_prefix='WhackAMoleClient.probe'
+            ) as pool:
+                for i, isClient in enumerate(pool.map(probe, range(len(ports)))):
+                    if isClient:
+                        found.append(i)
+                    elif i in known:
+                        registry.remove(ports[i])
+
         clients = []
-        print('Found Serial ports :')
-        print(list(map(lambda p: p.name, comports(include_links=True))))
-        for i, port in enumerate(comports(include_links=True)):
-            # DEBUG
-            print(f'Found Serial Port : {port.name} ({port.device}))')
-            print(f'│ Human Readable Description : {port.description}')
-            # print(f'Technical Description : {port.hwid}')
-            # print(f'USB Serial Number : {port.serial_number}')
-            print(f'│ vid={port.vid}, pid={port.pid}')
-            try:
-                serialPort = serial.Serial(port=port.device, baudrate=cls.BAUDRATE, timeout=5)
-                # serialPort.open()
-                print('├ Try read 2 bytes')
-                resp = serialPort.read(2)
-                print(f'├ resp = {resp}')
-                if resp.startswith(b'c;'):
-                    print(f'└ Found WhackAMole Client device! Registering...')
-                    clients.append(cls(name=f'Player{i}', port=port.device, clientNumber=i))
-                serialPort.close()
-            except serial.serialutil.SerialException:
-                print(f'└ Cannot open serial port {port.name} ({port.device}). Skipping...')
-        print('Finish wrapping clients.')
+        for i in sorted(found):
+            registry.add(ports[i])
+            clients.append(cls(name=f'Player{i}', port=ports[i].device, clientNumber=i))
+        registry.save()
+        logger.info(f'Finish wrapping {len(clients)} clients.')
         return clients
 
     @classmethod
@@ -127,6 +638,7 @@ class FakeWAMClient:
         self.clientNumber = clientNumber
         # No serial.Serial object.
         self.last_server_data: str = None
+        self.protocol = WireProtocol.TEXT
 
     def send_no_hit_response(self):
         return f'c;False'
@@ -144,5 +656,42 @@ class FakeWAMClient:
     def write_line(self, line: str, encoding: str = 'utf-8'):
         self.last_server_data = line
 
+    def write_frame(self, frame: bytes):
+        self.last_server_data = frame
+
+    # Fake client only speaks text protocol.
+    def request_protocol(self):
+        pass
+
+    def await_protocol(self, timeout: float = 0) -> WireProtocol:
+        return self.protocol
+
+    def negotiate_protocol(self, timeout: float = 0) -> WireProtocol:
+        return self.protocol
+
+    # Fake client responds immediately, so background reader is not required.
+    def start_reader(self, hub: Optional[SerialHub] = None):
+        pass
+
+    def stop_reader(self):
+        pass
+
+    # Fake client has no serial bytes to capture.
+    def start_capture(self, capture: SerialCapture):
+        pass
+
+    def stop_capture(self):
+        pass
+
+    def receive_frame(self, timeout: Optional[float] = None) -> Optional[bytes]:
+        return self.read_line().encode('utf-8')
+
+    def receive_frames(self) -> list[bytes]:
+        # Fake client answers on demand, so nothing is ever queued.
+        return []
+
+    def receive_line(self, timeout: Optional[float] = None, encoding: str = 'utf-8') -> Optional[str]:
+        return self.read_line()
+
 
 
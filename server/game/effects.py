@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import enum
+from array import array
+from typing import Any, Callable, Final, Iterable, Mapping, NamedTuple, Optional, Sequence
+
+from .state import GameState, NO_SLOT
+
+__all__ = (
+    'EffectTarget',
+    'EffectOp',
+    'StatusApplication',
+    'RoundResult',
+    'EffectTable'
+)
+
+
+class EffectTarget(enum.IntEnum):
+    SELF = 0
+    OPPONENT = 1
+
+
+class EffectOp(NamedTuple):
+    """
+    Single effect of an item. Items declare their effects with PanelItem.set_effects().
+    """
+    target: EffectTarget
+    hpDelta: int = 0                # added to target's hp. Negative value damages the target.
+    status: Optional[str] = None    # status effect applied to the target.
+    duration: int = 0               # rounds the status effect lasts.
+    magnitude: int = 0              # strength of the status effect. (ex : damage per round)
+
+
+class StatusApplication(NamedTuple):
+    slot: int           # slot of the player who receives the status effect.
+    sourceSlot: int     # slot of the player who hit the item.
+    status: str
+    duration: int
+    magnitude: int = 0
+
+
+class RoundResult(NamedTuple):
+    deaths: list[int]                       # slots of players who died in the round, in hit order.
+    statuses: list[StatusApplication]
+    handlers: list[tuple[int, int]]         # (slot, item value) of hits which need item's custom handler.
+
+
+class EffectTable:
+    """
+    Item effects compiled into arrays indexed by item value.
+    Compiled once per session, so that resolving a round of hits does not touch enum machinery.
+
+    Hits of a round are resolved simultaneously : hp deltas of every hit are summed per player first,
+    then applied and clamped to max hp once. Shielded players do not take damage.
+    """
+    __slots__ = ('selfDelta', 'opponentDelta', 'statusOps', 'hasHandler', 'minHp', 'maxHp')
+
+    selfDelta: array            # item value -> hp delta to the player who hit.
+    opponentDelta: array        # item value -> hp delta to the opponent.
+    statusOps: tuple[tuple[EffectOp, ...], ...]     # item value -> status effect ops.
+    hasHandler: bytearray       # item value -> 1 if item has custom handler.
+
+    @classmethod
+    def compile(
+            cls,
+            items: Iterable[Any],
+            minHp: int,
+            maxHp: int,
+            hasCustomHandler: Callable[[Any], bool] = lambda item: False,
+            effects: Optional[Mapping[Any, Sequence[EffectOp]]] = None
+    ) -> EffectTable:
+        """
+        Compile effects of items.
+        :param items: items which have `value` and `effects` attributes. (PanelItem members)
+        :param minHp: player dies when hp goes under this value.
+        :param maxHp: hp is clamped to this value.
+        :param hasCustomHandler: function which tells whether item has custom handler.
+        :param effects: item -> effects to compile instead of the item's own effects. (ex : item_effects())
+        :return: compiled EffectTable.
+        """
+        items = list(items)
+        size = max(item.value for item in items) + 1
+        selfDelta = array('i', [0] * size)
+        opponentDelta = array('i', [0] * size)
+        statusOps: list[tuple[EffectOp, ...]] = [()] * size
+        hasHandler = bytearray(size)
+        for item in items:
+            statuses = []
+            ops = item.effects if effects is None else effects.get(item, item.effects)
+            for op in ops:
+                if op.target is EffectTarget.SELF:
+                    selfDelta[item.value] += op.hpDelta
+                else:
+                    opponentDelta[item.value] += op.hpDelta
+                if op.status is not None:
+                    statuses.append(op)
+            statusOps[item.value] = tuple(statuses)
+            hasHandler[item.value] = 1 if hasCustomHandler(item) else 0
+        return cls(selfDelta, opponentDelta, tuple(statusOps), hasHandler, minHp, maxHp)
+
+    def __init__(
+            self,
+            selfDelta: array,
+            opponentDelta: array,
+            statusOps: tuple[tuple[EffectOp, ...], ...],
+            hasHandler: bytearray,
+            minHp: int,
+            maxHp: int
+    ):
+        self.selfDelta = selfDelta
+        self.opponentDelta = opponentDelta
+        self.statusOps = statusOps
+        self.hasHandler = hasHandler
+        self.minHp = minHp
+        self.maxHp = maxHp
+
+    def apply_round(
+            self,
+            state: GameState,
+            slots: Sequence[int],
+            items: Sequence[int],
+            shielded: Optional[bytearray] = None
+    ) -> RoundResult:
+        """
+        Apply a round of hits on the state in one pass.
+        :param state: GameState of the session.
+        :param slots: slot of the player of each hit.
+        :param items: item value of each hit. Use BLANK (0) for players who did not hit.
+        :param shielded: slot -> non-zero if the player is shielded. (StatusEngine.shielded)
+        :return: RoundResult containing deaths, status effects to apply, and hits which need custom handlers.
+        """
+        selfDelta = self.selfDelta
+        opponentDelta = self.opponentDelta
+        statusOps = self.statusOps
+        hasHandler = self.hasHandler
+        opponents = state.opponents
+        hp = state.hp
+        deltas = [0] * state.count
+        touched = []
+        statuses: list[StatusApplication] = []
+        handlers: list[tuple[int, int]] = []
+
+        for slot, item in zip(slots, items):
+            delta = selfDelta[item]
+            if delta:
+                deltas[slot] += delta
+                touched.append(slot)
+            opponent = opponents[slot]
+            delta = opponentDelta[item]
+            if delta and opponent != NO_SLOT:
+                deltas[opponent] += delta
+                touched.append(opponent)
+            for op in statusOps[item]:
+                target = slot if op.target is EffectTarget.SELF else opponent
+                if target != NO_SLOT:
+                    statuses.append(StatusApplication(target, slot, op.status, op.duration, op.magnitude))
+            if hasHandler[item]:
+                handlers.append((slot, item))
+
+        deaths = []
+        maxHp = self.maxHp
+        minHp = self.minHp
+        for slot in touched:
+            delta = deltas[slot]
+            if not delta:
+                continue
+            deltas[slot] = 0    # each slot is applied once, even if it was touched by several hits.
+            if delta < 0 and shielded is not None and shielded[slot]:
+                continue
+            value = hp[slot] + delta
+            if value > maxHp:
+                value = maxHp
+            hp[slot] = value
+            if value < minHp and state.alive[slot]:
+                deaths.append(slot)
+        return RoundResult(deaths, statuses, handlers)
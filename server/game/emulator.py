@@ -0,0 +1,525 @@
+"""
+Virtual pads on pseudo-terminals, for load tests of the real serial I/O stack.
+FakeWAMClient answers without any serial port. A VirtualPad is the pad end of a pty pair instead :
+WhackAMoleClient opens the pty's port unchanged, so every frame goes through pyserial, SerialHub and the frame splitter
+as it does with a real pad.
+
+Pads speak the pad firmware's side of the protocol : negotiation (`p;`), text maps (`s;`), binary, delta and seeded
+frames, and answer each map with client data (`c;`) after a reaction time. Line noise and disconnects can be injected.
+One emulator thread serves every pad, so dozens of pads fit on one box.
+
+Needs a posix system with pseudo-terminals (os.openpty).
+Run `python -m server.game.emulator --help` to load test sessions on virtual pads.
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import heapq
+import itertools
+import logging
+import os
+import random
+import selectors
+import threading
+import time
+import tty
+from typing import Final, NamedTuple, Optional, Sequence
+
+from .game_data import (
+    BINARY_FLAG, MAP_SIZE, BinaryFrameError, MalformedFrameError, WireProtocol,
+    GameClientData, GameProtocolData, GameServerData, GameServerDeltaData, GameSeedData, GameRoundData
+)
+from .map_generator import SharedMapGenerator, derive_seed
+from .scheduler import TickStats
+
+__all__ = (
+    'PadBehavior',
+    'PadStats',
+    'VirtualPad',
+    'PadEmulator',
+    'LoadTestReport',
+    'run_load_test'
+)
+
+READ_SIZE: Final[int] = 4096
+POLL_INTERVAL: Final[float] = 0.05     # seconds the emulator thread blocks in select() before re-checking stop flag.
+TEXT_LINE_END: Final[bytes] = b'\r\n'   # Arduino's Serial.println()
+BINARY_LINE_END: Final[bytes] = b'\n'
+UNTARGETED_ITEMS: Final[frozenset[int]] = frozenset((0, 3))     # BLANK and BLOCKED_TILE : players do not aim at them.
+
+
+class PadBehavior(NamedTuple):
+    """
+    How virtual pads and their players behave. Times are in seconds.
+    """
+    protocol: WireProtocol = WireProtocol.SEEDED    # highest protocol of pad firmware. TEXT pads ignore negotiation.
+    reactionTime: float = 0.3       # mean delay between a map and the answer.
+    jitter: float = 0.1             # standard deviation of the delay.
+    hitRate: float = 0.5            # probability that player hits a tile in a round.
+    garbageRate: float = 0.0        # probability that random bytes (line noise) are written before an answer.
+    garbageLength: int = 4          # maximum number of noise bytes written at once.
+    disconnectRate: float = 0.0     # probability that pad drops off the line when a map arrives.
+    disconnectTime: float = 2.0     # seconds pad stays off the line. Frames sent meanwhile are lost.
+
+
+class PadStats(NamedTuple):
+    port: str
+    protocol: WireProtocol      # negotiated protocol.
+    maps: int                   # map frames received. (full map, delta, or round frames)
+    answers: int
+    hits: int
+    malformed: int              # frames the pad could not parse.
+    garbageBytes: int
+    disconnects: int
+    lostBytes: int              # bytes sent while pad was off the line.
+
+
+class VirtualPad:
+    """
+    Pad end of a pty pair. Frames are handled by PadEmulator's thread.
+    """
+
+    def __init__(self, behavior: PadBehavior = PadBehavior(), seed: Optional[int] = None):
+        self.behavior = behavior
+        self.master, self._slave = os.openpty()
+        # No echo and no newline translation, before the server opens the port.
+        tty.setraw(self._slave)
+        os.set_blocking(self.master, False)
+        self.port: str = os.ttyname(self._slave)
+        self.protocol = WireProtocol.TEXT
+        self.mapData: Optional[list[int]] = None
+        self.sequence: Optional[int] = None
+        self.generator: Optional[SharedMapGenerator] = None
+        self.token = 0              # incremented with each map, so that answers to older maps are dropped.
+        self.offlineUntil = 0.0     # monotonic time until pad is off the line.
+        self.closed = False
+        self._rng = random.Random(seed)
+        self._rxBuffer = bytearray()
+        # Statistics
+        self.maps = 0
+        self.answers = 0
+        self.hits = 0
+        self.malformed = 0
+        self.garbageBytes = 0
+        self.disconnects = 0
+        self.lostBytes = 0
+
+    def stats(self) -> PadStats:
+        return PadStats(
+            self.port, self.protocol, self.maps, self.answers, self.hits, self.malformed,
+            self.garbageBytes, self.disconnects, self.lostBytes
+        )
+
+    # Receive
+    def receive(self, data: bytes, now: float) -> Optional[float]:
+        """
+        Handle bytes written by the server.
+        :param data: bytes read from the pty.
+        :param now: time.monotonic() when the bytes were read.
+        :return: monotonic time to answer at, if a map arrived. Answer with answer(token) then.
+        """
+        if now < self.offlineUntil:
+            self.lostBytes += len(data)
+            return None
+        if self.offlineUntil:
+            # Back on the line : partial frame from before the drop is gone.
+            self.offlineUntil = 0.0
+            self._rxBuffer.clear()
+        buffer = self._rxBuffer
+        buffer += data
+        answerAt = None
+        start = 0
+        end = buffer.find(b'\n', start)
+        while end != -1:
+            frame = bytes(buffer[start:end]).rstrip(b'\r')
+            start = end + 1
+            end = buffer.find(b'\n', start)
+            if self._handle_frame(frame):
+                answerAt = self._on_map(now)
+                if answerAt is None:
+                    # Pad dropped off the line. Rest of the data is lost.
+                    self.lostBytes += len(buffer) - start
+                    buffer.clear()
+                    return None
+        if start:
+            del buffer[:start]
+        return answerAt
+
+    def _handle_frame(self, frame: bytes) -> bool:
+        """
+        Apply a server frame.
+        :return: True if the frame starts a round, so that player answers it.
+        """
+        if not frame:
+            return False
+        try:
+            if frame[0] & BINARY_FLAG:
+                return self._handle_binary(frame)
+            return self._handle_text(frame.decode('ascii'))
+        except (MalformedFrameError, UnicodeDecodeError, ValueError, IndexError):
+            self.malformed += 1
+            return False
+
+    def _handle_binary(self, frame: bytes) -> bool:
+        header = frame[0]
+        if header == GameServerData.binaryHeader:
+            data = GameServerData.deserialize_binary(frame)
+            self._show(data.mapData, data.sequence)
+        elif header == GameServerDeltaData.binaryHeader:
+            self._apply_delta(GameServerDeltaData.deserialize_binary(frame))
+        elif header == GameRoundData.binaryHeader:
+            self._show_round(GameRoundData.deserialize_binary(frame))
+        else:
+            raise BinaryFrameError(f'Unknown binary frame {frame!r}')
+        return True
+
+    def _handle_text(self, frame: str) -> bool:
+        prefix = frame[:2]
+        if prefix == GameProtocolData.prefix + ';':
+            self._negotiate(GameProtocolData.deserialize(frame))
+            return False
+        if prefix == GameSeedData.prefix + ';':
+            seedData = GameSeedData.deserialize(frame)
+            items, weights = zip(*seedData.itemWeights)
+            self.generator = SharedMapGenerator(items, weights, seedData.seed)
+            return False
+        if prefix == GameServerData.prefix + ';':
+            # `s;001030500`, or tiles separated by `;`.
+            mapData = [int(tile) for tile in frame[2:].replace(';', '')]
+            if len(mapData) != MAP_SIZE:
+                raise MalformedFrameError(f'Invalid server data {frame!r}')
+            self._show(mapData, None)
+            return True
+        if prefix == GameServerDeltaData.prefix + ';':
+            self._apply_delta(GameServerDeltaData.deserialize(frame))
+            return True
+        if prefix == GameRoundData.prefix + ';':
+            self._show_round(GameRoundData.deserialize(frame))
+            return True
+        raise MalformedFrameError(f'Unknown frame {frame!r}')
+
+    def _negotiate(self, request: GameProtocolData):
+        # Older firmware does not know negotiation, and stays silent.
+        if self.behavior.protocol is WireProtocol.TEXT:
+            return
+        self.protocol = min(request.protocol, self.behavior.protocol)
+        self.write(GameProtocolData(self.protocol).serialize().encode('ascii') + TEXT_LINE_END)
+
+    def _show(self, mapData: list[int], sequence: Optional[int]):
+        self.mapData = mapData
+        self.sequence = sequence
+
+    def _apply_delta(self, delta: GameServerDeltaData):
+        # Deltas on another base are ignored : pad keeps answering its current sequence, so server sends a keyframe.
+        if self.mapData is not None and self.sequence == delta.baseSequence:
+            self._show(delta.apply(self.mapData), delta.sequence)
+
+    def _show_round(self, roundData: GameRoundData):
+        if self.generator is not None:
+            self._show(self.generator.map_for_round(roundData.roundNumber), roundData.sequence)
+
+    def _on_map(self, now: float) -> Optional[float]:
+        """
+        Player sees a new map : schedule the answer, unless pad drops off the line.
+        """
+        behavior = self.behavior
+        self.maps += 1
+        self.token += 1
+        if behavior.disconnectRate and self._rng.random() < behavior.disconnectRate:
+            self.disconnects += 1
+            self.offlineUntil = now + behavior.disconnectTime
+            return None
+        return now + max(0.0, self._rng.gauss(behavior.reactionTime, behavior.jitter))
+
+    # Send
+    def answer(self, token: int):
+        """
+        Send client data for the map of the token. Does nothing if a newer map arrived, or pad is off the line.
+        """
+        if token != self.token or self.offlineUntil or self.closed:
+            return
+        behavior = self.behavior
+        rng = self._rng
+        if behavior.garbageRate and rng.random() < behavior.garbageRate:
+            noise = rng.randbytes(rng.randint(1, behavior.garbageLength))
+            self.garbageBytes += len(noise)
+            self.write(noise)
+        isHit = rng.random() < behavior.hitRate
+        hitIndex = None
+        if isHit:
+            mapData = self.mapData or ()
+            targets = [i for i, item in enumerate(mapData) if item not in UNTARGETED_ITEMS]
+            hitIndex = rng.choice(targets) if targets else rng.randrange(MAP_SIZE)
+            self.hits += 1
+        data = GameClientData(isHit, hitIndex, sequence=self.sequence)
+        if self.protocol >= WireProtocol.BINARY:
+            self.write(data.serialize_binary() + BINARY_LINE_END)
+        else:
+            self.write(data.serialize().encode('ascii') + TEXT_LINE_END)
+        self.answers += 1
+
+    def write(self, data: bytes):
+        try:
+            os.write(self.master, data)
+        except BlockingIOError:
+            # Server is not reading the port, and pty buffer is full. Like UART overrun, bytes are lost.
+            self.lostBytes += len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        os.close(self.master)
+        os.close(self._slave)
+
+
+class PadEmulator:
+    """
+    Runs virtual pads on a single thread : ptys are waited on with selectors, and answers are kept in a heap by time.
+    """
+
+    def __init__(self, count: int, behavior: PadBehavior = PadBehavior(), seed: Optional[int] = None):
+        """
+        :param count: number of virtual pads.
+        :param behavior: behavior of every pad.
+        :param seed: seed of pads' random generators. Each pad gets its own seed derived from it.
+        """
+        self.pads = [
+            VirtualPad(behavior, None if seed is None else derive_seed(seed, i)) for i in range(count)
+        ]
+        self._selector = selectors.DefaultSelector()
+        for pad in self.pads:
+            self._selector.register(pad.master, selectors.EVENT_READ, pad)
+        self._answers: list[tuple[float, int, VirtualPad, int]] = []   # (time, order, pad, token) heap.
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def ports(self) -> list[str]:
+        return [pad.port for pad in self.pads]
+
+    @property
+    def isRunning(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def clients(self) -> list:
+        """
+        Create a WhackAMoleClient on each pad's port.
+        """
+        from .device import WhackAMoleClient
+        return [
+            WhackAMoleClient(name=f'Player{i}', port=pad.port, clientNumber=i) for i, pad in enumerate(self.pads)
+        ]
+
+    def start(self) -> PadEmulator:
+        if self.isRunning:
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='PadEmulator', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop emulator thread, and close every pty.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=POLL_INTERVAL * 10)
+            self._thread = None
+        with self._lock:
+            for pad in self.pads:
+                self._hangup(pad)
+        self._selector.close()
+
+    def hangup(self, index: int):
+        """
+        Unplug a pad for good : its pty is closed, and the server's port fails on next I/O.
+        Session playing on the pad ends with GameFinishCode.PAD_DISCONNECTED.
+        """
+        with self._lock:
+            self._hangup(self.pads[index])
+
+    def _hangup(self, pad: VirtualPad):
+        if pad.closed:
+            return
+        with contextlib.suppress(KeyError, ValueError):
+            self._selector.unregister(pad.master)
+        pad.close()
+
+    def stats(self) -> list[PadStats]:
+        return [pad.stats() for pad in self.pads]
+
+    def _loop(self):
+        answers = self._answers
+        while not self._stop.is_set():
+            timeout = POLL_INTERVAL
+            if answers:
+                timeout = min(timeout, max(0.0, answers[0][0] - time.monotonic()))
+            if self._selector.get_map():
+                events = self._selector.select(timeout)
+            else:
+                events = ()
+                time.sleep(timeout)
+            with self._lock:
+                for key, _ in events:
+                    pad = key.data
+                    if pad.closed:
+                        continue
+                    try:
+                        data = os.read(pad.master, READ_SIZE)
+                    except BlockingIOError:
+                        continue
+                    except OSError:
+                        # Server side of the pty is gone.
+                        self._hangup(pad)
+                        continue
+                    answerAt = pad.receive(data, time.monotonic())
+                    if answerAt is not None:
+                        heapq.heappush(answers, (answerAt, next(self._order), pad, pad.token))
+                now = time.monotonic()
+                while answers and answers[0][0] <= now:
+                    _, _, pad, token = heapq.heappop(answers)
+                    pad.answer(token)
+
+    def __enter__(self) -> PadEmulator:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class LoadTestReport(NamedTuple):
+    sessions: int               # sessions started, including restarts.
+    rounds: int                 # rounds played by every session.
+    duration: float             # seconds.
+    tickStats: list[TickStats]  # timing of each session.
+    padStats: list[PadStats]
+
+    @property
+    def roundsPerSecond(self) -> float:
+        return self.rounds / self.duration if self.duration else 0.0
+
+    def summary(self) -> dict[str, float]:
+        ticks = sum(stats.ticks for stats in self.tickStats)
+        pads = self.padStats
+        return {
+            'pads': len(pads),
+            'sessions': self.sessions,
+            'rounds': self.rounds,
+            'rounds_per_second': self.roundsPerSecond,
+            'mean_jitter_ms': (
+                sum(stats.meanJitter * stats.ticks for stats in self.tickStats) / ticks * 1000 if ticks else 0.0
+            ),
+            'max_jitter_ms': max((stats.maxJitter for stats in self.tickStats), default=0.0) * 1000,
+            'overruns': sum(stats.overruns for stats in self.tickStats),
+            'maps': sum(stats.maps for stats in pads),
+            'answers': sum(stats.answers for stats in pads),
+            'malformed': sum(stats.malformed for stats in pads),
+            'garbage_bytes': sum(stats.garbageBytes for stats in pads),
+            'disconnects': sum(stats.disconnects for stats in pads),
+            'lost_bytes': sum(stats.lostBytes for stats in pads),
+        }
+
+
+def run_load_test(
+        pads: int,
+        behavior: PadBehavior = PadBehavior(),
+        duration: float = 30.0,
+        tickRate: float = 5.0,
+        playersPerSession: int = 2,
+        seed: Optional[int] = None,
+        host=None
+) -> LoadTestReport:
+    """
+    Run sessions of virtual pads through the real serial stack for a while. Finished games are restarted on
+    the same pads, so every pad keeps playing until the end.
+    :param pads: number of virtual pads.
+    :param behavior: behavior of every pad.
+    :param duration: seconds to play.
+    :param tickRate: rounds per second of each session.
+    :param playersPerSession: number of players in each session.
+    :param seed: seed of pads' random generators.
+    :param host: SessionHost to run sessions on. Headless host which does not record is used if not given.
+    :return: LoadTestReport of the run.
+    """
+    from .game import SessionHost
+    from .game_object import GameFinishCode
+    with PadEmulator(pads, behavior, seed) as emulator:
+        clients = emulator.clients()
+        if host is None:
+            host = SessionHost(logging.getLogger('wam.loadtest'), recordDirectory=None)
+        host.clients = clients
+        stopping = threading.Event()
+        lock = threading.Lock()
+        started = []
+
+        def restart(session):
+            with lock:
+                # Games stopped by shutdown or by a failed port are not restarted.
+                if stopping.is_set() or session.gameInfo.finish_code is not GameFinishCode.PLAYER_WIN:
+                    return
+                nextSession = host.create_session(session.clients, tickRate)
+                started.append(nextSession)
+            nextSession.run()
+
+        host.finishListeners.append(restart)
+        begin = time.monotonic()
+        try:
+            with lock:
+                started.extend(host.create_sessions(tickRate, playersPerSession))
+                sessions = list(started)
+            for session in sessions:
+                session.run()
+            stopping.wait(duration)
+        finally:
+            stopping.set()
+            host.finishListeners.remove(restart)
+            # A game which finished right before stopping may have restarted meanwhile.
+            while host.sessions:
+                host.shutdown_sessions()
+                for session in list(host.sessions.values()):
+                    session.join()
+            host.hub.stop()
+            elapsed = time.monotonic() - begin
+            for client in clients:
+                client.disconnect()
+        return LoadTestReport(
+            len(started), sum(session.state.round for session in started), elapsed,
+            [session.tickStats for session in started], emulator.stats()
+        )
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Load test Whack A Mole sessions on virtual pads over pseudo-terminals.')
+    parser.add_argument('--pads', type=int, default=16)
+    parser.add_argument('--players', type=int, default=2, help='players per session')
+    parser.add_argument('--tick-rate', type=float, default=5.0, help='rounds per second of each session')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to play')
+    parser.add_argument('--protocol', choices=[protocol.name for protocol in WireProtocol],
+                        default=WireProtocol.SEEDED.name, help='highest protocol of pad firmware')
+    parser.add_argument('--reaction', type=float, default=0.1, help='mean reaction time in seconds')
+    parser.add_argument('--jitter', type=float, default=0.03, help='standard deviation of reaction time')
+    parser.add_argument('--hit-rate', type=float, default=0.5)
+    parser.add_argument('--garbage', type=float, default=0.0, help='probability of line noise before an answer')
+    parser.add_argument('--disconnect', type=float, default=0.0, help='probability of dropping off the line per round')
+    parser.add_argument('--disconnect-time', type=float, default=2.0)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], default='WARNING',
+                        help='level of game loop and device logs')
+    args = parser.parse_args(argv)
+    behavior = PadBehavior(
+        WireProtocol[args.protocol], args.reaction, args.jitter, args.hit_rate,
+        garbageRate=args.garbage, disconnectRate=args.disconnect, disconnectTime=args.disconnect_time
+    )
+    logging.basicConfig(level=args.log_level)
+    report = run_load_test(args.pads, behavior, args.duration, args.tick_rate, args.players, args.seed)
+    for key, value in report.summary().items():
+        print(f'{key:>18} : {value:.3f}' if isinstance(value, float) else f'{key:>18} : {value}')
+
+
+if __name__ == '__main__':
+    main()
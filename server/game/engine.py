@@ -0,0 +1,168 @@
+"""
+Game engine in a separate process from UI.
+Engine process runs GameManager without UI, and writes what UI needs into a StateBridge.
+UI process controls it through EngineProcess, which has the same interface as GameManager for UIController.
+"""
+from __future__ import annotations
+
+import enum
+import logging
+import multiprocessing
+from multiprocessing.connection import Connection
+from typing import Any, Final, NamedTuple, Optional
+
+from .bridge import StateBridge
+from .events import GameEventType
+from .game import GameManager
+from .game_object import TICK_RATE
+
+__all__ = (
+    'ENGINE_PUBLISH_RATE',
+    'EngineCommandType',
+    'EngineCommand',
+    'handle_command',
+    'run_engine',
+    'EngineProcess'
+)
+
+ENGINE_PUBLISH_RATE: Final[int] = 120   # times per second engine writes drained events into the bridge.
+JOIN_TIMEOUT: Final[float] = 5.0
+
+
+class EngineCommandType(enum.IntEnum):
+    START = 0           # args : tickRate
+    START_SHARDED = 1   # args : workers, tickRate
+    SHUTDOWN = 2
+    USE_TEST_CLIENTS = 3    # args : count
+    EXIT = 4
+    START_TOURNAMENT = 5    # args : format, tickRate
+    START_REPLAY = 6        # args : path, realTime
+
+
+class EngineCommand(NamedTuple):
+    type: EngineCommandType
+    args: tuple[Any, ...] = ()
+
+
+def handle_command(manager: GameManager, command: EngineCommand):
+    """
+    Run a command on engine's GameManager. EXIT is handled by run_engine.
+    """
+    if command.type is EngineCommandType.START:
+        manager.start_sessions(*command.args)
+    elif command.type is EngineCommandType.START_SHARDED:
+        manager.start_sharded_sessions(*command.args)
+    elif command.type is EngineCommandType.SHUTDOWN:
+        manager.shutdown_sessions()
+    elif command.type is EngineCommandType.START_TOURNAMENT:
+        manager.start_tournament(*command.args)
+    elif command.type is EngineCommandType.START_REPLAY:
+        manager.start_replay(*command.args)
+    elif command.type is EngineCommandType.USE_TEST_CLIENTS:
+        manager.use_test_clients(*command.args)
+
+
+def run_engine(bridgeName: str, conn: Connection, logLevel: int = logging.INFO):
+    """
+    Entry point of engine process.
+    :param bridgeName: name of StateBridge shared memory, created by UI process.
+    :param conn: pipe where UI process sends EngineCommands.
+    :param logLevel: level of engine's logger.
+    """
+    logging.basicConfig(level=logLevel)
+    logger = logging.getLogger('wam.engine')
+    bridge = StateBridge.attach(bridgeName)
+    manager = GameManager(logger)
+    interval = 1 / ENGINE_PUBLISH_RATE
+    handled = 0
+    try:
+        while True:
+            if conn.poll(interval):
+                command: EngineCommand = conn.recv()
+                handled += 1
+                if command.type is EngineCommandType.EXIT:
+                    manager.shutdown_sessions()
+                    break
+                handle_command(manager, command)
+            for event in manager.events.drain():
+                if event.type is GameEventType.LOG:
+                    bridge.push_log(event.payload)
+                else:
+                    bridge.publish(event.payload, event.source)
+            # Running count is written before handled commands, so UI never sees a handled start without its sessions.
+            bridge.set_running(
+                len(manager.sessions)
+                + (manager.shards is not None and manager.shards.isRunning)
+                + (manager.tournament is not None and manager.tournament.isRunning)
+            )
+            bridge.set_handled_commands(handled)
+    finally:
+        bridge.set_running(0)
+        bridge.close()
+        conn.close()
+
+
+class EngineProcess:
+    """
+    Engine process, seen from UI process. Drop-in replacement of GameManager for UIController :
+    commands are sent over a pipe, and `events` drains the StateBridge.
+    """
+    def __init__(self, logger, bridge: Optional[StateBridge] = None):
+        self.logger = logger
+        self.bridge = bridge or StateBridge.create()
+        self.events = self.bridge
+        self._conn: Optional[Connection] = None
+        self._process: Optional[multiprocessing.Process] = None
+        self._sentCommands = 0
+        self._startCommand = -1     # number of the last start command. Sessions are starting until engine handles it.
+
+    def start(self, logLevel: int = logging.INFO):
+        context = multiprocessing.get_context('spawn')
+        remote, self._conn = context.Pipe(duplex=False)
+        self._process = context.Process(
+            target=run_engine, args=(self.bridge.name, remote, logLevel), name='WamEngine', daemon=True
+        )
+        self._process.start()
+        remote.close()
+        self.logger.info(f'EngineProcess >>> Started engine process. (bridge : {self.bridge.name})')
+
+    def _send(self, commandType: EngineCommandType, *args):
+        self._conn.send(EngineCommand(commandType, args))
+        self._sentCommands += 1
+
+    @property
+    def is_running(self) -> bool:
+        return self.bridge.runningSessions > 0 or self.bridge.handledCommands < self._startCommand
+
+    def start_sessions(self, tickRate: float = TICK_RATE):
+        self._send(EngineCommandType.START, tickRate)
+        self._startCommand = self._sentCommands
+
+    def start_sharded_sessions(self, workers: Optional[int] = None, tickRate: float = TICK_RATE):
+        self._send(EngineCommandType.START_SHARDED, workers, tickRate)
+        self._startCommand = self._sentCommands
+
+    def start_tournament(self, format: int = 0, tickRate: float = TICK_RATE):
+        self._send(EngineCommandType.START_TOURNAMENT, int(format), tickRate)
+        self._startCommand = self._sentCommands
+
+    def start_replay(self, path: str, realTime: bool = True):
+        self._send(EngineCommandType.START_REPLAY, path, realTime)
+        self._startCommand = self._sentCommands
+
+    def shutdown_sessions(self):
+        self._send(EngineCommandType.SHUTDOWN)
+
+    def use_test_clients(self, count: int = 2):
+        self._send(EngineCommandType.USE_TEST_CLIENTS, count)
+
+    def close(self):
+        """
+        Stop engine process and remove the bridge.
+        """
+        if self._process is not None:
+            self._send(EngineCommandType.EXIT)
+            self._process.join(JOIN_TIMEOUT)
+            self._conn.close()
+            self._process = None
+        self.bridge.close()
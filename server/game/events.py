@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import enum
+from collections import deque
+from typing import Any, Final, Hashable, NamedTuple, Optional
+
+__all__ = (
+    'EVENT_QUEUE_SIZE',
+    'GameEventType',
+    'GameEvent',
+    'EventQueue'
+)
+
+EVENT_QUEUE_SIZE: Final[int] = 1024     # events kept until UI drains them. Oldest events are dropped after this.
+
+
+class GameEventType(enum.IntEnum):
+    LOG = 0         # payload : text to write on event log.
+    SCREEN = 1      # payload : GameSnapshot to draw.
+    RESULT = 2      # payload : GameSnapshot of finished game.
+
+
+class GameEvent(NamedTuple):
+    type: GameEventType
+    payload: Any
+    source: Optional[Hashable] = None   # session which published the event.
+
+
+class EventQueue:
+    """
+    Bounded queue between game threads and UI thread.
+    Game threads publish events, and UI drains them at its own frame rate.
+
+    Nothing here takes a lock : deque.append, deque.popleft, and single dict operations are atomic.
+    Screen updates are coalesced per source while publishing, so that UI only draws the latest GameSnapshot
+    of each session no matter how many rounds were run between two frames.
+    """
+    __slots__ = ('_events', '_screens', 'dropped')
+
+    def __init__(self, maxSize: int = EVENT_QUEUE_SIZE):
+        self._events: deque[GameEvent] = deque(maxlen=maxSize)
+        self._screens: dict[Optional[Hashable], GameEvent] = {}     # source -> latest screen update, not drained yet.
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._events) + len(self._screens)
+
+    def publish(self, eventType: GameEventType, payload: Any = None, source: Optional[Hashable] = None):
+        """
+        Publish event from game thread.
+        :param eventType: type of event.
+        :param payload: data of event.
+        :param source: session which publishes the event.
+        """
+        event = GameEvent(eventType, payload, source)
+        if eventType is GameEventType.SCREEN:
+            self._screens[source] = event
+            return
+        events = self._events
+        if len(events) == events.maxlen:
+            self.dropped += 1
+        events.append(event)
+
+    def drain(self) -> list[GameEvent]:
+        """
+        Take every published event. Called from UI thread.
+        :return: events in published order, with latest screen update of each source placed last.
+        """
+        drained = []
+        events = self._events
+        while True:
+            try:
+                drained.append(events.popleft())
+            except IndexError:
+                break
+        # Result event draws final screen by itself.
+        finished = {event.source for event in drained if event.type is GameEventType.RESULT}
+        screens = self._screens
+        for source in list(screens):
+            screen = screens.pop(source, None)
+            if screen is not None and source not in finished:
+                drained.append(screen)
+        return drained
@@ -1,46 +1,319 @@
-from typing import Optional
-from .device import WhackAMoleClient
+import itertools
+import threading
+from typing import Callable, Optional
+from .capture import CAPTURE_PATH, SerialCapture
+from .device import WhackAMoleClient, FakeWAMClient, SerialHub
+from .events import EventQueue, GameEventType
 from .game_data import GameClientData, GameServerData
-from .game_object import Player, GameInfo, GameSession
+from .game_object import Player, GameInfo, GameSession, TICK_RATE
+from .recording import RECORD_DIRECTORY
+from .snapshot import GameSnapshot
+from .targeting import TargetMode, assign_teams
 
+PLAYERS_PER_SESSION = 2
 
-class GameManager:
-    current_session: Optional[GameSession]
-    clients: list[WhackAMoleClient]
 
-    def __init__(self, logger, *, ui=None):
+class SessionHost:
+    """
+    Runs sessions and publishes their events. GameSession calls back into its host (`GameSession.game`).
+    GameManager is the host in UI process. Worker processes use their own host. (workers.ShardHost)
+    """
+    sessions: dict[int, GameSession]    # session id -> running session.
+    clients: list
+    events: EventQueue      # game threads -> consumer. UI drains it with UIController.drain_events().
+    hub: SerialHub          # shared reader of every session's pads.
+    finishListeners: list[Callable[[GameSession], None]]    # called with each session removed from the registry.
+    recordDirectory: Optional[str]      # directory where sessions are recorded. Sessions are not recorded if None.
+
+    def __init__(self, logger, clients: Optional[list] = None, recordDirectory: Optional[str] = RECORD_DIRECTORY):
         self.logger = logger
-        logger.info('Initializing GameManager instance...')
-        self.current_session = None
-        logger.info('GameManager >>> Connecting Whack A Mole Clients')
-        self.clients = WhackAMoleClient.search()
-        logger.info(f'GameManager >>> Connected {len(self.clients)} clients.')
-        self.ui = ui
-        ui.bind_game_manager(self)
-        logger.info('GameManager >>> Bind UI Controller interface.')
+        self.sessions = {}
+        self._sessionLock = threading.RLock()
+        self._sessionIds = itertools.count(1)
+        self.events = EventQueue()
+        self.hub = SerialHub()
+        self.clients = [] if clients is None else clients
+        self.finishListeners = []
+        self.recordDirectory = recordDirectory
+
+    # Session registry
+    @property
+    def current_session(self) -> Optional[GameSession]:
+        """
+        Most recently created session which is still registered.
+        """
+        with self._sessionLock:
+            return self.sessions[max(self.sessions)] if self.sessions else None
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self.sessions)
+
+    def add_session(self, session: GameSession) -> int:
+        """
+        Register session. Called by GameSession.create().
+        :param session: session to register.
+        :return: id of the session.
+        """
+        with self._sessionLock:
+            sessionId = next(self._sessionIds)
+            session.sessionId = sessionId
+            self.sessions[sessionId] = session
+        return sessionId
 
-    def create_session(self) -> 'GameSession':
+    def remove_session(self, session: GameSession):
+        """
+        Unregister session. Called from session's game thread when the game is over.
+        Finish listeners are called after the session's pads are free, on the same thread.
+        """
+        with self._sessionLock:
+            self.sessions.pop(session.sessionId, None)
+            listeners = list(self.finishListeners)
+        for listener in listeners:
+            listener(session)
+
+    def busy_clients(self) -> set[int]:
+        """
+        Get ids (`id(client)`) of clients used by registered sessions.
+        """
+        with self._sessionLock:
+            return {id(client) for session in self.sessions.values() for client in session.clients}
+
+    def idle_clients(self) -> list:
+        """
+        Get clients which are not used by any registered session.
+        """
+        busy = self.busy_clients()
+        return [client for client in self.clients if id(client) not in busy]
+
+    def create_session(
+            self,
+            clients: Optional[list] = None,
+            tickRate: float = TICK_RATE,
+            mode: TargetMode = TargetMode.NEXT_ALIVE,
+            teams: Optional[list[int]] = None
+    ) -> 'GameSession':
+        """
+        Create new session.
+        :param clients: clients to play in the session. Idle clients are used if not given.
+        :param tickRate: rounds per second.
+        :param mode: targeting rule of the session.
+        :param teams: team number of each client. In TargetMode.TEAM, clients are split into two teams if not given.
+        :return: created GameSession, registered but not started.
+        """
         self.logger.info('GameManager >>> Create new session.')
-        session = GameSession.create(gameManager=self)
+        with self._sessionLock:
+            if clients is None:
+                clients = self.idle_clients()[:PLAYERS_PER_SESSION]
+            if teams is None and mode is TargetMode.TEAM:
+                teams = assign_teams(len(clients))
+            session = GameSession.create(gameManager=self, tickRate=tickRate, clients=clients, mode=mode, teams=teams)
+        return session
+
+    def create_sessions(
+            self,
+            tickRate: float = TICK_RATE,
+            playersPerSession: int = PLAYERS_PER_SESSION,
+            mode: TargetMode = TargetMode.NEXT_ALIVE
+    ) -> list[GameSession]:
+        """
+        Group every idle client into sessions.
+        :param tickRate: rounds per second.
+        :param playersPerSession: number of players in each session.
+        :param mode: targeting rule of the sessions.
+        :return: created sessions, registered but not started.
+        """
+        sessions = []
+        with self._sessionLock:
+            for group in pair_clients(self.idle_clients(), playersPerSession):
+                sessions.append(self.create_session(group, tickRate, mode))
+        self.logger.info(f'GameManager >>> Created {len(sessions)} sessions.')
+        return sessions
+
+    def start_sessions(
+            self,
+            tickRate: float = TICK_RATE,
+            playersPerSession: int = PLAYERS_PER_SESSION,
+            mode: TargetMode = TargetMode.NEXT_ALIVE
+    ) -> list[GameSession]:
+        """
+        Group every idle client into sessions, and start them. Each session runs on its own game thread.
+        :param tickRate: rounds per second.
+        :param playersPerSession: number of players in each session.
+        :param mode: targeting rule of the sessions.
+        :return: started sessions.
+        """
+        sessions = self.create_sessions(tickRate, playersPerSession, mode)
+        for session in sessions:
+            session.run()
+        return sessions
+
+    def start_replay(self, path: str, realTime: bool = True) -> GameSession:
+        """
+        Replay a recorded session on a game thread, as if it was played now.
+        :param path: path of the session recording.
+        :param realTime: if True, replay at the recorded tick rate. Else, as fast as possible.
+        :return: started replay.ReplaySession.
+        """
+        from .replay import ReplaySession
+        session = ReplaySession.open(path, self, realTime)
+        session.run()
         return session
 
-    def write_event_log(self, text: str = None):
-        self.ui.write_text(text)
+    def shutdown_sessions(self):
+        with self._sessionLock:
+            sessions = list(self.sessions.values())
+        for session in sessions:
+            session.shutdown()
+
+    # Methods below are called from game threads. They only publish events, and consumer applies them.
+    def write_event_log(self, text: str = None, session: Optional[GameSession] = None):
+        self.events.publish(GameEventType.LOG, text, self._source(session))
 
-    def write_error_log(self, e: Exception, extra_text: str = None):
+    def write_error_log(self, e: Exception, extra_text: str = None, session: Optional[GameSession] = None):
         text = str(e) + '\n'
         if extra_text:
             text += extra_text + '\n'
-        self.ui.write_text(text)
+        self.events.publish(GameEventType.LOG, text, self._source(session))
 
     def display_game_screen(self):
         pass
 
-    def update_screen(self, gameInfo: GameInfo = None):
-        self.logger.debug('Update screen.')
-        self.ui.update_game_info(gameInfo or self.current_session.gameInfo)
+    def update_screen(self, snapshot: GameSnapshot = None, session: Optional[GameSession] = None):
+        session = session or self.current_session
+        self.events.publish(GameEventType.SCREEN, snapshot or session.snapshot, self._source(session))
 
-    def show_result(self, gameInfo: GameInfo = None):
+    def show_result(self, snapshot: GameSnapshot = None, session: Optional[GameSession] = None):
         self.logger.debug('Show game result screen.')
-        self.ui.update_game_info(gameInfo or self.current_session.gameInfo)
-        self.current_session = None
+        session = session or self.current_session
+        self.events.publish(GameEventType.RESULT, snapshot or session.snapshot, self._source(session))
+
+    @staticmethod
+    def _source(session: Optional[GameSession]) -> Optional[int]:
+        return None if session is None else session.sessionId
+
+
+def pair_clients(clients: list, size: int = PLAYERS_PER_SESSION) -> list[list]:
+    """
+    Split clients into sessions' player lists of `size` players. Left over clients do not play.
+    """
+    if size < 2:
+        raise ValueError(f'Session needs at least 2 players, not {size}')
+    return [clients[i:i + size] for i in range(0, len(clients) - size + 1, size)]
+
+
+class GameManager(SessionHost):
+    shards: Optional['ShardPool']   # worker processes running sessions, if sharded sessions were started.
+    tournament: Optional['Tournament']  # tournament scheduling matches on sessions, if started.
+    capture: Optional[SerialCapture]    # raw serial capture of every client, if started.
+
+    def __init__(self, logger, *, ui=None):
+        logger.info('Initializing GameManager instance...')
+        super().__init__(logger)
+        self.shards = None
+        self.tournament = None
+        self.capture = None
+        logger.info('GameManager >>> Connecting Whack A Mole Clients')
+        self.clients = WhackAMoleClient.search()
+        logger.info(f'GameManager >>> Connected {len(self.clients)} clients.')
+        # UI is None when GameManager runs in engine process. (engine.run_engine)
+        self.ui = ui
+        if ui is not None:
+            ui.bind_game_manager(self)
+            logger.info('GameManager >>> Bind UI Controller interface.')
+
+    def use_test_clients(self, count: int = 2):
+        """
+        Replace clients with FakeWAMClients, to run test game without pads.
+        """
+        self.clients = [
+            FakeWAMClient(name=f'Player{i}', port=f'FakeSerialPort/{i}', clientNumber=i) for i in range(count)
+        ]
+
+    def use_virtual_pads(self, count: int = 2, behavior: Optional['PadBehavior'] = None) -> 'PadEmulator':
+        """
+        Replace clients with WhackAMoleClients on virtual pads, to run games through the serial stack without pads.
+        :return: started emulator.PadEmulator. Stop it after the games.
+        """
+        from .emulator import PadBehavior, PadEmulator
+        emulator = PadEmulator(count, behavior or PadBehavior()).start()
+        self.clients = emulator.clients()
+        return emulator
+
+    @property
+    def is_running(self) -> bool:
+        return (
+            bool(self.sessions)
+            or (self.shards is not None and self.shards.isRunning)
+            or (self.tournament is not None and self.tournament.isRunning)
+        )
+
+    def busy_clients(self) -> set[int]:
+        busy = super().busy_clients()
+        if self.shards is not None and self.shards.isRunning:
+            busy.update(id(client) for client in self.shards.clients)
+        return busy
+
+    # Sharded sessions
+    def start_sharded_sessions(self, workers: Optional[int] = None, tickRate: float = TICK_RATE) -> int:
+        """
+        Pair every idle client into sessions, and run them in worker processes instead of game threads.
+        Each worker owns serial ports of its sessions, and streams events back to this process's `events`.
+        :param workers: number of worker processes. Default is number of cores, except one for UI.
+        :param tickRate: rounds per second.
+        :return: number of started sessions.
+        """
+        from .workers import ShardPool
+        if self.shards is not None and self.shards.isRunning:
+            raise ValueError('Sharded sessions are already running')
+        pairs = pair_clients(self.idle_clients())
+        self.shards = ShardPool(self.events, self.logger, workers=workers, recordDirectory=self.recordDirectory)
+        self.shards.start(pairs, tickRate)
+        self.logger.info(f'GameManager >>> Started {len(pairs)} sessions on {self.shards.workers} worker processes.')
+        return len(pairs)
+
+    # Raw serial capture
+    def start_capture(self, path: str = CAPTURE_PATH) -> SerialCapture:
+        """
+        Capture every byte exchanged with the clients into a ring file. Analyze it with `python -m server.game.capture_analysis`.
+        """
+        self.stop_capture()
+        self.capture = SerialCapture(path)
+        for client in self.clients:
+            client.start_capture(self.capture)
+        self.logger.info(f'GameManager >>> Capturing serial I/O of {len(self.clients)} clients into {path}.')
+        return self.capture
+
+    def stop_capture(self):
+        if self.capture is None:
+            return
+        for client in self.clients:
+            client.stop_capture()
+        self.capture.close()
+        self.capture = None
+
+    # Tournament
+    def start_tournament(self, format: int = 0, tickRate: float = TICK_RATE) -> 'Tournament':
+        """
+        Run a tournament of every idle client. Matches start by themselves whenever their pads are free.
+        :param format: tournament.TournamentFormat of the tournament.
+        :param tickRate: rounds per second of each match.
+        :return: started Tournament.
+        """
+        from .tournament import Tournament
+        if self.tournament is not None and self.tournament.isRunning:
+            raise ValueError('Tournament is already running')
+        if self.tournament is not None:
+            self.finishListeners.remove(self.tournament.on_session_finished)
+        self.tournament = Tournament(self, format, tickRate=tickRate)
+        self.finishListeners.append(self.tournament.on_session_finished)
+        self.tournament.start()
+        return self.tournament
+
+    def shutdown_sessions(self):
+        # Tournament is cancelled first, so that it does not start new matches of stopped sessions.
+        if self.tournament is not None:
+            self.tournament.cancel()
+        super().shutdown_sessions()
+        if self.shards is not None:
+            self.shards.shutdown()
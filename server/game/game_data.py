@@ -1,14 +1,134 @@
 from __future__ import annotations
 
+import enum
 from typing import List, Optional, Dict, Final, Any, ClassVar
 from itertools import chain
 
+from .parse import FrameSchema, BOOL_TRUE_CHARS, BOOL_FALSE_CHARS
+
 
 DATA_SPLIT_CHAR: Final[str] = ';'
 
 _serialize_data = lambda *data: DATA_SPLIT_CHAR.join(data)
 
 
+"""
+Binary wire protocol.
+Every byte of binary frame has its most significant bit set, so binary frames never contain
+line terminators (LF, CR) and can be told apart from text frames by their first byte.
+Header byte is the text prefix of the frame with most significant bit set.
+Payload values are packed as little-endian groups of 7 bits.
+"""
+BINARY_FLAG: Final[int] = 0x80
+PAYLOAD_BITS: Final[int] = 7
+PAYLOAD_MASK: Final[int] = 0x7F
+SEQUENCE_MOD: Final[int] = 1 << PAYLOAD_BITS      # sequence number wraps around in single payload byte.
+TILE_BITS: Final[int] = 3
+TILE_MASK: Final[int] = (1 << TILE_BITS) - 1
+MAP_SIZE: Final[int] = 9
+
+
+class WireProtocol(enum.IntEnum):
+    """
+    Data format used between server and client.
+    Negotiated when the pad connects. TEXT is used as a fallback.
+    """
+    TEXT = 0
+    BINARY = 1
+    BINARY_DELTA = 2    # BINARY, and map updates may be sent as GameServerDeltaData.
+    SEEDED = 3          # BINARY_DELTA, and pad generates maps itself from GameSeedData and GameRoundData.
+
+
+class MalformedFrameError(ValueError):
+    """Raised when frame is malformed."""
+
+
+class BinaryFrameError(MalformedFrameError):
+    """Raised when binary frame is malformed."""
+
+
+def _pack_payload(value: int, length: int) -> bytes:
+    """
+    Pack integer into `length` payload bytes.
+    :param value: non-negative integer which fits in `length * 7` bits.
+    :param length: number of payload bytes.
+    :return: packed bytes, each byte has most significant bit set.
+    """
+    return bytes(BINARY_FLAG | ((value >> (PAYLOAD_BITS * i)) & PAYLOAD_MASK) for i in range(length))
+
+
+def _unpack_payload(data: bytes) -> int:
+    """
+    Unpack payload bytes packed by _pack_payload.
+    :param data: packed bytes.
+    :return: unpacked integer.
+    """
+    value = 0
+    for i, byte in enumerate(data):
+        if not byte & BINARY_FLAG:
+            raise BinaryFrameError(f'Invalid payload byte {byte:#04x} in binary frame {data!r}')
+        value |= (byte & PAYLOAD_MASK) << (PAYLOAD_BITS * i)
+    return value
+
+
+class GameProtocolData:
+    """
+    Represents protocol negotiation data (server <-> client).
+    Server sends the highest protocol version it supports, and client answers with the version it will use.
+
+    Structure:
+        p;(protocol: integer)
+    """
+
+    # Class Constant
+    prefix: Final[ClassVar[str]] = 'p'
+    schema: Final[ClassVar[FrameSchema]] = FrameSchema.compile(prefix + DATA_SPLIT_CHAR + 'int', name='protocol')
+
+    protocol: WireProtocol
+
+    @classmethod
+    def deserialize(cls, data: str) -> GameProtocolData:
+        """
+        Parse protocol negotiation data into Python object.
+        Unknown protocol versions fall back to WireProtocol.TEXT.
+
+        Args:
+            data (str) : raw data to parse.
+        Returns:
+            GameProtocolData object.
+        """
+        values = cls.schema.parse(data.strip().encode('utf-8'))
+        if values is None or values[0] not in WireProtocol._value2member_map_:
+            return cls(WireProtocol.TEXT)
+        return cls(WireProtocol(values[0]))
+
+    def __init__(self, protocol: WireProtocol):
+        self.protocol = protocol
+
+    def serialize(self) -> str:
+        return self.prefix + DATA_SPLIT_CHAR + str(int(self.protocol))
+
+
+"""
+Client frame lookup table.
+Client text frames have only a few valid forms, so every valid frame is parsed with CLIENT_SCHEMA once,
+into a table of frame bytes -> (is_hit, hit_index). Parsing a frame is a single dict lookup.
+"""
+CLIENT_SCHEMA: Final[FrameSchema] = FrameSchema.compile('c;bool;int?', name='client')
+
+
+def _build_client_frame_table() -> dict[bytes, tuple[bool, Optional[int]]]:
+    table: dict[bytes, tuple[bool, Optional[int]]] = {}
+    for token in (*BOOL_TRUE_CHARS, *BOOL_FALSE_CHARS):
+        for suffix in ('', DATA_SPLIT_CHAR, *(f'{DATA_SPLIT_CHAR}{index}' for index in range(MAP_SIZE))):
+            frame = f'c{DATA_SPLIT_CHAR}{token}{suffix}'.encode('ascii')
+            table[frame] = CLIENT_SCHEMA.parse(frame)
+    return table
+
+
+CLIENT_FRAME_TABLE: Final[dict[bytes, tuple[bool, Optional[int]]]] = _build_client_frame_table()
+
+
 class GameClientData:
     """
     Represents data sent from client (client -> server)
@@ -19,10 +139,35 @@ class GameClientData:
 
     # Class Constant
     prefix: Final[ClassVar[str]] = 'c'
+    binaryHeader: Final[ClassVar[int]] = ord(prefix) | BINARY_FLAG
+    binaryHeaderByte: Final[ClassVar[bytes]] = bytes((binaryHeader,))
+    binaryLength: Final[ClassVar[int]] = 4      # header, sequence, hit bitmask (2 bytes)
 
     # Instance attribute
     isHit: bool
     hitIndex: Optional[int]
+    sequence: Optional[int]
+
+    @classmethod
+    def parse_frame(cls, frame: bytes, player=None) -> Optional[GameClientData]:
+        """
+        Parse raw client frame (text or binary) into Python object.
+        Text frames are looked up in CLIENT_FRAME_TABLE, so no tokenizing is done.
+
+        Args:
+            frame (bytes) : raw frame to parse, without line terminator.
+        Returns:
+            GameClientData object, or None if the frame is not a valid client frame.
+        """
+        parsed = CLIENT_FRAME_TABLE.get(frame)
+        if parsed is not None:
+            return cls(parsed[0], parsed[1], player=player)
+        if frame[:1] == cls.binaryHeaderByte:
+            try:
+                return cls.deserialize_binary(frame, player)
+            except BinaryFrameError:
+                return None
+        return None
 
     @classmethod
     def deserialize(cls, data: str, player=None) -> GameClientData:
@@ -37,37 +182,85 @@ class GameClientData:
         Data Args:
             is_hit : bool
                 boolean value which indicates whether any of tiles are hit.
+                `True`, `true`, `False`, `false` are valid.
             hit_index : Optional[int]
-                index of tile being hit.
+                index of tile being hit. (0~8)
 
         Args:
             data (str) : raw data to parse.
         Returns:
             GameClientData object.
+        Raises:
+            MalformedFrameError : if data is not a valid client data.
         """
-        string_params: list[str] = data.split(DATA_SPLIT_CHAR)[1:]     # ['c', '(is_hit)', '(hit_index)'] -> 0번째에 들어있는
+        parsed = CLIENT_FRAME_TABLE.get(data.strip().encode('utf-8'))
+        if parsed is None:
+            raise MalformedFrameError(f'Invalid client data {data!r}')
+        return cls(
+            parsed[0],
+            parsed[1],
+            player=player
+        )
+
+    @classmethod
+    def deserialize_binary(cls, data: bytes, player=None) -> GameClientData:
+        """
+        Parse binary client->server frame into Python object.
 
-        is_hit = eval(string_params[0])
-        hit_index = int(string_params[1]) if len(string_params) == 2 and string_params[1].isdigit() else None
+        Frame Format:
+            header (1 byte) | sequence (1 byte) | hit_mask (2 bytes)
 
+        Frame Args:
+            sequence : int
+                sequence number of the server frame this input answers.
+            hit_mask : int (9 bits)
+                bitmask of tiles being hit. bit `i` is set if tile `i` is hit.
+
+        Args:
+            data (bytes) : raw frame to parse, without line terminator.
+        Returns:
+            GameClientData object.
+        """
+        if len(data) != cls.binaryLength or data[0] != cls.binaryHeader:
+            raise BinaryFrameError(f'Invalid binary client frame {data!r}')
+        sequence = _unpack_payload(data[1:2])
+        hit_mask = _unpack_payload(data[2:])
+        if hit_mask >> MAP_SIZE:
+            raise BinaryFrameError(f'Invalid hit mask {hit_mask:#x} in binary client frame {data!r}')
+        # Lowest hit tile is handled, since a round handles single hit per player.
+        hit_index = (hit_mask & -hit_mask).bit_length() - 1 if hit_mask else None
         return cls(
-            is_hit,
+            hit_mask != 0,
             hit_index,
-            player=player
+            player=player,
+            sequence=sequence
         )
 
     def __init__(
             self,
             isHit: bool,
             hitIndex: int,
-            player=None
+            player=None,
+            sequence: Optional[int] = None
     ):
         self.player = player
         self.isHit: bool = isHit
         self.hitIndex: int = hitIndex
+        self.sequence: Optional[int] = sequence
+        self.receivedAt: Optional[int] = None   # monotonic_ns when server received the data. (Player.receiveData)
 
     def serialize(self) -> str:
-        return DATA_SPLIT_CHAR.join((self.prefix, self.isHit, self.hitIndex))
+        if self.isHit:
+            return DATA_SPLIT_CHAR.join((self.prefix, str(self.isHit), str(self.hitIndex)))
+        return DATA_SPLIT_CHAR.join((self.prefix, str(self.isHit)))
+
+    def serialize_binary(self) -> bytes:
+        hit_mask = 1 << self.hitIndex if self.isHit and self.hitIndex is not None else 0
+        return (
+            bytes((self.binaryHeader,))
+            + _pack_payload((self.sequence or 0) % SEQUENCE_MOD, 1)
+            + _pack_payload(hit_mask, 2)
+        )
 
 
 class GameServerData:
@@ -80,8 +273,11 @@ class GameServerData:
 
     # Class Constant
     prefix: Final[ClassVar[str]] = 's'
+    binaryHeader: Final[ClassVar[int]] = ord(prefix) | BINARY_FLAG
+    binaryLength: Final[ClassVar[int]] = 6      # header, sequence, map_data (4 bytes)
 
     mapData: list[int]
+    sequence: Optional[int]
 
     @classmethod
     def deserialize(cls, data: str) -> GameServerData:
@@ -115,11 +311,39 @@ class GameServerData:
 
         return cls(mapData)
 
+    @classmethod
+    def deserialize_binary(cls, data: bytes) -> GameServerData:
+        """
+        Parse binary server->client frame into Python object.
+
+        Frame Format:
+            header (1 byte) | sequence (1 byte) | map_data (4 bytes)
+
+        Frame Args:
+            sequence : int
+                round sequence number, wraps around at 128.
+            map_data : int (27 bits)
+                item number of each tile, packed in 3 bits. tile `i` uses bits `3*i ~ 3*i+2`.
+
+        Args:
+            data (bytes) : raw frame to parse, without line terminator.
+        Returns:
+            GameServerData object.
+        """
+        if len(data) != cls.binaryLength or data[0] != cls.binaryHeader:
+            raise BinaryFrameError(f'Invalid binary server frame {data!r}')
+        sequence = _unpack_payload(data[1:2])
+        packed = _unpack_payload(data[2:])
+        mapData = [(packed >> (TILE_BITS * i)) & TILE_MASK for i in range(MAP_SIZE)]
+        return cls(mapData, sequence=sequence)
+
     def __init__(
             self,
-            mapData: list[int]
+            mapData: list[int],
+            sequence: Optional[int] = None
     ):
         self.mapData = mapData
+        self.sequence = sequence
 
     def serialize(self):
         # chain(iter[iter]) -> exhaust first iterable, then exhaust second iterable,
@@ -127,9 +351,267 @@ class GameServerData:
         # chain(self.map_data) = [0, 1, 2] -> [3, 4, 5] -> [6, 7, 8]
         return self.prefix + DATA_SPLIT_CHAR + DATA_SPLIT_CHAR.join(map(str, self.mapData))
 
+    def serialize_binary(self) -> bytes:
+        packed = 0
+        for i, item in enumerate(self.mapData):
+            packed |= (item & TILE_MASK) << (TILE_BITS * i)
+        return (
+            bytes((self.binaryHeader,))
+            + _pack_payload((self.sequence or 0) % SEQUENCE_MOD, 1)
+            + _pack_payload(packed, 4)
+        )
+
     # Presets
     @classmethod
     def connectedNotification(cls, player_num: int):
         return cls(mapData=[player_num]*9)  # Blink client's pad with color based on player number
 
 
+class GameServerDeltaData:
+    """
+    Represents map update data send to client (server -> client), which only contains changed tiles.
+    Client applies changes only if its current map is the base map. Otherwise, it ignores the frame and
+    keeps answering with its current sequence, so the server sends full map (keyframe) next round.
+
+    Structure:
+        d;(sequence: integer);(base_sequence: integer);(change: index and item digits)...
+    """
+
+    # Class Constant
+    prefix: Final[ClassVar[str]] = 'd'
+    schema: Final[ClassVar[FrameSchema]] = FrameSchema.compile(prefix + DATA_SPLIT_CHAR + 'int;int;str*?', name='delta')
+    binaryHeader: Final[ClassVar[int]] = ord(prefix) | BINARY_FLAG
+    binaryHeaderLength: Final[ClassVar[int]] = 3    # header, sequence, base_sequence
+
+    changes: list[tuple[int, int]]
+    sequence: int
+    baseSequence: int
+
+    @classmethod
+    def between(cls, baseMap: list[int], mapData: list[int], sequence: int, baseSequence: int) -> GameServerDeltaData:
+        """
+        Build delta data which changes baseMap into mapData.
+        :param baseMap: map data which client already has.
+        :param mapData: new map data.
+        :param sequence: sequence number of new map data.
+        :param baseSequence: sequence number of base map data.
+        :return: GameServerDeltaData object.
+        """
+        changes = [(i, item) for i, (old, item) in enumerate(zip(baseMap, mapData)) if old != item]
+        return cls(changes, sequence, baseSequence)
+
+    @classmethod
+    def deserialize(cls, data: str) -> GameServerDeltaData:
+        """
+        Parse raw delta data into Python object.
+
+        Data Format:
+            "d;{sequence};{base_sequence};{change}..."
+
+        Data args:
+            change: string (length : 2)
+                index of changed tile and its new item number.
+                example : 34 (tile 3 is changed into item 4)
+
+        Args:
+            data (str) : raw data to parse.
+        Returns:
+            GameServerDeltaData object.
+        """
+        values = cls.schema.parse(data.strip().encode('utf-8'))
+        if values is None:
+            raise MalformedFrameError(f'Invalid delta data {data!r}')
+        sequence, baseSequence, rawChanges = values
+        changes = []
+        for change in rawChanges.split(DATA_SPLIT_CHAR) if rawChanges else ():
+            if len(change) != 2 or not change.isdigit() or int(change[0]) >= MAP_SIZE:
+                raise MalformedFrameError(f'Invalid change {change!r} in delta data {data!r}')
+            changes.append((int(change[0]), int(change[1])))
+        return cls(changes, sequence, baseSequence)
+
+    @classmethod
+    def deserialize_binary(cls, data: bytes) -> GameServerDeltaData:
+        """
+        Parse binary delta frame into Python object.
+
+        Frame Format:
+            header (1 byte) | sequence (1 byte) | base_sequence (1 byte) | change (1 byte)...
+
+        Frame Args:
+            change : int (7 bits)
+                index of changed tile in upper 4 bits, new item number in lower 3 bits.
+
+        Args:
+            data (bytes) : raw frame to parse, without line terminator.
+        Returns:
+            GameServerDeltaData object.
+        """
+        if len(data) < cls.binaryHeaderLength or data[0] != cls.binaryHeader:
+            raise BinaryFrameError(f'Invalid binary delta frame {data!r}')
+        sequence = _unpack_payload(data[1:2])
+        baseSequence = _unpack_payload(data[2:3])
+        changes = []
+        for byte in data[cls.binaryHeaderLength:]:
+            change = _unpack_payload(bytes((byte,)))
+            index = change >> TILE_BITS
+            if index >= MAP_SIZE:
+                raise BinaryFrameError(f'Invalid tile index {index} in binary delta frame {data!r}')
+            changes.append((index, change & TILE_MASK))
+        return cls(changes, sequence, baseSequence)
+
+    def __init__(
+            self,
+            changes: list[tuple[int, int]],
+            sequence: int,
+            baseSequence: int
+    ):
+        self.changes = changes
+        self.sequence = sequence
+        self.baseSequence = baseSequence
+
+    def apply(self, baseMap: list[int]) -> list[int]:
+        """
+        Apply changes on base map.
+        :param baseMap: map data of base sequence.
+        :return: new map data.
+        """
+        mapData = list(baseMap)
+        for index, item in self.changes:
+            mapData[index] = item
+        return mapData
+
+    def serialize(self) -> str:
+        return DATA_SPLIT_CHAR.join((
+            self.prefix, str(self.sequence), str(self.baseSequence),
+            *(f'{index}{item}' for index, item in self.changes)
+        ))
+
+    def serialize_binary(self) -> bytes:
+        return (
+            bytes((self.binaryHeader,))
+            + _pack_payload(self.sequence % SEQUENCE_MOD, 1)
+            + _pack_payload(self.baseSequence % SEQUENCE_MOD, 1)
+            + bytes(BINARY_FLAG | (index << TILE_BITS) | (item & TILE_MASK) for index, item in self.changes)
+        )
+
+
+class GameSeedData:
+    """
+    Represents map generator setup data send to client once, at session start (server -> client).
+    Pad generates maps with shared map generator specification (server.game.map_generator) using the seed and weights.
+
+    Structure:
+        g;(seed: integer);(item: integer):(weight: integer),...
+    """
+
+    # Class Constant
+    prefix: Final[ClassVar[str]] = 'g'
+    schema: Final[ClassVar[FrameSchema]] = FrameSchema.compile(prefix + DATA_SPLIT_CHAR + 'int;str', name='seed')
+    WEIGHT_SEP_CHAR: Final[ClassVar[str]] = ','
+    ITEM_SEP_CHAR: Final[ClassVar[str]] = ':'
+
+    seed: int
+    itemWeights: list[tuple[int, int]]
+
+    @classmethod
+    def deserialize(cls, data: str) -> GameSeedData:
+        """
+        Parse raw seed data into Python object.
+
+        Data Format:
+            "g;{seed};{item}:{weight},..."
+
+        Data args:
+            seed : int
+                32-bit unsigned seed of pad's map generator.
+            item, weight : int
+                item number and its integer weight.
+                example : 0:50,1:15,2:5,4:20,5:10
+
+        Args:
+            data (str) : raw data to parse.
+        Returns:
+            GameSeedData object.
+        """
+        values = cls.schema.parse(data.strip().encode('utf-8'))
+        if values is None:
+            raise MalformedFrameError(f'Invalid seed data {data!r}')
+        seed, rawWeights = values
+        itemWeights = []
+        for pair in rawWeights.split(cls.WEIGHT_SEP_CHAR):
+            item, _, weight = pair.partition(cls.ITEM_SEP_CHAR)
+            if not (item.isdigit() and weight.isdigit()):
+                raise MalformedFrameError(f'Invalid item weight {pair!r} in seed data {data!r}')
+            itemWeights.append((int(item), int(weight)))
+        return cls(seed, itemWeights)
+
+    def __init__(self, seed: int, itemWeights: list[tuple[int, int]]):
+        self.seed = seed
+        self.itemWeights = itemWeights
+
+    def serialize(self) -> str:
+        return DATA_SPLIT_CHAR.join((
+            self.prefix,
+            str(self.seed),
+            self.WEIGHT_SEP_CHAR.join(f'{item}{self.ITEM_SEP_CHAR}{weight}' for item, weight in self.itemWeights)
+        ))
+
+
+class GameRoundData:
+    """
+    Represents round start data send to client, when pad generates maps itself (server -> client).
+
+    Structure:
+        r;(round: integer)
+    """
+
+    # Class Constant
+    prefix: Final[ClassVar[str]] = 'r'
+    schema: Final[ClassVar[FrameSchema]] = FrameSchema.compile(prefix + DATA_SPLIT_CHAR + 'int', name='round')
+    binaryHeader: Final[ClassVar[int]] = ord(prefix) | BINARY_FLAG
+    binaryLength: Final[ClassVar[int]] = 3      # header, round (2 bytes)
+    ROUND_MOD: Final[ClassVar[int]] = 1 << (PAYLOAD_BITS * 2)
+
+    roundNumber: int
+
+    @classmethod
+    def deserialize(cls, data: str) -> GameRoundData:
+        values = cls.schema.parse(data.strip().encode('utf-8'))
+        if values is None:
+            raise MalformedFrameError(f'Invalid round data {data!r}')
+        return cls(values[0])
+
+    @classmethod
+    def deserialize_binary(cls, data: bytes) -> GameRoundData:
+        """
+        Parse binary round frame into Python object.
+
+        Frame Format:
+            header (1 byte) | round (2 bytes)
+
+        Frame Args:
+            round : int (14 bits)
+                round counter, wraps around at 16384. Lower 7 bits are also the sequence number of the round,
+                which client echoes in its GameClientData.
+
+        Args:
+            data (bytes) : raw frame to parse, without line terminator.
+        Returns:
+            GameRoundData object.
+        """
+        if len(data) != cls.binaryLength or data[0] != cls.binaryHeader:
+            raise BinaryFrameError(f'Invalid binary round frame {data!r}')
+        return cls(_unpack_payload(data[1:]))
+
+    def __init__(self, roundNumber: int):
+        self.roundNumber = roundNumber
+
+    @property
+    def sequence(self) -> int:
+        return self.roundNumber % SEQUENCE_MOD
+
+    def serialize(self) -> str:
+        return self.prefix + DATA_SPLIT_CHAR + str(self.roundNumber)
+
+    def serialize_binary(self) -> bytes:
+        return bytes((self.binaryHeader,)) + _pack_payload(self.roundNumber % self.ROUND_MOD, 2)
@@ -4,26 +4,45 @@ import datetime
 import enum
 import random
 import threading
+import time
 
 import serial
 from typing import Optional, Final, NamedTuple, Callable
 
 from .device import WhackAMoleClient
 from .errors import ImproperSessionPlayers
-from .game_data import GameClientData, GameServerData
+from .game_data import (
+    GameClientData, GameServerData, GameServerDeltaData, GameSeedData, GameRoundData, SEQUENCE_MOD, WireProtocol
+)
+from .map_generator import MapGenerator, SharedMapGenerator, derive_seed
+from .scheduler import TickScheduler, TickStats
+from .state import GameState, NO_SLOT
+from .targeting import TargetMode, TargetIndex
+from .effects import EffectOp, EffectTarget, EffectTable
+from .status import STATUS_BLOCK, StatusEngine
+from .snapshot import GameSnapshot
+from .recording import (
+    INPUT_RESPONDED, INPUT_HIT, RecordedFinish, RecordedInput, RecordingHeader, SessionRecorder
+)
 
 
-ItemHandler = Callable[['GameSession', 'Player', 'Player'], None]
+ItemHandler = Callable[['GameSession', 'Player', Optional['Player']], None]   # opponent is None if player has no target.
 
 __all__ = (
     'PanelItem',
-    'MAX_HP', 'MIN_HP', 'ATTACK_DAMAGE', 'HEAL_AMOUNT',
+    'MAX_HP', 'MIN_HP', 'ATTACK_DAMAGE', 'HEAL_AMOUNT', 'INPUT_TIMEOUT', 'KEYFRAME_INTERVAL', 'TICK_RATE', 'TICK_MARGIN',
+    'BLOCK_DURATION',
+    'item_effects',
     'Player',
     'GameInfo',
     'GameSession'
 )
 
 
+def _no_handler(session: 'GameSession', player: 'Player', opponent: Optional['Player']):
+    pass
+
+
 class PanelItem(enum.Enum):
     """
     Game Item Enum :
@@ -44,15 +63,16 @@ class PanelItem(enum.Enum):
         :param value: value of the enum.
         :return: PanelItem Enum if value is valid. Else, `None` is returned.
         """
-        return next(filter(
-            lambda e: e.value == value,
-            cls.__members__.values()
-        ), None)
+        return cls._value2member_map_.get(value)
 
     @classmethod
     def items(cls) -> tuple[PanelItem, ...]:
         return cls.BLANK, cls.HEAL_SELF, cls.OPPONENT_BLOCK, cls.ATTACK_OPPONENT, cls.HEAL_OPPONENT
 
+    @classmethod
+    def itemValues(cls) -> tuple[int, ...]:
+        return tuple(item.value for item in cls.items())
+
     @classmethod
     def itemWeights(cls) -> tuple[int, ...]:
         # BLANK : 50
@@ -64,12 +84,39 @@ class PanelItem(enum.Enum):
     
     def __init__(self, *args, **kwargs):
         super().__init__()
-        setattr(self, '__handler__', lambda session, player, opponent: None)
+        setattr(self, '__handler__', _no_handler)
+        setattr(self, '__effects__', ())
 
     def set_handler(self, handler_func: ItemHandler):
+        """
+        Set custom handler of the item, for effects which cannot be described with EffectOp.
+        Custom handlers are called after the round's effects are applied.
+        """
         setattr(self, '__handler__', handler_func)
+        return handler_func
+
+    def set_effects(self, *effects: EffectOp):
+        """
+        Set effects of the item. Effects are compiled into EffectTable when a session starts.
+        """
+        setattr(self, '__effects__', effects)
+
+    @property
+    def effects(self) -> tuple[EffectOp, ...]:
+        return getattr(self, '__effects__')
 
-    def handle_item_event(self, session: 'GameSession', player: 'Player', opponent: 'Player'):
+    @property
+    def hasCustomHandler(self) -> bool:
+        return getattr(self, '__handler__') is not _no_handler
+
+    def handle_item_event(self, session: 'GameSession', player: 'Player', opponent: Optional['Player']):
+        """
+        Apply effects of the item one by one. Session resolves rounds with compiled EffectTable instead.
+        """
+        for op in self.effects:
+            target = player if op.target is EffectTarget.SELF else opponent
+            if op.hpDelta and target is not None:
+                target.changeHp(op.hpDelta)
         return getattr(self, '__handler__')(session, player, opponent)
 
     def __int__(self):
@@ -94,27 +141,6 @@ class PanelItem(enum.Enum):
         return f'PanelItem.{self.name}'
 
 
-@PanelItem.HEAL_SELF.set_handler
-def handleHealSelf(session: 'GameSession', player: 'Player', opponent: 'Player'):
-    player.heal()
-
-
-# @PanelItem.OPPONENT_BLOCK.set_handler
-# def handleOpponentBlock(session: 'GameSession', player: 'Player', opponent: 'Player'):
-#     # TODO : Write panel block logic. Maybe just sending empty map?
-#     pass
-
-
-@PanelItem.ATTACK_OPPONENT.set_handler
-def handleAttackOpponent(session: 'GameSession', player: 'Player', opponent: 'Player'):
-    opponent.damage()
-
-
-@PanelItem.HEAL_OPPONENT.set_handler
-def handleHealOpponent(session: 'GameSession', player: 'Player', opponent: 'Player'):
-    opponent.heal()
-
-
 """
 Player object
 """
@@ -123,6 +149,34 @@ MAX_HP: Final[int] = 100          # Currently On Discussion.  # TODO : Fix value
 MIN_HP: Final[int] = 0
 ATTACK_DAMAGE: Final[int] = 10
 HEAL_AMOUNT: Final[int] = 20     # Currently On Discussion.  # TODO : Fix value after the discussion.
+INPUT_TIMEOUT: Final[float] = 1.0  # Seconds to wait for every player's input in a round.
+KEYFRAME_INTERVAL: Final[int] = 16  # Maximum rounds between full map frames, when delta map updates are used.
+TICK_RATE: Final[float] = 1.0       # Rounds per second.
+TICK_MARGIN: Final[float] = 0.02    # Seconds at the end of a round reserved for handling inputs and drawing.
+BLOCK_DURATION: Final[int] = 3      # Rounds the opponent's panel stays blocked by OPPONENT_BLOCK.
+
+
+# Item effects
+def item_effects(
+        attackDamage: int = ATTACK_DAMAGE,
+        healAmount: int = HEAL_AMOUNT,
+        blockDuration: int = BLOCK_DURATION
+) -> dict[PanelItem, tuple[EffectOp, ...]]:
+    """
+    Effects of items, built from balance parameters. Live game uses the default values.
+    Pass the result to EffectTable.compile() to tune items without editing PanelItem. (BatchSimulator)
+    """
+    return {
+        PanelItem.HEAL_SELF: (EffectOp(EffectTarget.SELF, hpDelta=healAmount),),
+        # Every tile of the opponent's panel becomes BLOCKED_TILE while blocked. (GameInfo.buildRandomMap)
+        PanelItem.OPPONENT_BLOCK: (EffectOp(EffectTarget.OPPONENT, status=STATUS_BLOCK, duration=blockDuration),),
+        PanelItem.ATTACK_OPPONENT: (EffectOp(EffectTarget.OPPONENT, hpDelta=-attackDamage),),
+        PanelItem.HEAL_OPPONENT: (EffectOp(EffectTarget.OPPONENT, hpDelta=healAmount),)
+    }
+
+
+for _item, _effects in item_effects().items():
+    _item.set_effects(*_effects)
 
 
 class Player:
@@ -134,28 +188,58 @@ class Player:
     name: str
     session: GameSession
 
-    # Game Data
-    mapData: list[PanelItem]
+    # Game Data, stored in session's GameState.
+    state: GameState
+    slot: int
 
     def __init__(
             self,
             client: WhackAMoleClient,
-            session: GameSession
+            session: GameSession,
+            team: int = 0
     ):
         """
 
         :param client: WhackAMoleClient object connected to this player.
         :param session: GameSession where player is registered.
+        :param team: team number of the player. Used in TargetMode.TEAM sessions.
         """
         self.client = client
         self.name = client.name
         self.session = session
-        self.hp = MAX_HP
+        self.state = session.state
+        self.slot = self.state.add_player(self.name, team)
+
+        # Map update state
+        self.sequence = 0                           # sequence number of last sent map.
+        self.previousSequence: Optional[int] = None
+        # Set if pad generates maps itself. (WireProtocol.SEEDED)
+        self.sharedGenerator: Optional[SharedMapGenerator[int]] = None
+        self.lastSentMap: Optional[list[int]] = None
+        self.mapOverridden = False                  # whether status effects changed the map of current round.
+        self.acknowledged = False                   # whether client answered to the last sent map.
+        self.lateData: Optional[GameClientData] = None  # answer to the previous map, which missed its round.
+        self.roundsSinceKeyframe = 0
 
     @property
     def playerNumber(self) -> int:
         return self.client.clientNumber
 
+    @property
+    def hp(self) -> int:
+        return self.state.hp[self.slot]
+
+    @hp.setter
+    def hp(self, value: int):
+        self.state.hp[self.slot] = value
+
+    @property
+    def mapData(self) -> list[PanelItem]:
+        """
+        Map of current round, as PanelItem list. Use state directly on hot paths.
+        """
+        return [PanelItem.from_value(value) for value in self.state.map_of(self.slot)]
+
     def notifyConnectionToPad(self):
         self.client.write_line(GameServerData.connectedNotification(self.playerNumber))
 
@@ -164,54 +248,180 @@ class Player:
         return self.hp <= 0
 
     def heal(self):
-        self.hp += HEAL_AMOUNT
-        if self.hp > MAX_HP:
-            # Fix player's health in health range (0 ~ MAX_HEALTH)
-            self.hp = MAX_HP
+        self.changeHp(HEAL_AMOUNT)
 
     def damage(self):
-        self.hp -= ATTACK_DAMAGE
-        if self.hp < MIN_HP:
+        self.changeHp(-ATTACK_DAMAGE)
+
+    def changeHp(self, delta: int):
+        hp = self.hp + delta
+        if hp > MAX_HP:
+            # Fix player's health in health range (0 ~ MAX_HEALTH)
+            hp = MAX_HP
+        self.hp = hp
+        if hp < MIN_HP:
             self.session.on_player_death(self)
 
-    def receiveData(self) -> GameClientData:
-        return GameClientData.deserialize(self.client.read_line(), self)
+    def receiveData(self, timeout: Optional[float] = None) -> Optional[GameClientData]:
+        """
+        Receive client data published by client's background reader.
+        Both text and binary client frames are accepted. Other lines (debug prints of the pad),
+        malformed frames, and frames answering older maps than the previous one are skipped.
+        Frames which piled up are drained, and only the newest one is used, so a slow pad never lags behind.
+        :param timeout: seconds to wait for client data. None waits forever.
+        :return: GameClientData object, or None if client did not respond before timeout.
+        """
+        clientData = self.lateData
+        self.lateData = None
+        for frame in self.client.receive_frames():
+            clientData = self._accept(frame) or clientData
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while clientData is None:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            frame = self.client.receive_frame(remaining)
+            if frame is None:
+                return None
+            clientData = self._accept(frame)
+        clientData.receivedAt = time.monotonic_ns()
+        return clientData
+
+    def _accept(self, frame: bytes) -> Optional[GameClientData]:
+        """
+        Parse client frame, if it answers the current or the previous map.
+        """
+        clientData = GameClientData.parse_frame(frame, self)
+        if clientData is None:
+            return None
+        # Text frames do not carry sequence number, so they answer the last sent map.
+        # (Text frames which arrived before the map was sent are dropped by dropLateData)
+        if clientData.sequence is None or clientData.sequence == self.sequence:
+            self.acknowledged = True
+            return clientData
+        if clientData.sequence == self.previousSequence:
+            return clientData
+        return None
+
+    def dropLateData(self):
+        """
+        Drain frames which arrived after the round deadline, before next map is sent.
+        The newest answer to the last sent map is kept for the next round, and resolved against that map.
+        Text frames cannot tell which map they answer, so they are dropped.
+        """
+        for frame in self.client.receive_frames():
+            clientData = GameClientData.parse_frame(frame, self)
+            if clientData is not None and clientData.sequence is not None and clientData.sequence == self.sequence:
+                self.acknowledged = True
+                self.lateData = clientData
+
+    def itemAt(self, index: int, sequence: Optional[int] = None) -> int:
+        """
+        Get item value of the tile, on the map which client was displaying when it sent data of the sequence.
+        Inputs which arrived after round deadline are carried over into next round, but still answer previous map.
+        :param index: index of the tile.
+        :param sequence: sequence number of client data. None for text client data.
+        :return: item value.
+        """
+        previous = sequence is not None and sequence == self.previousSequence
+        return self.state.item_at(self.slot, index, previous)
+
+    def shareMapGenerator(self, sessionSeed: int):
+        """
+        Send map generator setup to the pad, so that it generates maps itself.
+        :param sessionSeed: seed of the session. Each pad gets its own seed derived from it.
+        """
+        seed = derive_seed(sessionSeed, self.playerNumber)
+        self.sharedGenerator = SharedMapGenerator(PanelItem.itemValues(), PanelItem.itemWeights(), seed)
+        self.client.write_line(GameSeedData(
+            seed,
+            [(item.value, weight) for item, weight in zip(PanelItem.items(), PanelItem.itemWeights())]
+        ).serialize())
+
+    def sendData(self, roundNumber: Optional[int] = None):
+        """
+        Send map of current round (in session's GameState) to the pad.
+        :param roundNumber: round counter. If pad generates maps itself, only this is sent.
+        """
+        self.dropLateData()
+        self.previousSequence = self.sequence
+        mapValues = list(self.state.map_of(self.slot))
+        baseSequence = self.sequence
+        self.sequence = (self.sequence + 1) % SEQUENCE_MOD
+        protocol = self.client.protocol
+
+        # Pad cannot generate maps changed by status effects, so they are sent as map frames.
+        if self.sharedGenerator is not None and roundNumber is not None and not self.mapOverridden:
+            roundData = GameRoundData(roundNumber)
+            self.sequence = roundData.sequence
+            self.client.write_frame(roundData.serialize_binary())
+        elif protocol is WireProtocol.TEXT:
+            self.client.write_line(GameServerData(mapValues, sequence=self.sequence).serialize())
+        else:
+            frame = GameServerData(mapValues, sequence=self.sequence).serialize_binary()
+            # Delta is relative to the last sent map, so it is only valid if client acknowledged that map.
+            if (
+                protocol >= WireProtocol.BINARY_DELTA
+                and self.acknowledged
+                and self.lastSentMap is not None
+                and self.roundsSinceKeyframe < KEYFRAME_INTERVAL
+            ):
+                deltaFrame = GameServerDeltaData.between(
+                    self.lastSentMap, mapValues, sequence=self.sequence, baseSequence=baseSequence
+                ).serialize_binary()
+                if len(deltaFrame) < len(frame):
+                    frame = deltaFrame
+            if frame[0] == GameServerData.binaryHeader:
+                self.roundsSinceKeyframe = 0
+            else:
+                self.roundsSinceKeyframe += 1
+            self.client.write_frame(frame)
 
-    def sendData(self, mapData: list[PanelItem]):
-        self.mapData = mapData
-        self.client.write_line(GameServerData(list(map(lambda item: item.value, mapData))).serialize())
+        self.lastSentMap = mapValues
+        self.acknowledged = False
 
 
 class GameFinishCode(enum.IntEnum):
     PLAYER_WIN = 0
     INVALID_PLAYER_COUNT = -1
     SHUTDOWN_COMMAND = -2
+    PAD_DISCONNECTED = -3       # a pad's serial port failed during the game.
+
+
+DEVICE_ERRORS: Final[tuple[type[Exception], ...]] = (serial.SerialException, OSError)
 
 
 class GameInfo:
-    __slots__ = ('finished', 'finish_code', 'players', 'map', 'winner', 'loser')
+    __slots__ = ('finished', 'finish_code', 'players', 'bySlot', 'state', 'winner', 'loser', 'generator', 'statuses')
     finished: bool
     finish_code: Optional[GameFinishCode]
     players: dict[str, Player]
-    map: dict[str, list[PanelItem]]
+    bySlot: list[Player]        # slot -> player
+    state: GameState
     winner: Optional[Player]
     loser: Optional[Player]
+    generator: MapGenerator[int]
+    statuses: StatusEngine
 
     @classmethod
-    def initial(cls, players: list[Player]) -> GameInfo:
-        instance = cls(players=dict(map(lambda p: (p.name, p), players)))
-        instance.buildRandomMap()
+    def initial(cls, players: list[Player], seed: Optional[int] = None) -> GameInfo:
+        instance = cls(players=dict(map(lambda p: (p.name, p), players)), seed=seed)
         return instance
 
     def __init__(
             self,
             players: dict[str, Player],
+            seed: Optional[int] = None
     ):
         # Game Players
         self.players: dict[str, Player] = players
+        self.bySlot = sorted(players.values(), key=lambda p: p.slot)
+        self.state = self.bySlot[0].state if self.bySlot else GameState(0, MAX_HP)
+
+        # Map generator. Sampling tables are built once per session.
+        self.generator = MapGenerator(PanelItem.itemValues(), PanelItem.itemWeights(), seed)
+        # Timed status effects. Applied to maps while they are generated.
+        self.statuses = StatusEngine(self.state.capacity)
 
         # Game Map Data. Updated per round.
-        self.map = None
         self.buildRandomMap()
 
         # Game Finish Data
@@ -220,17 +430,61 @@ class GameInfo:
         self.winner = None
         self.loser = None
 
+    @property
+    def round(self) -> int:
+        return self.state.round
+
+    @property
+    def map(self) -> dict[str, list[PanelItem]]:
+        """
+        Maps of current round, as PanelItem lists. Built on demand for readers (UI, logs).
+        """
+        return {player.name: player.mapData for player in self.bySlot}
+
     # Map Builders
     def buildRandomMap(self):
-        map_data = dict(map(
-            lambda playerName: (
-                playerName,
-                random.choices(PanelItem.items(), weights=PanelItem.itemWeights(), k=9)
-            ),
-            self.players.keys()
-        ))
-        self.map = map_data
-        return map_data
+        """
+        Generate maps of the next round into GameState.
+        Panels of blocked players are filled with BLOCKED_TILE.
+        """
+        generator = self.generator
+        state = self.state
+        state.begin_round()
+        self.statuses.expire(state.round)
+        blocked = self.statuses.blocked
+        roundNumber = state.round % GameRoundData.ROUND_MOD
+        for player in self.bySlot:
+            player.mapOverridden = bool(blocked[player.slot])
+            if player.mapOverridden:
+                state.set_map(player.slot, (PanelItem.BLOCKED_TILE.value,) * state.mapSize)
+            elif player.sharedGenerator is not None:
+                state.set_map(player.slot, player.sharedGenerator.map_for_round(roundNumber))
+            else:
+                state.set_map(player.slot, generator.next_map())
+
+    def snapshot(self, tickStart: float = 0.0) -> GameSnapshot:
+        """
+        Take immutable snapshot of the game.
+        :param tickStart: perf_counter time when the round started.
+        :return: GameSnapshot object.
+        """
+        state = self.state
+        count = state.count
+        return GameSnapshot(
+            round=state.round,
+            timestamp=time.time(),
+            tickStart=tickStart,
+            names=tuple(state.names),
+            hp=tuple(state.hp[:count]),
+            alive=bytes(state.alive[:count]),
+            maps=bytes(state.maps[:count * state.mapSize]),
+            mapSize=state.mapSize,
+            blocked=bytes(min(b, 1) for b in self.statuses.blocked[:count]),
+            finished=self.finished,
+            finishCode=None if self.finish_code is None else int(self.finish_code),
+            winner=None if self.winner is None else self.winner.name,
+            loser=None if self.loser is None else self.loser.name
+        )
 
     def set_winner(self, player: Player):
         if not isinstance(player, Player):
@@ -255,31 +509,68 @@ class GameSession:
     """
 
     started_at: datetime.datetime
-    players: list[Player]       # len(players) -- 2
+    sessionId: Optional[int]    # id in GameManager's session registry.
+    clients: Optional[list[WhackAMoleClient]]
+    players: list[Player]       # alive players. Dead players are removed by on_player_death().
     gameInfo: GameInfo
+    targets: Optional[TargetIndex]
     __session_name__: str
 
     @classmethod
-    def create(cls, gameManager=None) -> 'GameSession':
-        startedAt = datetime.datetime.utcnow()
-        startedAt.replace(tzinfo=datetime.timezone.utc)
-        session = cls(startedAt, gameManager)
+    def create(
+            cls,
+            gameManager=None,
+            tickRate: float = TICK_RATE,
+            seed: Optional[int] = None,
+            clients: Optional[list[WhackAMoleClient]] = None,
+            mode: TargetMode = TargetMode.NEXT_ALIVE,
+            teams: Optional[list[int]] = None
+    ) -> 'GameSession':
+        startedAt = datetime.datetime.now(tz=datetime.timezone.utc)
+        session = cls(startedAt, gameManager, tickRate=tickRate, seed=seed, clients=clients, mode=mode, teams=teams)
         if gameManager:
-            gameManager.current_session = session
+            gameManager.add_session(session)
 
         return session
 
     def __init__(
             self,
             startedAt: datetime.datetime,
-            game=None
+            game=None,
+            tickRate: float = TICK_RATE,
+            seed: Optional[int] = None,
+            clients: Optional[list[WhackAMoleClient]] = None,
+            mode: TargetMode = TargetMode.NEXT_ALIVE,
+            teams: Optional[list[int]] = None
     ):
         self.started_at = startedAt
+        self.sessionId = None
+        # Clients of this session. If None, first two clients of GameManager are used.
+        self.clients = None if clients is None else list(clients)
+        self.seed: int = random.getrandbits(32) if seed is None else seed    # seed of session's map generator.
         self.players = []
+        # Targeting rule, and team number of each client. (index of `clients` -> team)
+        self.mode = TargetMode(mode)
+        self.teams = None if teams is None else list(teams)
+        self.targets = None
+        self.recorder: Optional[SessionRecorder] = None     # set in setup() if host records sessions.
+        self.roundStartedAt = 0     # monotonic_ns when the current round started.
+        self.state: Optional[GameState] = None
         self.gameInfo = None
+        # Latest GameSnapshot. Replaced as a whole every round, so readers never see partially updated data.
+        self.snapshot: Optional[GameSnapshot] = None
         self.game = game  # Game Manager object.
+        self.scheduler = TickScheduler(tickRate, margin=TICK_MARGIN)
+        # Item effects are compiled once per session.
+        self.effects = EffectTable.compile(
+            PanelItem.__members__.values(), MIN_HP, MAX_HP,
+            hasCustomHandler=lambda item: item.hasCustomHandler
+        )
         self.__game_thread__: Optional[threading.Thread] = None
+        self.__shutdown__ = threading.Event()
         self.__session_name__: str = f'GameSession(start:{self.started_at})'
+        if self.clients:
+            self.__session_name__ = f'GameSession(start:{self.started_at}, players:{",".join(c.name for c in self.clients)})'
 
     def getPlayers(self):
         """
@@ -288,32 +579,64 @@ class GameSession:
         :return:
         """
         self.game.logger.info('Setting up players')
-        clients: list[WhackAMoleClient] = self.game.clients[:2]
-        self.players = list(map(lambda c: Player(c, self), clients))
-        self.gameInfo = GameInfo.initial(self.players)
+        clients: list[WhackAMoleClient] = self.clients if self.clients is not None else self.game.clients[:2]
+        self.state = GameState(len(clients), MAX_HP)
+        teams = self.teams if self.teams is not None else [0] * len(clients)
+        self.players = [Player(client, self, team) for client, team in zip(clients, teams)]
+        self.gameInfo = GameInfo.initial(self.players, seed=self.seed)
 
     # Game run logic
     def _run(self):
         try:
-            self.setup()
-        except ImproperSessionPlayers as e:
-            self.game.write_error_log(e)
-            return
-        while not self.gameInfo.finished:
-            self.sendServerData()
-            data = self.waitForClientData()
-            self.handleData(data)
-            self.draw()
+            try:
+                self.setup()
+                self.scheduler.start()
+                while not self.gameInfo.finished:
+                    if self.__shutdown__.is_set():
+                        self.gameInfo.finish_game(GameFinishCode.SHUTDOWN_COMMAND)
+                        break
+                    self.sendServerData()
+                    data = self.waitForClientData(self.scheduler.remaining(self.scheduler.inputDeadline))
+                    self.handleData(data)
+                    self.draw()
+                    if not self.gameInfo.finished:
+                        self.scheduler.wait()
+            except ImproperSessionPlayers as e:
+                self.game.write_error_log(e, session=self)
+                self.gameInfo.finish_game(GameFinishCode.INVALID_PLAYER_COUNT)
+            except DEVICE_ERRORS as e:
+                # Pad was unplugged, or its port failed.
+                self.game.write_error_log(e, 'Lost connection to a pad. Closed session.', session=self)
+                if not self.gameInfo.finished:
+                    self.gameInfo.finish_game(GameFinishCode.PAD_DISCONNECTED)
+            finally:
+                self.close()
+            self.snapshot = self.gameInfo.snapshot(self.scheduler.tickStart or 0.0)
+        finally:
+            # Free the pads before publishing result, so that UI sees them idle.
+            self.game.remove_session(self)
         self.show_result()
-        self.game.ui.handle_game_finish()
-        self.close()
         if self.gameInfo.finish_code is GameFinishCode.SHUTDOWN_COMMAND:
-            self.game.write_error_log('Command `Shutdown` Executed. Closed session.')
+            self.game.write_error_log('Command `Shutdown` Executed. Closed session.', session=self)
 
     # Game Runner
     def run(self):
+        """
+        Start game loop on session's game thread. Returns immediately.
+        Game thread never touches UI : it publishes events to GameManager.events instead.
+        """
+        if self.__game_thread__ is not None:
+            raise RuntimeError(f'{self.__session_name__} is already started')
         self.__game_thread__ = threading.Thread(target=self._run, name=self.__session_name__, daemon=True)
-        self.__game_thread__.run()      # TODO : Solve blocking issue : Why my program gets blocked when using threading?
+        self.__game_thread__.start()
+
+    def join(self, timeout: Optional[float] = None):
+        """
+        Wait until game thread finishes.
+        :param timeout: seconds to wait. Wait forever if None.
+        """
+        if self.__game_thread__ is not None:
+            self.__game_thread__.join(timeout)
 
     @property
     def game_thread(self) -> Optional[threading.Thread]:
@@ -329,77 +652,200 @@ class GameSession:
         Get if the session has running game thread. If game is not running, value will be True. Else, False.
         :return: bool value represents if game thread is running
         """
-        return self.__game_thread__ is not None
+        return self.__game_thread__ is not None and self.__game_thread__.is_alive()
+
+    @property
+    def tickStats(self) -> TickStats:
+        """
+        Get round timing statistics of the session.
+        :return: TickStats object.
+        """
+        return self.scheduler.stats
 
     @property
     def is_game_running(self) -> bool:
         return self.is_running and not self.gameInfo.finished
 
     def shutdown(self):
+        """
+        Request game thread to finish the game. Game finishes before the next round starts.
+        """
         if self.is_running:
-            self.gameInfo.finish_game(GameFinishCode.SHUTDOWN_COMMAND)
+            self.__shutdown__.set()
 
     # Game Phase
     def setup(self):
         self.getPlayers()
-        if len(self.players) != 2:
+        self.targets = TargetIndex(self.state, self.mode)
+        if len(self.players) < 2 or self.targets.isOver:
             self.game.logger.info(msg='We have improper number of players. Cancel game startup.')
             raise ImproperSessionPlayers(self)
+        # Pads of every session are drained by GameManager's shared reader.
+        for player in self.players:
+            player.client.start_reader(self.game.hub)
+        self.negotiateProtocol()
+        for player in self.players:
+            if player.client.protocol >= WireProtocol.SEEDED:
+                player.shareMapGenerator(self.seed)
+        self.startRecording()
+        self.snapshot = self.gameInfo.snapshot()
         self.game.display_game_screen()
 
-    def sendServerData(self):
-        print('Sending new map data to clients...')
-        for playerName, mapData in self.gameInfo.buildRandomMap().items():
-            self.gameInfo.players.get(playerName).sendData(mapData)
-        print('ServerData sent.')
-
-    def waitForClientData(self) -> list[GameClientData]:
-        print('Waiting for client data...')
-        data = list(map(
-            lambda p: p.receiveData(),
-            self.players
+    def startRecording(self):
+        """
+        Start recording the session, if host records sessions. (SessionHost.recordDirectory)
+        """
+        directory = getattr(self.game, 'recordDirectory', None)
+        if directory is None:
+            return
+        self.recorder = SessionRecorder.for_session(directory, self)
+        state = self.state
+        self.recorder.write_header(RecordingHeader(
+            self.seed, 1 / self.scheduler.period, int(self.mode), state.maxHp, state.mapSize,
+            self.started_at.timestamp(), tuple(state.names), tuple(state.teams[:state.count])
         ))
-        print('ClientData received.')
+
+    def negotiateProtocol(self, timeout: float = WhackAMoleClient.NEGOTIATION_TIMEOUT):
+        """
+        Negotiate wire protocol with every player's pad within one shared deadline.
+        """
+        for player in self.players:
+            player.client.request_protocol()
+        deadline = time.monotonic() + timeout
+        for player in self.players:
+            player.client.await_protocol(max(0.0, deadline - time.monotonic()))
+
+    def sendServerData(self):
+        self.game.logger.debug(f'{self.__session_name__} >>> Sending new map data to clients.')
+        self.roundStartedAt = time.monotonic_ns()
+        self.gameInfo.buildRandomMap()
+        roundNumber = self.state.round % GameRoundData.ROUND_MOD
+        for player in self.gameInfo.bySlot:
+            player.sendData(roundNumber)
+        self.game.logger.debug(f'{self.__session_name__} >>> ServerData sent.')
+
+    def waitForClientData(self, timeout: float = INPUT_TIMEOUT) -> list[GameClientData]:
+        """
+        Gather client data of every player within one shared deadline.
+        Each client is drained by its own background reader, so waiting on players one by one
+        only costs the latency of the slowest pad. Data arriving after the deadline stays in reader's queue,
+        and is handled in the next round.
+        :param timeout: seconds to wait for all players' input.
+        :return: list of GameClientData, one per player. Players who did not respond in time did not hit.
+        """
+        self.game.logger.debug(f'{self.__session_name__} >>> Waiting for client data.')
+        deadline = time.monotonic() + timeout
+        data = []
+        for player in self.players:
+            clientData = player.receiveData(max(0.0, deadline - time.monotonic()))
+            if clientData is None:
+                self.game.logger.info(f'{self.__session_name__} >>> Player {player.name} did not respond in time.')
+                clientData = GameClientData(False, None, player=player)
+            data.append(clientData)
+        self.game.logger.debug(f'{self.__session_name__} >>> ClientData received.')
         return data
 
     def handleData(self, clientData: list[GameClientData]):
-        print('Handle client data...')
+        self.game.logger.debug(f'{self.__session_name__} >>> Handle client data.')
+        slots = []
+        items = []
         for data in clientData:
-            print(f'Handle client data of player {data.player.name}')
-            if data.isHit:
-                mapData = self.gameInfo.map[data.player.name]
-                hitItem: PanelItem = mapData[data.hitIndex]
-                # self.game.write_event_log(f'Player {data.player.name} hit panel {data.hitIndex} (item={hitItem.name})')
+            player = data.player
+            slots.append(player.slot)
+            if data.isHit and data.hitIndex is not None:
+                items.append(player.itemAt(data.hitIndex, data.sequence))
+                # self.game.write_event_log(f'Player {player.name} hit panel {data.hitIndex}')
             else:
-                hitItem = PanelItem.BLANK
-                # self.game.write_event_log(f'Player {data.player.name} does not hit panel')
+                items.append(PanelItem.BLANK.value)
+        if self.recorder is None:
+            self.applyHits(slots, items)
+            return
+        hp = self.state.hp[:self.state.count]
+        self.applyHits(slots, items)
+        self.recordRound(clientData, items, hp)
 
-            p1, p2 = self.gameInfo.players.values()
-            if p1.name == data.player.name:
-                # player : p1, opponent : p2
-                hitItem.handle_item_event(session=self, player=p1, opponent=p2)
-            else:
-                # player : p1, opponent : p2
-                hitItem.handle_item_event(session=self, player=p2, opponent=p1)
+    def recordRound(self, clientData: list[GameClientData], items: list[int], previousHp):
+        """
+        Append the round into session recording.
+        :param clientData: client data of the round.
+        :param items: item value each client data resolved to.
+        :param previousHp: hp of every slot before the round.
+        """
+        state = self.state
+        inputs = [RecordedInput(0, None, None, PanelItem.BLANK.value, 0)] * state.count
+        for data, item in zip(clientData, items):
+            responded = data.receivedAt is not None
+            inputs[data.player.slot] = RecordedInput(
+                (INPUT_RESPONDED if responded else 0) | (INPUT_HIT if data.isHit else 0),
+                data.hitIndex, data.sequence, item, data.receivedAt or 0
+            )
+        self.recorder.write_round(
+            state.round, self.roundStartedAt, state.maps, inputs,
+            [hp - previous for hp, previous in zip(state.hp[:state.count], previousHp)]
+        )
+
+    def applyHits(self, slots: list[int], items: list[int]):
+        """
+        Resolve a round of hits : item effects, statuses, custom handlers and deaths.
+        :param slots: slot of the player of each hit.
+        :param items: item value of each hit. BLANK (0) for players who did not hit.
+        """
+        # Resolve whole round of hits at once.
+        statuses = self.gameInfo.statuses
+        result = self.effects.apply_round(self.state, slots, items, shielded=statuses.shielded)
+        # Damage over time of active statuses, before statuses of this round are applied.
+        deaths = result.deaths + statuses.apply_damage(self.state, MIN_HP)
+        for application in result.statuses:
+            statuses.apply(self.state.round, application)
+        bySlot = self.gameInfo.bySlot
+        opponents = self.state.opponents
+        for slot, item in result.handlers:
+            player = bySlot[slot]
+            opponent = bySlot[opponents[slot]] if opponents[slot] != NO_SLOT else None
+            getattr(PanelItem.from_value(item), '__handler__')(self, player, opponent)
+        for slot in dict.fromkeys(deaths):
+            if self.gameInfo.finished:
+                break
+            self.on_player_death(bySlot[slot])
+        # Targets depending on hp are refreshed once, after every change of the round.
+        self.targets.update_round()
 
     def draw(self):
         """
         Draw UI on screen.
         """
         # TODO : Implement UI.
-        self.game.update_screen(self.gameInfo)
+        self.snapshot = self.gameInfo.snapshot(self.scheduler.tickStart)
+        self.game.update_screen(self.snapshot, session=self)
 
     def show_result(self):
         """
         Show the result of game.
         """
-        self.game.show_result()
+        self.game.show_result(self.snapshot, session=self)
 
     def close(self):
         """
         Close the game session and upload data on raking (playtime, (Optional) score)
         """
         playtime = datetime.datetime.now(tz=self.started_at.tzinfo) - self.started_at
+        try:
+            self.game.logger.info(f'{self.__session_name__} >>> Round timing : {self.tickStats}')
+            if self.recorder is not None:
+                info = self.gameInfo
+                try:
+                    self.recorder.write_finish(RecordedFinish(
+                        None if info.finish_code is None else int(info.finish_code),
+                        NO_SLOT if info.winner is None else info.winner.slot,
+                        NO_SLOT if info.loser is None else info.loser.slot,
+                        self.state.round, playtime.total_seconds()
+                    ))
+                finally:
+                    self.recorder.close()
+        finally:
+            # Pads are released even if the recording could not be finished.
+            for player in self.gameInfo.players.values():
+                player.client.stop_reader()
 
     # Event Handlers
     def on_player_death(self, player: Player):
@@ -407,8 +853,13 @@ class GameSession:
         Player Death Event Handler
         :param player: player instance who died.
         """
-        # Since, currently the game has only two players, we can stop the game.
+        self.state.alive[player.slot] = 0
         self.players.pop(self.players.index(player))
-        self.gameInfo.set_winner(self.players[0])
-        self.gameInfo.set_loser(player)
-        self.gameInfo.finish_game()
+        self.targets.on_death(player.slot)
+        self.game.write_event_log(f'Player {player.name} is dead.', session=self)
+        # Game is over when only one player (or one team) is left.
+        # Winner is the first player left, and loser is the last player who died.
+        if self.targets.isOver:
+            self.gameInfo.set_winner(self.players[0])
+            self.gameInfo.set_loser(player)
+            self.gameInfo.finish_game()
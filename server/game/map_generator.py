@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import random
+from itertools import accumulate
+from typing import Final, Generic, Optional, Sequence, TypeVar
+
+try:
+    import numpy as np
+except ImportError:     # numpy is optional. Pure python generator is used without it.
+    np = None
+
+__all__ = (
+    'MAP_SIZE', 'BATCH_SIZE', 'MAX_TABLE_SIZE',
+    'MapGenerator',
+    'mix32', 'derive_seed', 'SharedMapGenerator'
+)
+
+T = TypeVar('T')
+
+MAP_SIZE: Final[int] = 9
+BATCH_SIZE: Final[int] = 64         # maps generated at once.
+MAX_TABLE_SIZE: Final[int] = 4096   # largest weight total expanded into lookup table.
+
+
+class MapGenerator(Generic[T]):
+    """
+    Weighted random map generator.
+    Sampling tables are built once, and maps are generated in batches into a preallocated buffer.
+
+    Integer weights (PanelItem.itemWeights) are expanded into a lookup table which has each item `weight` times,
+    so that sampling a tile is a single uniform index. Other weights use precomputed cumulative weights.
+    If numpy is available, batches are sampled with numpy instead.
+    """
+    items: tuple[T, ...]
+    weights: tuple[float, ...]
+    seed: Optional[int]
+
+    def __init__(
+            self,
+            items: Sequence[T],
+            weights: Sequence[float],
+            seed: Optional[int] = None,
+            *,
+            mapSize: int = MAP_SIZE,
+            batchSize: int = BATCH_SIZE,
+            useNumpy: Optional[bool] = None
+    ):
+        """
+
+        Args:
+            items (Sequence) : items to place on tiles.
+            weights (Sequence[float]) : relative weight of each item.
+            seed (Optional[int]) : seed of random generator. Same seed generates same maps.
+            mapSize (int) : number of tiles in a map.
+            batchSize (int) : number of maps generated at once.
+            useNumpy (Optional[bool]) : whether to sample with numpy. Default is True if numpy is installed.
+        """
+        if len(items) != len(weights) or not items:
+            raise ValueError(f'MapGenerator needs one weight per item, got {len(items)} items and {len(weights)} weights')
+        if useNumpy and np is None:
+            raise ValueError('MapGenerator.useNumpy is True, but numpy is not installed')
+        self.items = tuple(items)
+        self.weights = tuple(weights)
+        self.seed = seed
+        self.mapSize = mapSize
+        self.batchSize = batchSize
+        self.useNumpy = np is not None if useNumpy is None else useNumpy
+
+        self._batch: list[T] = [self.items[0]] * (mapSize * batchSize)    # preallocated batch buffer.
+        self._cursor = len(self._batch)         # next map's offset in batch. batch is empty at first.
+
+        total = sum(self.weights)
+        if all(float(w).is_integer() and w >= 0 for w in self.weights) and total <= MAX_TABLE_SIZE:
+            self._table: Optional[list[T]] = [item for item, w in zip(self.items, self.weights) for _ in range(int(w))]
+        else:
+            self._table = None
+        if self.useNumpy:
+            self._rng = np.random.default_rng(seed)
+            self._cumulative = np.cumsum(np.asarray(self.weights, dtype=np.float64)) / total
+            if self._table is not None:
+                # Lookup table holds item indexes, so that the whole batch is sampled without allocating.
+                self._tableIndexes = np.asarray([self.items.index(item) for item in self._table], dtype=np.intp)
+            self._uniform = np.empty(mapSize * batchSize, dtype=np.float64)
+            self._slots = np.empty(mapSize * batchSize, dtype=np.intp)
+            self._indexes = np.empty(mapSize * batchSize, dtype=np.intp)
+            self._itemArray = np.empty(len(self.items), dtype=object)
+            self._itemArray[:] = self.items
+        else:
+            self._rng = random.Random(seed)
+            self._cumulative = list(accumulate(self.weights))
+
+    def _fill_batch(self):
+        size = len(self._batch)
+        if self.useNumpy:
+            self._rng.random(out=self._uniform)
+            if self._table is not None:
+                np.multiply(self._uniform, len(self._table), out=self._uniform)
+                self._slots[:] = self._uniform     # truncates into table slot.
+                np.take(self._tableIndexes, self._slots, out=self._indexes)
+            else:
+                self._indexes[:] = np.searchsorted(self._cumulative, self._uniform, side='right')
+                # Guard floating point error of the last cumulative weight.
+                np.minimum(self._indexes, len(self.items) - 1, out=self._indexes)
+            self._batch[:] = self._itemArray[self._indexes].tolist()
+        elif self._table is not None:
+            self._batch[:] = self._rng.choices(self._table, k=size)
+        else:
+            self._batch[:] = self._rng.choices(self.items, cum_weights=self._cumulative, k=size)
+        self._cursor = 0
+
+    def next_map(self) -> list[T]:
+        """
+        Get next random map.
+        :return: list of `mapSize` items.
+        """
+        if self._cursor >= len(self._batch):
+            self._fill_batch()
+        start = self._cursor
+        self._cursor = start + self.mapSize
+        return self._batch[start:self._cursor]
+
+    def next_maps(self, count: int) -> list[list[T]]:
+        """
+        Get next random maps.
+        :param count: number of maps.
+        :return: list of maps.
+        """
+        return [self.next_map() for _ in range(count)]
+
+
+"""
+Shared map generator specification.
+Server and pad generate identical maps from a seed and a round counter, so only the round counter is sent each round.
+Only 32-bit unsigned integer arithmetic is used, so that pad firmware can mirror it. (client/map_generator.h)
+
+    mix32(x)        : x ^= x >> 16; x *= 0x85EBCA6B; x ^= x >> 13; x *= 0xC2B2AE35; x ^= x >> 16
+    round state     : state = mix32(seed ^ (round * 0x9E3779B9)), or 0x6D2B79F5 if it is 0.
+    next(state)     : state ^= state << 13; state ^= state >> 17; state ^= state << 5
+    tile i          : slot = next(state) % total_weight, item = first item whose cumulative weight > slot.
+"""
+UINT32_MASK: Final[int] = 0xFFFFFFFF
+GOLDEN_GAMMA: Final[int] = 0x9E3779B9
+ZERO_STATE_REPLACEMENT: Final[int] = 0x6D2B79F5
+
+
+def mix32(x: int) -> int:
+    """
+    Murmur3 32-bit finalizer.
+    :param x: 32-bit unsigned integer.
+    :return: mixed 32-bit unsigned integer.
+    """
+    x ^= x >> 16
+    x = (x * 0x85EBCA6B) & UINT32_MASK
+    x ^= x >> 13
+    x = (x * 0xC2B2AE35) & UINT32_MASK
+    x ^= x >> 16
+    return x
+
+
+def derive_seed(seed: int, stream: int) -> int:
+    """
+    Derive independent seed from session seed. Used to give each pad its own map stream.
+    :param seed: session seed.
+    :param stream: stream number. (ex : player number)
+    :return: derived 32-bit seed.
+    """
+    return mix32((seed + (stream + 1) * GOLDEN_GAMMA) & UINT32_MASK)
+
+
+class SharedMapGenerator(Generic[T]):
+    """
+    Map generator which follows shared map generator specification.
+    Map of any round can be generated directly, so the pad resyncs from the round counter alone.
+    """
+    items: tuple[T, ...]
+    weights: tuple[int, ...]
+    seed: int
+
+    def __init__(self, items: Sequence[T], weights: Sequence[int], seed: int, *, mapSize: int = MAP_SIZE):
+        """
+
+        Args:
+            items (Sequence) : items to place on tiles.
+            weights (Sequence[int]) : relative integer weight of each item.
+            seed (int) : 32-bit seed shared with the pad.
+            mapSize (int) : number of tiles in a map.
+        """
+        if len(items) != len(weights) or not items:
+            raise ValueError(f'SharedMapGenerator needs one weight per item, got {len(items)} items and {len(weights)} weights')
+        if not all(isinstance(w, int) and w >= 0 for w in weights) or sum(weights) <= 0:
+            raise ValueError(f'SharedMapGenerator needs non-negative integer weights, got {weights}')
+        self.items = tuple(items)
+        self.weights = tuple(weights)
+        self.seed = seed & UINT32_MASK
+        self.mapSize = mapSize
+        # slot -> item lookup table, instead of scanning cumulative weights per tile.
+        self._table: list[T] = [item for item, w in zip(self.items, self.weights) for _ in range(w)]
+
+    def map_for_round(self, roundNumber: int) -> list[T]:
+        """
+        Generate map of the round.
+        :param roundNumber: round counter. (32-bit unsigned integer)
+        :return: list of `mapSize` items.
+        """
+        state = mix32(self.seed ^ ((roundNumber * GOLDEN_GAMMA) & UINT32_MASK)) or ZERO_STATE_REPLACEMENT
+        table = self._table
+        total = len(table)
+        tiles = []
+        for _ in range(self.mapSize):
+            state ^= (state << 13) & UINT32_MASK
+            state ^= state >> 17
+            state ^= (state << 5) & UINT32_MASK
+            tiles.append(table[state % total])
+        return tiles
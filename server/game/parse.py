@@ -1,11 +1,24 @@
 """
-@Deprecated
-Legacy value parser. Currently, project uses built-in eval() function to parse string values into python object.
+Value parser and schema-compiled frame tokenizer.
+
+Frame schema describes fields of a frame, separated by `;` :
+    c;bool;int?
+First field may be a literal prefix. Each other field is either a literal or one of the field types below.
+    bool    : true, True, false, False
+    int     : integer, with optional sign.
+    float   : decimal number.
+    str     : any token. Quotes (`"`) around the token are removed.
+    list    : list expression. (ex : ["1",2])
+    any     : bool, int, float, str or list. Type is decided by the first character of the token.
+Suffix `?` marks optional field. Optional fields must come last, and may be empty or missing.
+Suffix `*` on the last field captures rest of the frame, including separators.
+
+Schema is compiled once into a list of converters, and frame is parsed in a single pass without exceptions.
 """
 
+from __future__ import annotations
 
-from contextlib import suppress
-from typing import Final, List, Any, Tuple, Union
+from typing import Final, List, Any, Tuple, Union, Callable, Optional, Iterable
 
 __all__ = (
     'ExprParseException',
@@ -13,7 +26,8 @@ __all__ = (
     'NumberExprParseException', 'parse_number_expr',
     'STRING_CHAR', 'StringExprParseException', 'parse_string_expr',
     'ContainerExprParseException', 'parse_element',
-    'LIST_START_CHAR', 'LIST_END_CHAR', 'LIST_SEP_CHAR', 'ListExprParseException', 'parse_list_expr'
+    'LIST_START_CHAR', 'LIST_END_CHAR', 'LIST_SEP_CHAR', 'ListExprParseException', 'parse_list_expr',
+    'FIELD_SEP_CHAR', 'SchemaCompileException', 'FrameParseException', 'FrameSchema', 'FrameSchemaSet'
 )
 
 
@@ -108,20 +122,13 @@ class ContainerExprParseException(ExprParseException):
 
 
 def parse_element(element_expr: str) -> object:
-    # Try parse as boolean.
-    with suppress(BooleanExprParseException):
-        return parse_boolean_expr(element_expr)
-    # Try parse as number.
-    with suppress(NumberExprParseException):
-        return parse_number_expr(element_expr)
-    # Try parse as string.
-    with suppress(StringExprParseException):
-        return parse_string_expr(element_expr)
-
-    # Failed in all cases.
-    # Currently, all failed cases are interpreted as string, due to the lack of types.
-    # Will raise exception in future.
-    return element_expr     # as string.
+    # Decide type of element by its token, instead of trying each parser in turn.
+    value = _convert_any(element_expr.encode('utf-8'))
+    if value is INVALID:
+        # Currently, all failed cases are interpreted as string, due to the lack of types.
+        # Will raise exception in future.
+        return element_expr     # as string.
+    return value
 
 
 # List Expression Parser
@@ -145,6 +152,290 @@ def parse_list_expr(expr: str) -> List[Any]:
     return obj
 
 
+"""
+Frame Schema
+"""
+FIELD_SEP_CHAR: Final[str] = ';'
+OPTIONAL_SUFFIX: Final[str] = '?'
+REST_SUFFIX: Final[str] = '*'
+
+# Converter returns INVALID instead of raising exception, when the token does not fit.
+INVALID: Final[object] = object()
+Converter = Callable[[bytes], Any]
+
+_BOOL_TOKENS: Final[dict[bytes, bool]] = {
+    **{token.encode('ascii'): True for token in BOOL_TRUE_CHARS},
+    **{token.encode('ascii'): False for token in BOOL_FALSE_CHARS}
+}
+_STRING_BYTE: Final[bytes] = STRING_CHAR.encode('ascii')
+_LIST_START_BYTE: Final[bytes] = LIST_START_CHAR.encode('ascii')
+_LIST_END_BYTE: Final[bytes] = LIST_END_CHAR.encode('ascii')
+_LIST_SEP_BYTE: Final[bytes] = LIST_SEP_CHAR.encode('ascii')
+_SIGN_BYTES: Final[tuple[bytes, ...]] = (b'-', b'+')
+
+
+def _convert_bool(token: bytes) -> Any:
+    return _BOOL_TOKENS.get(token, INVALID)
+
+
+def _convert_int(token: bytes) -> Any:
+    digits = token[1:] if token[:1] in _SIGN_BYTES else token
+    if not digits.isdigit():
+        return INVALID
+    return int(token)
+
+
+def _convert_float(token: bytes) -> Any:
+    digits = token[1:] if token[:1] in _SIGN_BYTES else token
+    integer, dot, fraction = digits.partition(b'.')
+    if not (integer or fraction) or (integer and not integer.isdigit()) or (fraction and not fraction.isdigit()):
+        return INVALID
+    return float(token)
+
+
+def _convert_str(token: bytes) -> Any:
+    if len(token) >= 2 and token[:1] == _STRING_BYTE and token[-1:] == _STRING_BYTE:
+        token = token[1:-1]
+    return token.decode('utf-8', errors='replace')
+
+
+def _convert_list(token: bytes) -> Any:
+    if not (token[:1] == _LIST_START_BYTE and token[-1:] == _LIST_END_BYTE):
+        return INVALID
+    content = token[1:-1]
+    if not content:
+        return []
+    values = []
+    for element in content.split(_LIST_SEP_BYTE):
+        value = _convert_any(element)
+        if value is INVALID:
+            return INVALID
+        values.append(value)
+    return values
+
+
+def _convert_any(token: bytes) -> Any:
+    if token in _BOOL_TOKENS:
+        return _BOOL_TOKENS[token]
+    head = token[:1]
+    if head == _STRING_BYTE:
+        return _convert_str(token)
+    if head == _LIST_START_BYTE:
+        return _convert_list(token)
+    value = _convert_int(token)
+    if value is INVALID:
+        value = _convert_float(token)
+    return value
+
+
+FIELD_TYPES: Final[dict[str, Converter]] = {
+    'bool': _convert_bool,
+    'int': _convert_int,
+    'float': _convert_float,
+    'str': _convert_str,
+    'list': _convert_list,
+    'any': _convert_any,
+}
+
+
+def _literal_converter(literal: bytes) -> Converter:
+    def convert(token: bytes) -> Any:
+        return literal.decode('utf-8') if token == literal else INVALID
+    return convert
+
+
+class SchemaCompileException(ExprParseException):
+    def __init__(self, expr: str, description: str):
+        super(SchemaCompileException, self).__init__(expr, description)
 
 
+class FrameParseException(ExprParseException):
+    def __init__(self, expr: str, description: str):
+        super(FrameParseException, self).__init__(expr, description)
+
+
+class FrameSchema:
+    """
+    Compiled frame schema.
+    Use FrameSchema.compile() to create instance.
+    """
+    __slots__ = ('source', 'name', 'prefix', 'converters', 'required', 'rest', '_sep')
+
+    source: str
+    name: str
+    prefix: Optional[bytes]         # literal first token, if schema has one.
+    converters: tuple[Converter, ...]   # converters of fields after prefix.
+    required: int                   # number of required fields after prefix.
+    rest: bool                      # whether the last field captures rest of the frame.
+
+    @classmethod
+    def compile(cls, source: str, name: Optional[str] = None, sep: str = FIELD_SEP_CHAR) -> FrameSchema:
+        """
+        Compile schema source into FrameSchema.
+        :param source: schema source. (ex : `c;bool;int?`)
+        :param name: name of the schema. source is used if not given.
+        :param sep: field separator.
+        :return: compiled FrameSchema object.
+        """
+        fields: list[str] = source.split(sep)
+        prefix: Optional[bytes] = None
+        if fields[0].rstrip(OPTIONAL_SUFFIX + REST_SUFFIX) not in FIELD_TYPES:
+            prefix = fields.pop(0).encode('utf-8')
+
+        converters: list[Converter] = []
+        required = 0
+        rest = False
+        for i, field in enumerate(fields):
+            if rest:
+                raise SchemaCompileException(source, f'Field `{field}` comes after rest field.')
+            optional = False
+            while field.endswith((REST_SUFFIX, OPTIONAL_SUFFIX)):
+                if field.endswith(REST_SUFFIX):
+                    rest = True
+                else:
+                    optional = True
+                field = field[:-1]
+            if not field:
+                raise SchemaCompileException(source, f'Field {i} is empty.')
+            if optional:
+                pass
+            elif required != i:
+                raise SchemaCompileException(source, f'Required field `{field}` comes after optional field.')
+            else:
+                required += 1
+            converter = FIELD_TYPES.get(field)
+            converters.append(converter or _literal_converter(field.encode('utf-8')))
+
+        return cls(source, name or source, prefix, tuple(converters), required, rest, sep.encode('utf-8'))
+
+    def __init__(
+            self,
+            source: str,
+            name: str,
+            prefix: Optional[bytes],
+            converters: tuple[Converter, ...],
+            required: int,
+            rest: bool,
+            sep: bytes
+    ):
+        self.source = source
+        self.name = name
+        self.prefix = prefix
+        self.converters = converters
+        self.required = required
+        self.rest = rest
+        self._sep = sep
+
+    def parse(self, frame: bytes) -> Optional[tuple]:
+        """
+        Parse frame using the schema.
+        :param frame: raw frame, without line terminator.
+        :return: tuple of field values (without prefix), or None if frame does not fit the schema.
+                 Missing optional fields are None.
+        """
+        converters = self.converters
+        offset = 0 if self.prefix is None else 1
+        if self.rest:
+            tokens = frame.split(self._sep, len(converters) - 1 + offset)
+        else:
+            tokens = frame.split(self._sep)
+        if offset and tokens[0] != self.prefix:
+            return None
+        count = len(tokens) - offset
+        if count < self.required or count > len(converters):
+            return None
+
+        values = []
+        required = self.required
+        for i in range(count):
+            token = tokens[i + offset]
+            if not token and i >= required:
+                values.append(None)
+                continue
+            value = converters[i](token)
+            if value is INVALID:
+                return None
+            values.append(value)
+        values.extend([None] * (len(converters) - count))
+        return tuple(values)
+
+    def parse_expr(self, expr: str) -> tuple:
+        """
+        Parse frame string using the schema.
+        :param expr: frame string.
+        :return: tuple of field values (without prefix).
+        :raise FrameParseException: if the frame does not fit the schema.
+        """
+        values = self.parse(expr.encode('utf-8'))
+        if values is None:
+            raise FrameParseException(expr, f'{expr} does not fit frame schema `{self.source}`.')
+        return values
 
+    def __repr__(self) -> str:
+        return f'FrameSchema({self.name}={self.source})'
+
+
+class FrameSchemaSet:
+    """
+    Set of frame schemas, which finds the schema of a frame using its prefix.
+    Schemas without prefix are tried in order, after schemas of matching prefix.
+    """
+    __slots__ = ('schemas', '_byPrefix', '_unprefixed', '_sep')
+
+    @classmethod
+    def compile(cls, sources: Iterable[Union[str, tuple[str, str]]], sep: str = FIELD_SEP_CHAR) -> FrameSchemaSet:
+        """
+        Compile schema sources into FrameSchemaSet.
+        :param sources: schema sources, or (name, source) tuples.
+        :param sep: field separator.
+        :return: compiled FrameSchemaSet object.
+        """
+        schemas = []
+        for source in sources:
+            if isinstance(source, tuple):
+                name, source = source
+                schemas.append(FrameSchema.compile(source, name=name, sep=sep))
+            else:
+                schemas.append(FrameSchema.compile(source, sep=sep))
+        return cls(schemas, sep)
+
+    def __init__(self, schemas: list[FrameSchema], sep: str = FIELD_SEP_CHAR):
+        self.schemas = schemas
+        self._sep = sep.encode('utf-8')
+        self._byPrefix: dict[bytes, list[FrameSchema]] = {}
+        self._unprefixed: list[FrameSchema] = []
+        for schema in schemas:
+            if schema.prefix is None:
+                self._unprefixed.append(schema)
+            else:
+                self._byPrefix.setdefault(schema.prefix, []).append(schema)
+
+    def match(self, frame: bytes) -> Optional[tuple[FrameSchema, tuple]]:
+        """
+        Find the schema which fits the frame, and parse it.
+        :param frame: raw frame, without line terminator.
+        :return: (schema, values) tuple, or None if no schema fits the frame.
+        """
+        prefix = frame.split(self._sep, 1)[0]
+        for schema in self._byPrefix.get(prefix, ()):
+            values = schema.parse(frame)
+            if values is not None:
+                return schema, values
+        for schema in self._unprefixed:
+            values = schema.parse(frame)
+            if values is not None:
+                return schema, values
+        return None
+
+
+if __name__ == '__main__':
+    # sample test code.
+    # sh > python -m server.game.parse
+    # parse lines sent by client/serial_test.ino.
+    schemas = FrameSchemaSet.compile((
+        ('client', 'c;bool;int?'),
+        ('client_echo', 'c;str*'),
+        ('parse_test', 'str;bool;bool;int;float;list'),
+    ))
+    for line in (b'c;True;3', b'c;False', b'c;Client Received > s;0;1', b'"text";false;true;10;10.3;["1",2]', b'Setting up.'):
+        print(line, '->', schemas.match(line))
@@ -0,0 +1,307 @@
+"""
+Session recording : compact append-only binary log of a session, read back with mmap.
+
+File layout (little endian) :
+    file header : magic (4s), version (H)
+    records     : type (B), payload length (I), payload
+
+    HEADER record : seed (I), tickRate (d), mode (B), maxHp (i), mapSize (B), players (B), startedAt (d),
+                    then per player : team (B), name length (B), name (utf-8)
+    ROUND record  : round (I), round start (Q, monotonic_ns), maps (players * mapSize bytes),
+                    then per player : flags (B), hit index (B), sequence (B), item (B), received at (Q, monotonic_ns),
+                    then per player : hp delta (i)
+    FINISH record : finish code (b, FINISH_CODE_NONE if None), winner slot (b), loser slot (b), rounds (I),
+                    playtime (d, seconds)
+
+Records are only appended. A record cut by a crash is ignored by the reader.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from typing import Final, Iterator, NamedTuple, Optional, Sequence
+
+__all__ = (
+    'RECORD_DIRECTORY', 'RECORD_EXTENSION', 'FINISH_CODE_NONE',
+    'INPUT_RESPONDED', 'INPUT_HIT',
+    'RecordType',
+    'RecordedInput', 'RecordedRound', 'RecordedFinish', 'RecordingHeader',
+    'SessionRecorder',
+    'Recording'
+)
+
+RECORD_DIRECTORY: Final[str] = 'recordings'
+RECORD_EXTENSION: Final[str] = '.wamr'
+MAGIC: Final[bytes] = b'WAMR'
+VERSION: Final[int] = 1
+NONE_BYTE: Final[int] = 0xFF        # hit index, sequence which is None.
+FINISH_CODE_NONE: Final[int] = -128     # finish code which is None.
+NO_PLAYER: Final[int] = -1
+
+INPUT_RESPONDED: Final[int] = 1 << 0    # pad sent client data in the round.
+INPUT_HIT: Final[int] = 1 << 1          # pad hit a tile.
+
+_FILE_HEADER: Final[struct.Struct] = struct.Struct('<4sH')
+_RECORD: Final[struct.Struct] = struct.Struct('<BI')
+_SESSION: Final[struct.Struct] = struct.Struct('<IdBiBBd')
+_PLAYER: Final[struct.Struct] = struct.Struct('<BB')
+_ROUND: Final[struct.Struct] = struct.Struct('<IQ')
+_INPUT: Final[struct.Struct] = struct.Struct('<BBBBQ')
+_FINISH: Final[struct.Struct] = struct.Struct('<bbbId')
+
+
+class RecordType:
+    HEADER: Final[int] = 1
+    ROUND: Final[int] = 2
+    FINISH: Final[int] = 3
+
+
+class RecordedInput(NamedTuple):
+    flags: int
+    hitIndex: Optional[int]
+    sequence: Optional[int]
+    item: int               # item value the hit resolved to. BLANK (0) if player did not hit.
+    receivedAt: int         # monotonic_ns when the client data was received. 0 if player did not respond.
+
+    @property
+    def responded(self) -> bool:
+        return bool(self.flags & INPUT_RESPONDED)
+
+    @property
+    def isHit(self) -> bool:
+        return bool(self.flags & INPUT_HIT)
+
+
+class RecordedRound(NamedTuple):
+    round: int
+    startedAt: int          # monotonic_ns when the round started.
+    maps: bytes             # maps of every player, slot * mapSize + index -> item value.
+    inputs: tuple[RecordedInput, ...]   # slot -> input.
+    hpDeltas: tuple[int, ...]           # slot -> hp change of the round.
+
+
+class RecordedFinish(NamedTuple):
+    finishCode: Optional[int]
+    winner: int             # slot of the winner, or -1.
+    loser: int              # slot of the loser, or -1.
+    rounds: int
+    playtime: float
+
+
+class RecordingHeader(NamedTuple):
+    seed: int
+    tickRate: float
+    mode: int
+    maxHp: int
+    mapSize: int
+    startedAt: float        # epoch seconds.
+    names: tuple[str, ...]
+    teams: tuple[int, ...]
+
+    @property
+    def count(self) -> int:
+        return len(self.names)
+
+
+def _optional_byte(value: Optional[int]) -> int:
+    return NONE_BYTE if value is None else value
+
+
+def _from_optional_byte(value: int) -> Optional[int]:
+    return None if value == NONE_BYTE else value
+
+
+class SessionRecorder:
+    """
+    Writes records of a session. Owned by the session's game thread.
+    Records are written into a buffered file, so recording a round costs one small write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(_FILE_HEADER.pack(MAGIC, VERSION))
+        self._count = 0
+        self._mapSize = 0
+        self._input = struct.Struct('')
+        self._hp = struct.Struct('')
+
+    @classmethod
+    def for_session(cls, directory: str, session) -> SessionRecorder:
+        """
+        Create recorder of the session, in a new file of the directory.
+        """
+        name = '{}-{}-{}-{:08x}{}'.format(
+            session.started_at.strftime('%Y%m%d-%H%M%S'), os.getpid(), session.sessionId, session.seed, RECORD_EXTENSION
+        )
+        return cls(os.path.join(directory, name))
+
+    def _write(self, recordType: int, payload: bytes):
+        self._file.write(_RECORD.pack(recordType, len(payload)))
+        self._file.write(payload)
+
+    def write_header(self, header: RecordingHeader):
+        self._count = header.count
+        self._mapSize = header.mapSize
+        self._input = struct.Struct('<' + _INPUT.format[1:] * header.count)
+        self._hp = struct.Struct(f'<{header.count}i')
+        parts = [_SESSION.pack(
+            header.seed, header.tickRate, header.mode, header.maxHp, header.mapSize, header.count, header.startedAt
+        )]
+        for name, team in zip(header.names, header.teams):
+            encoded = name.encode('utf-8')[:255]
+            parts.append(_PLAYER.pack(team, len(encoded)))
+            parts.append(encoded)
+        self._write(RecordType.HEADER, b''.join(parts))
+
+    def write_round(
+            self,
+            roundNumber: int,
+            startedAt: int,
+            maps: bytes,
+            inputs: Sequence[RecordedInput],
+            hpDeltas: Sequence[int]
+    ):
+        """
+        Append a round. Inputs and hp deltas are indexed by slot, for every player of the header.
+        """
+        fields = []
+        for recorded in inputs:
+            fields.extend((
+                recorded.flags, _optional_byte(recorded.hitIndex), _optional_byte(recorded.sequence),
+                recorded.item, recorded.receivedAt
+            ))
+        self._write(RecordType.ROUND, b''.join((
+            _ROUND.pack(roundNumber, startedAt),
+            maps[:self._count * self._mapSize],
+            self._input.pack(*fields),
+            self._hp.pack(*hpDeltas)
+        )))
+
+    def write_finish(self, finish: RecordedFinish):
+        self._write(RecordType.FINISH, _FINISH.pack(
+            FINISH_CODE_NONE if finish.finishCode is None else finish.finishCode,
+            finish.winner, finish.loser, finish.rounds, finish.playtime
+        ))
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+class Recording:
+    """
+    Recorded session, read from a memory-mapped file. Rounds are decoded lazily while they are iterated.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if os.path.getsize(path) < _FILE_HEADER.size:
+            # Session crashed before anything was flushed.
+            raise ValueError(f'{path} is empty or truncated')
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _FILE_HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a session recording')
+        if version != VERSION:
+            raise ValueError(f'Unsupported recording version : {version}')
+        self.header: Optional[RecordingHeader] = None
+        self.finish: Optional[RecordedFinish] = None
+        self._roundOffsets: list[int] = []
+        self._scan()
+        if self.header is None:
+            raise ValueError(f'{path} has no session header')
+
+    @classmethod
+    def open(cls, path: str) -> Recording:
+        return cls(path)
+
+    def _records(self) -> Iterator[tuple[int, int, int]]:
+        """
+        Iterate (type, payload offset, payload length) of complete records.
+        """
+        buffer = self._mmap
+        offset = _FILE_HEADER.size
+        end = len(buffer)
+        while offset + _RECORD.size <= end:
+            recordType, length = _RECORD.unpack_from(buffer, offset)
+            offset += _RECORD.size
+            if offset + length > end:
+                break
+            yield recordType, offset, length
+            offset += length
+
+    def _scan(self):
+        buffer = self._mmap
+        for recordType, offset, length in self._records():
+            if recordType == RecordType.HEADER:
+                self.header = self._decode_header(offset)
+                self._input = struct.Struct('<' + _INPUT.format[1:] * self.header.count)
+                self._hp = struct.Struct(f'<{self.header.count}i')
+            elif recordType == RecordType.ROUND:
+                self._roundOffsets.append(offset)
+            elif recordType == RecordType.FINISH:
+                self.finish = self._decode_finish(offset)
+
+    def _decode_finish(self, offset: int) -> RecordedFinish:
+        finish = RecordedFinish(*_FINISH.unpack_from(self._mmap, offset))
+        return finish._replace(finishCode=None if finish.finishCode == FINISH_CODE_NONE else finish.finishCode)
+
+    def _decode_header(self, offset: int) -> RecordingHeader:
+        buffer = self._mmap
+        seed, tickRate, mode, maxHp, mapSize, count, startedAt = _SESSION.unpack_from(buffer, offset)
+        offset += _SESSION.size
+        names = []
+        teams = []
+        for _ in range(count):
+            team, length = _PLAYER.unpack_from(buffer, offset)
+            offset += _PLAYER.size
+            names.append(bytes(buffer[offset:offset + length]).decode('utf-8'))
+            teams.append(team)
+            offset += length
+        return RecordingHeader(seed, tickRate, mode, maxHp, mapSize, startedAt, tuple(names), tuple(teams))
+
+    def __len__(self) -> int:
+        return len(self._roundOffsets)
+
+    def __getitem__(self, index: int) -> RecordedRound:
+        return self._decode_round(self._roundOffsets[index])
+
+    def __iter__(self) -> Iterator[RecordedRound]:
+        for offset in self._roundOffsets:
+            yield self._decode_round(offset)
+
+    def _decode_round(self, offset: int) -> RecordedRound:
+        buffer = self._mmap
+        header = self.header
+        count = header.count
+        roundNumber, startedAt = _ROUND.unpack_from(buffer, offset)
+        offset += _ROUND.size
+        mapBytes = count * header.mapSize
+        maps = bytes(buffer[offset:offset + mapBytes])
+        offset += mapBytes
+        fields = self._input.unpack_from(buffer, offset)
+        offset += self._input.size
+        inputs = tuple(
+            RecordedInput(
+                fields[i], _from_optional_byte(fields[i + 1]), _from_optional_byte(fields[i + 2]),
+                fields[i + 3], fields[i + 4]
+            )
+            for i in range(0, len(fields), 5)
+        )
+        return RecordedRound(roundNumber, startedAt, maps, inputs, self._hp.unpack_from(buffer, offset))
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self) -> Recording:
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,208 @@
+"""
+Replay of recorded sessions. (recording.Recording)
+ReplaySession is a GameSession whose pads are the recording : each round, recorded maps are restored and
+recorded hits are resolved by the current engine, so that hp changes can be compared with the recording.
+It runs at full speed, or in real time at the recorded tick rate, on any SessionHost (GameManager shows it on UI).
+
+Run `python -m server.game.replay <recording>` to check a recording against the engine.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import logging
+import sys
+import time
+from typing import Final, NamedTuple, Optional, Sequence
+
+from .device import FakeWAMClient
+from .game_object import GameSession, GameFinishCode, PanelItem
+from .recording import Recording
+from .scheduler import TickScheduler
+from .targeting import TargetMode
+
+__all__ = (
+    'Divergence',
+    'ReplayReport',
+    'FreeRunningScheduler',
+    'ReplaySession',
+    'replay'
+)
+
+JOIN_TIMEOUT: Final[Optional[float]] = None
+
+
+class Divergence(NamedTuple):
+    round: int
+    slot: int
+    recorded: int       # hp delta in the recording.
+    replayed: int       # hp delta of the replay.
+
+
+class ReplayReport(NamedTuple):
+    path: str
+    rounds: int                 # rounds replayed.
+    recordedRounds: int
+    divergences: tuple[Divergence, ...]
+    finishCode: Optional[int]
+    recordedFinishCode: Optional[int]
+    winner: Optional[str]
+    recordedWinner: Optional[str]
+
+    @property
+    def matches(self) -> bool:
+        """
+        Whether the replay reproduced the recording : same hp changes, same length, and same result.
+        """
+        return (
+            not self.divergences
+            and self.rounds == self.recordedRounds
+            and self.finishCode == self.recordedFinishCode
+            and self.winner == self.recordedWinner
+        )
+
+
+class FreeRunningScheduler(TickScheduler):
+    """
+    Scheduler which never waits : next tick starts as soon as the previous one is processed.
+    """
+
+    def wait(self):
+        self._record(0.0)
+        self.start()
+
+
+class ReplaySession(GameSession):
+    """
+    Session which plays a recording instead of pads.
+    """
+
+    def __init__(self, recording: Recording, game=None, realTime: bool = False):
+        header = recording.header
+        clients = [FakeWAMClient(name, f'Replay/{slot}', slot) for slot, name in enumerate(header.names)]
+        super().__init__(
+            datetime.datetime.fromtimestamp(header.startedAt, tz=datetime.timezone.utc), game,
+            tickRate=header.tickRate, seed=header.seed, clients=clients,
+            mode=TargetMode(header.mode), teams=list(header.teams)
+        )
+        if not realTime:
+            self.scheduler = FreeRunningScheduler(header.tickRate)
+        self.recording = recording
+        self.divergences: list[Divergence] = []
+        self._index = 0     # index of the next recorded round.
+        self._current = None
+
+    @classmethod
+    def open(cls, path: str, game=None, realTime: bool = False) -> ReplaySession:
+        """
+        Create replay of the recording file, registered in the host.
+        """
+        session = cls(Recording.open(path), game, realTime)
+        if game is not None:
+            game.add_session(session)
+        return session
+
+    def startRecording(self):
+        # Replays are not recorded again.
+        pass
+
+    def sendServerData(self):
+        """
+        Start next round, with recorded maps instead of generated maps.
+        """
+        self.roundStartedAt = time.monotonic_ns()
+        self.gameInfo.buildRandomMap()      # expires statuses, and fills blocked panels.
+        if self._index >= len(self.recording):
+            self._current = None
+            return
+        self._current = self.recording[self._index]
+        self._index += 1
+        maps = self._current.maps
+        self.state.maps[:len(maps)] = maps
+
+    def waitForClientData(self, timeout: float = 0) -> list:
+        return []
+
+    def handleData(self, clientData: list):
+        """
+        Resolve recorded hits of alive players with the engine, and compare hp changes with the recording.
+        """
+        current = self._current
+        if current is None:
+            return
+        state = self.state
+        slots = []
+        items = []
+        for slot, recorded in enumerate(current.inputs):
+            if state.alive[slot]:
+                slots.append(slot)
+                items.append(recorded.item if recorded.isHit else PanelItem.BLANK.value)
+        previousHp = state.hp[:state.count]
+        self.applyHits(slots, items)
+        for slot, (hp, previous) in enumerate(zip(state.hp[:state.count], previousHp)):
+            if hp - previous != current.hpDeltas[slot]:
+                self.divergences.append(Divergence(current.round, slot, current.hpDeltas[slot], hp - previous))
+
+    def draw(self):
+        super().draw()
+        # Recording is over, but the game is not : finish as recorded. (ex : shutdown command)
+        if not self.gameInfo.finished and self._index >= len(self.recording):
+            finish = self.recording.finish
+            code = GameFinishCode.SHUTDOWN_COMMAND if finish is None or finish.finishCode is None else finish.finishCode
+            self.gameInfo.finish_game(GameFinishCode(code))
+
+    def close(self):
+        super().close()
+        self.recording.close()
+
+    def report(self) -> ReplayReport:
+        recording = self.recording
+        finish = recording.finish
+        names = recording.header.names
+        info = self.gameInfo
+        return ReplayReport(
+            recording.path, self._index, len(recording), tuple(self.divergences),
+            None if info.finish_code is None else int(info.finish_code),
+            None if finish is None else finish.finishCode,
+            None if info.winner is None else info.winner.name,
+            None if finish is None or finish.winner < 0 else names[finish.winner]
+        )
+
+
+def replay(path: str, host=None, realTime: bool = False) -> ReplayReport:
+    """
+    Replay the recording until it finishes.
+    :param path: path of the recording.
+    :param host: SessionHost to run the replay on. Headless host which does not record is used if not given.
+    :param realTime: if True, replay at the recorded tick rate. Else, as fast as possible.
+    :return: ReplayReport comparing the replay with the recording.
+    """
+    if host is None:
+        from .game import SessionHost
+        host = SessionHost(logging.getLogger('wam.replay'), recordDirectory=None)
+    session = ReplaySession.open(path, host, realTime)
+    session.run()
+    session.join(JOIN_TIMEOUT)
+    return session.report()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Replay recorded Whack A Mole sessions against the engine.')
+    parser.add_argument('recordings', nargs='+')
+    parser.add_argument('--realtime', action='store_true', help='replay at the recorded tick rate')
+    args = parser.parse_args(argv)
+    failed = 0
+    for path in args.recordings:
+        report = replay(path, realTime=args.realtime)
+        status = 'OK' if report.matches else 'DIVERGED'
+        print(f'{status} {path} : {report.rounds}/{report.recordedRounds} rounds, winner {report.winner} '
+              f'(recorded {report.recordedWinner}), {len(report.divergences)} divergences')
+        for divergence in report.divergences[:10]:
+            print(f'    round {divergence.round} slot {divergence.slot} : '
+                  f'recorded {divergence.recorded:+d}, replayed {divergence.replayed:+d}')
+        failed += not report.matches
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import Final, NamedTuple, Optional
+
+__all__ = (
+    'TickStats',
+    'TickScheduler'
+)
+
+
+class TickStats(NamedTuple):
+    """
+    Tick timing statistics. All times are in seconds.
+    """
+    ticks: int
+    meanJitter: float
+    maxJitter: float
+    stdevJitter: float
+    overruns: int           # ticks which finished after the next tick's deadline.
+
+    def __str__(self) -> str:
+        return (
+            f'ticks={self.ticks}, jitter(mean={self.meanJitter * 1000:.3f}ms, '
+            f'max={self.maxJitter * 1000:.3f}ms, stdev={self.stdevJitter * 1000:.3f}ms), overruns={self.overruns}'
+        )
+
+
+class TickScheduler:
+    """
+    Fixed-rate tick scheduler.
+    Deadlines are kept on time.perf_counter() and never drift : each deadline is the previous one plus period,
+    no matter how late the tick was woken up.
+    """
+    SPIN_THRESHOLD: Final[float] = 0.001    # seconds before deadline to stop sleeping and busy-wait.
+
+    period: float
+    margin: float
+
+    def __init__(self, tickRate: float, margin: float = 0.0):
+        """
+
+        Args:
+            tickRate (float) : ticks per second.
+            margin (float) : seconds reserved at the end of each tick for processing, excluded from input deadline.
+        """
+        if tickRate <= 0:
+            raise ValueError(f'TickScheduler.tickRate must be positive, not {tickRate}')
+        self.period = 1 / tickRate
+        self.margin = min(margin, self.period)
+        self._tickStart: Optional[float] = None
+        self._deadline: Optional[float] = None
+
+        # Jitter statistics (Welford's online algorithm)
+        self._ticks = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._max = 0.0
+        self._overruns = 0
+
+    @property
+    def isStarted(self) -> bool:
+        return self._deadline is not None
+
+    @property
+    def tickStart(self) -> float:
+        """
+        perf_counter() time when the current tick started.
+        """
+        return self._tickStart
+
+    @property
+    def deadline(self) -> float:
+        """
+        perf_counter() time when the current tick ends.
+        """
+        return self._deadline
+
+    @property
+    def inputDeadline(self) -> float:
+        """
+        perf_counter() time until inputs are collected in current tick.
+        """
+        return self._deadline - self.margin
+
+    def remaining(self, deadline: Optional[float] = None) -> float:
+        """
+        Get seconds left until the deadline.
+        :param deadline: perf_counter() time. Current tick's deadline is used if not given.
+        :return: seconds left. 0 if deadline is already passed.
+        """
+        return max(0.0, (deadline or self._deadline) - time.perf_counter())
+
+    def start(self):
+        self._tickStart = time.perf_counter()
+        self._deadline = self._tickStart + self.period
+
+    def wait(self):
+        """
+        Wait until current tick's deadline, and start the next tick.
+        If the tick overran one or more periods, missed ticks are skipped.
+        """
+        deadline = self._deadline
+        remaining = deadline - time.perf_counter()
+        if remaining > self.SPIN_THRESHOLD:
+            time.sleep(remaining - self.SPIN_THRESHOLD)
+        now = time.perf_counter()
+        while now < deadline:
+            now = time.perf_counter()
+
+        self._record(now - deadline)
+        nextDeadline = deadline + self.period
+        if now >= nextDeadline:
+            missed = math.floor((now - deadline) / self.period)
+            self._overruns += 1
+            deadline += missed * self.period
+            nextDeadline = deadline + self.period
+        self._tickStart = deadline
+        self._deadline = nextDeadline
+
+    def _record(self, jitter: float):
+        self._ticks += 1
+        delta = jitter - self._mean
+        self._mean += delta / self._ticks
+        self._m2 += delta * (jitter - self._mean)
+        if jitter > self._max:
+            self._max = jitter
+
+    @property
+    def stats(self) -> TickStats:
+        stdev = math.sqrt(self._m2 / (self._ticks - 1)) if self._ticks > 1 else 0.0
+        return TickStats(self._ticks, self._mean, self._max, stdev, self._overruns)
@@ -0,0 +1,252 @@
+"""
+Headless batch simulator of 1 vs 1 games, for balancing items without pads or UI.
+Many games are simulated at once with numpy : each round is a handful of array operations over every unfinished game.
+
+Rules follow GameSession :
+    - items are drawn with PanelItem.itemWeights, and their effects come from the compiled EffectTable.
+    - a player hits with `hitRate` probability each round, on a random tile. (same as FakeWAMClient)
+    - hits of a round are resolved together. hp is clamped to max hp, and a player dies when hp goes under MIN_HP.
+    - blocked panels are filled with BLOCKED_TILE. Statuses applied in a round take effect from the next round.
+    - if both players die in the same round, the player who was touched first by the round's hits loses.
+Items with custom handlers, and damage over time statuses, are not supported.
+
+Run `python -m server.game.simulator --help` to simulate from command line.
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Final, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:     # numpy is optional, but simulator needs it.
+    np = None
+
+from .effects import EffectTable, EffectTarget
+from .game_object import PanelItem, MAX_HP, MIN_HP, ATTACK_DAMAGE, HEAL_AMOUNT, item_effects
+from .status import STATUS_BLOCK, STATUS_SHIELD
+
+__all__ = (
+    'SIMULATION_BATCH_SIZE', 'MAX_ROUNDS', 'NO_WINNER',
+    'SimulationConfig',
+    'SimulationResult',
+    'compile_effects',
+    'BatchSimulator'
+)
+
+SIMULATION_BATCH_SIZE: Final[int] = 65536   # games simulated at once. Bounds memory use.
+MAX_ROUNDS: Final[int] = 10000              # games still running after this many rounds are left unfinished.
+NO_WINNER: Final[int] = -1
+PLAYERS: Final[int] = 2
+
+
+class SimulationConfig(NamedTuple):
+    """
+    Balance parameters of simulated games. Defaults are the values of the live game.
+    """
+    weights: Optional[tuple[float, ...]] = None     # weight of each PanelItem.items(). PanelItem.itemWeights() if None.
+    maxHp: int = MAX_HP
+    attackDamage: int = ATTACK_DAMAGE
+    healAmount: int = HEAL_AMOUNT
+    hitRates: tuple[float, float] = (0.5, 0.5)      # probability that each player hits in a round.
+    maxRounds: int = MAX_ROUNDS
+
+    @property
+    def itemWeights(self) -> tuple[float, ...]:
+        return PanelItem.itemWeights() if self.weights is None else tuple(self.weights)
+
+
+class SimulationResult(NamedTuple):
+    config: SimulationConfig
+    winners: 'np.ndarray'   # game -> seat of the winner, or NO_WINNER if game did not finish.
+    rounds: 'np.ndarray'    # game -> rounds played.
+
+    @property
+    def games(self) -> int:
+        return len(self.winners)
+
+    @property
+    def finished(self) -> 'np.ndarray':
+        return self.winners != NO_WINNER
+
+    def win_rates(self) -> tuple[float, ...]:
+        """
+        Rate of games won by each seat, over every game. Unfinished games are counted in neither.
+        """
+        counts = np.bincount(self.winners[self.finished], minlength=PLAYERS)
+        return tuple(float(count) / max(1, self.games) for count in counts)
+
+    @property
+    def unfinishedRate(self) -> float:
+        return 1.0 - float(np.count_nonzero(self.finished)) / max(1, self.games)
+
+    def length_histogram(self, bins: int = 20) -> tuple['np.ndarray', 'np.ndarray']:
+        """
+        Histogram of game lengths of finished games.
+        :return: (counts, bin edges), as numpy.histogram.
+        """
+        return np.histogram(self.rounds[self.finished], bins=bins)
+
+    def summary(self) -> dict[str, float]:
+        lengths = self.rounds[self.finished]
+        quantiles = np.percentile(lengths, (10, 50, 90)) if len(lengths) else (0.0, 0.0, 0.0)
+        rates = self.win_rates()
+        return {
+            'games': self.games,
+            'win_rate_0': rates[0],
+            'win_rate_1': rates[1],
+            'unfinished_rate': self.unfinishedRate,
+            'mean_rounds': float(lengths.mean()) if len(lengths) else 0.0,
+            'p10_rounds': float(quantiles[0]),
+            'median_rounds': float(quantiles[1]),
+            'p90_rounds': float(quantiles[2])
+        }
+
+
+def compile_effects(config: SimulationConfig) -> EffectTable:
+    """
+    EffectTable of simulated games. Effects are built from the config's parameters,
+    so that they can be tuned without editing PanelItem.
+    """
+    return EffectTable.compile(
+        PanelItem.__members__.values(), MIN_HP, config.maxHp,
+        hasCustomHandler=lambda item: item.hasCustomHandler,
+        effects=item_effects(config.attackDamage, config.healAmount)
+    )
+
+
+class BatchSimulator:
+    """
+    Simulates batches of games with numpy arrays : hp is a (games, 2) array, and statuses are kept as
+    the last round each player stays blocked or shielded.
+    Tiles of a map are drawn independently, so only the hit tile's item is sampled, not the whole map.
+    """
+
+    def __init__(self, config: SimulationConfig = SimulationConfig(), seed: Optional[int] = None):
+        if np is None:
+            raise ValueError('BatchSimulator needs numpy, but numpy is not installed')
+        self.config = config
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        items = PanelItem.items()
+        weights = config.itemWeights
+        if len(weights) != len(items):
+            raise ValueError(f'BatchSimulator needs one weight per item, got {len(items)} items and {len(weights)} weights')
+        table = compile_effects(config)
+        for item, weight in zip(items, weights):
+            if weight and table.hasHandler[item.value]:
+                raise ValueError(f'{item.name} has custom handler, which cannot be simulated in batch')
+        self._values = np.asarray([item.value for item in items], dtype=np.intp)
+        self._cumulative = np.cumsum(np.asarray(weights, dtype=np.float64))
+        self._cumulative /= self._cumulative[-1]
+        self._compile(table)
+
+    def _compile(self, table: EffectTable):
+        """
+        Turn EffectTable into numpy lookup arrays.
+        """
+        size = len(table.selfDelta)
+        self._selfDelta = np.asarray(table.selfDelta, dtype=np.int32)
+        self._opponentDelta = np.asarray(table.opponentDelta, dtype=np.int32)
+        # item value -> rounds the status lasts on (self, opponent).
+        self._block = np.zeros((size, PLAYERS), dtype=np.int32)
+        self._shield = np.zeros((size, PLAYERS), dtype=np.int32)
+        for value, ops in enumerate(table.statusOps):
+            for op in ops:
+                target = 0 if op.target is EffectTarget.SELF else 1
+                if op.status == STATUS_BLOCK:
+                    self._block[value, target] = max(self._block[value, target], op.duration)
+                elif op.status == STATUS_SHIELD:
+                    self._shield[value, target] = max(self._shield[value, target], op.duration)
+                else:
+                    raise ValueError(f'Status effect {op.status} cannot be simulated in batch')
+        self._blockedTile = PanelItem.BLOCKED_TILE.value
+
+    def run(self, games: int, batchSize: int = SIMULATION_BATCH_SIZE) -> SimulationResult:
+        """
+        Simulate games until they finish, or reach `maxRounds`.
+        :param games: number of games.
+        :param batchSize: games simulated at once.
+        :return: SimulationResult of every game.
+        """
+        winners = np.full(games, NO_WINNER, dtype=np.int8)
+        rounds = np.full(games, self.config.maxRounds, dtype=np.int32)
+        for start in range(0, games, batchSize):
+            stop = min(games, start + batchSize)
+            self._run_batch(winners[start:stop], rounds[start:stop])
+        return SimulationResult(self.config, winners, rounds)
+
+    def _run_batch(self, winners: 'np.ndarray', rounds: 'np.ndarray'):
+        config = self.config
+        rng = self._rng
+        selfDelta = self._selfDelta
+        opponentDelta = self._opponentDelta
+        hitRates = np.asarray(config.hitRates, dtype=np.float64)
+
+        games = np.arange(len(winners))     # running game -> index in the batch.
+        hp = np.full((len(winners), PLAYERS), config.maxHp, dtype=np.int32)
+        blockedUntil = np.zeros_like(hp)    # last round the player's panel is blocked.
+        shieldedUntil = np.zeros_like(hp)
+        for number in range(1, config.maxRounds + 1):
+            if not len(games):
+                break
+            count = len(games)
+            # Item on the hit tile of each player, or BLANK if player did not hit.
+            items = self._values[np.searchsorted(self._cumulative, rng.random((count, PLAYERS)), side='right')]
+            items[blockedUntil >= number] = self._blockedTile
+            items[rng.random((count, PLAYERS)) >= hitRates] = PanelItem.BLANK.value
+            opponentItems = items[:, ::-1]
+
+            delta = selfDelta[items] + opponentDelta[opponentItems]
+            delta[(delta < 0) & (shieldedUntil >= number)] = 0
+            np.minimum(hp + delta, config.maxHp, out=hp)
+
+            # Statuses of this round start from the next round.
+            for durations, until in ((self._block, blockedUntil), (self._shield, shieldedUntil)):
+                duration = np.maximum(durations[items, 0], durations[opponentItems, 1])
+                np.maximum(until, np.where(duration > 0, number + duration, 0), out=until)
+
+            dead = hp < MIN_HP
+            over = dead.any(axis=1)
+            if not over.any():
+                continue
+            # Player who was touched first dies first, and loses. (EffectTable.apply_round resolves hits in seat order)
+            first = np.where(
+                selfDelta[items[:, 0]] != 0, 0,
+                np.where(opponentDelta[items[:, 0]] != 0, 1, np.where(selfDelta[items[:, 1]] != 0, 1, 0))
+            )
+            loser = np.where(dead[:, 0] & dead[:, 1], first, np.where(dead[:, 0], 0, 1))
+            finished = games[over]
+            winners[finished] = 1 - loser[over]
+            rounds[finished] = number
+            keep = ~over
+            games = games[keep]
+            hp = hp[keep]
+            blockedUntil = blockedUntil[keep]
+            shieldedUntil = shieldedUntil[keep]
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Simulate Whack A Mole games in batch.')
+    parser.add_argument('--games', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--weights', type=float, nargs=len(PanelItem.items()), default=None,
+                        help='weights of ' + ', '.join(item.name for item in PanelItem.items()))
+    parser.add_argument('--max-hp', type=int, default=MAX_HP)
+    parser.add_argument('--attack-damage', type=int, default=ATTACK_DAMAGE)
+    parser.add_argument('--heal-amount', type=int, default=HEAL_AMOUNT)
+    parser.add_argument('--hit-rates', type=float, nargs=PLAYERS, default=(0.5, 0.5))
+    parser.add_argument('--max-rounds', type=int, default=MAX_ROUNDS)
+    args = parser.parse_args(argv)
+    config = SimulationConfig(
+        weights=None if args.weights is None else tuple(args.weights),
+        maxHp=args.max_hp, attackDamage=args.attack_damage, healAmount=args.heal_amount,
+        hitRates=tuple(args.hit_rates), maxRounds=args.max_rounds
+    )
+    result = BatchSimulator(config, args.seed).run(args.games)
+    for key, value in result.summary().items():
+        print(f'{key:>16} : {value}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from typing import NamedTuple, Optional
+
+__all__ = (
+    'GameSnapshot',
+)
+
+
+class GameSnapshot(NamedTuple):
+    """
+    Immutable view of a session after a round.
+    Session builds one per round and publishes it by swapping a single reference (GameSession.snapshot),
+    so any number of readers (UI, spectators, loggers) can keep and read it without locking the game loop.
+    """
+    round: int
+    timestamp: float                # wall clock time (time.time()) when snapshot was taken.
+    tickStart: float                # perf_counter time when the round started.
+    names: tuple[str, ...]          # slot -> player name
+    hp: tuple[int, ...]             # slot -> hp
+    alive: bytes                    # slot -> 1 if alive
+    maps: bytes                     # slot * mapSize + index -> item value
+    mapSize: int
+    blocked: bytes                  # slot -> 1 if panel is blocked
+    finished: bool = False
+    finishCode: Optional[int] = None
+    winner: Optional[str] = None
+    loser: Optional[str] = None
+
+    @property
+    def count(self) -> int:
+        return len(self.names)
+
+    def slot_of(self, name: str) -> int:
+        return self.names.index(name)
+
+    def hp_of(self, name: str) -> int:
+        return self.hp[self.slot_of(name)]
+
+    def map_of(self, slot: int) -> bytes:
+        """
+        Get map of the player.
+        :param slot: slot of the player.
+        :return: `mapSize` item values.
+        """
+        start = slot * self.mapSize
+        return self.maps[start:start + self.mapSize]
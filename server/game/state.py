@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import struct
+from array import array
+from typing import Final, Optional, Sequence
+
+__all__ = (
+    'NO_SLOT',
+    'GameState'
+)
+
+NO_SLOT: Final[int] = -1
+MAP_SIZE: Final[int] = 9
+
+# round (I), player count (B), map size (B)
+_HEADER: Final[struct.Struct] = struct.Struct('<IBB')
+
+
+class GameState:
+    """
+    Array-backed round state of a session.
+    Every player gets a slot when it joins, and each array is indexed by the slot :
+    hp, alive flag, opponent slot, team, and the map (`mapSize` item values in `maps` bytearray).
+    GameInfo and Player are thin views over this store.
+    """
+    __slots__ = (
+        'capacity', 'mapSize', 'maxHp', 'round',
+        'names', 'slots', 'hp', 'alive', 'opponents', 'teams',
+        'maps', 'previousMaps'
+    )
+
+    capacity: int
+    mapSize: int
+    maxHp: int
+    round: int
+    names: list[Optional[str]]      # slot -> player name
+    slots: dict[str, int]           # player name -> slot
+    hp: array                       # slot -> hp
+    alive: bytearray                # slot -> 1 if alive
+    opponents: array                # slot -> opponent slot. Kept up to date by targeting.TargetIndex in sessions.
+    teams: bytearray                # slot -> team number. Every player is in team 0 unless teams are given.
+    maps: bytearray                 # slot * mapSize + index -> item value of current round
+    previousMaps: bytearray         # same as maps, for previous round
+
+    def __init__(self, capacity: int, maxHp: int, mapSize: int = MAP_SIZE):
+        self.capacity = capacity
+        self.mapSize = mapSize
+        self.maxHp = maxHp
+        self.round = 0
+        self.names = []
+        self.slots = {}
+        self.hp = array('i', [0] * capacity)
+        self.alive = bytearray(capacity)
+        self.opponents = array('i', [NO_SLOT] * capacity)
+        self.teams = bytearray(capacity)
+        self.maps = bytearray(capacity * mapSize)
+        self.previousMaps = bytearray(capacity * mapSize)
+
+    @property
+    def count(self) -> int:
+        """
+        Number of players in the state.
+        """
+        return len(self.names)
+
+    # Players
+    def add_player(self, name: str, team: int = 0) -> int:
+        """
+        Register player in the next free slot.
+        :param name: name of the player.
+        :param team: team number of the player.
+        :return: slot of the player.
+        """
+        if name in self.slots:
+            raise ValueError(f'Player {name} is already in GameState')
+        slot = len(self.names)
+        if slot >= self.capacity:
+            raise ValueError(f'GameState is full : capacity is {self.capacity}')
+        self.names.append(name)
+        self.slots[name] = slot
+        self.hp[slot] = self.maxHp
+        self.alive[slot] = 1
+        self.teams[slot] = team
+        self.pair_opponents()
+        return slot
+
+    def pair_opponents(self):
+        """
+        Set each player's opponent to the next player, so that two players face each other.
+        """
+        count = len(self.names)
+        for slot in range(count):
+            self.opponents[slot] = (slot + 1) % count if count > 1 else NO_SLOT
+
+    # Maps
+    def begin_round(self):
+        """
+        Start new round. Current maps become previous maps.
+        """
+        self.previousMaps[:] = self.maps
+        self.round += 1
+
+    def set_map(self, slot: int, values: Sequence[int]):
+        start = slot * self.mapSize
+        self.maps[start:start + self.mapSize] = bytes(values)
+
+    def map_of(self, slot: int, previous: bool = False) -> memoryview:
+        """
+        Get map of the player, without copying.
+        :param slot: slot of the player.
+        :param previous: if True, get map of the previous round.
+        :return: read-only view of `mapSize` item values.
+        """
+        start = slot * self.mapSize
+        maps = self.previousMaps if previous else self.maps
+        return memoryview(maps).toreadonly()[start:start + self.mapSize]
+
+    def item_at(self, slot: int, index: int, previous: bool = False) -> int:
+        maps = self.previousMaps if previous else self.maps
+        return maps[slot * self.mapSize + index]
+
+    # Snapshot
+    def copy(self) -> GameState:
+        state = GameState.__new__(GameState)
+        state.capacity = self.capacity
+        state.mapSize = self.mapSize
+        state.maxHp = self.maxHp
+        state.round = self.round
+        state.names = list(self.names)
+        state.slots = dict(self.slots)
+        state.hp = array('i', self.hp)
+        state.alive = bytearray(self.alive)
+        state.opponents = array('i', self.opponents)
+        state.teams = bytearray(self.teams)
+        state.maps = bytearray(self.maps)
+        state.previousMaps = bytearray(self.previousMaps)
+        return state
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize round state : header, hp, alive flags, and maps of the players.
+        Player names are not included.
+        :return: serialized bytes.
+        """
+        count = len(self.names)
+        return b''.join((
+            _HEADER.pack(self.round, count, self.mapSize),
+            self.hp[:count].tobytes(),
+            bytes(self.alive[:count]),
+            bytes(self.maps[:count * self.mapSize])
+        ))
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import heapq
+from array import array
+from typing import Final, NamedTuple
+
+from .effects import StatusApplication
+from .state import GameState
+
+__all__ = (
+    'STATUS_BLOCK', 'STATUS_SHIELD', 'STATUS_DAMAGE', 'STATUS_TYPES',
+    'ScheduledStatus',
+    'StatusEngine'
+)
+
+# Status effect types. EffectOp.status uses one of these.
+STATUS_BLOCK: Final[str] = 'block'      # panel of the target is blocked. (all tiles become blocked tile)
+STATUS_SHIELD: Final[str] = 'shield'    # target does not take damage.
+STATUS_DAMAGE: Final[str] = 'damage'    # target takes `magnitude` damage every round. (damage over time)
+STATUS_TYPES: Final[tuple[str, ...]] = (STATUS_BLOCK, STATUS_SHIELD, STATUS_DAMAGE)
+
+
+class ScheduledStatus(NamedTuple):
+    expiresAt: int      # status is removed when this round is over.
+    order: int          # tie breaker, so that heap never compares status names.
+    slot: int
+    status: str
+    magnitude: int
+
+
+class StatusEngine:
+    """
+    Timed status effects, keyed on round number.
+    Active statuses are kept in a heap ordered by expiry round, so expiring statuses costs O(log n) each,
+    and rounds without expiry cost nothing. Effect of statuses are kept in per-slot counters,
+    which map generation and effect resolution read directly instead of scanning statuses.
+    """
+    __slots__ = ('blocked', 'shielded', 'damage', '_heap', '_order')
+
+    blocked: bytearray      # slot -> number of active block statuses.
+    shielded: bytearray     # slot -> number of active shield statuses.
+    damage: array           # slot -> damage taken every round.
+
+    def __init__(self, capacity: int):
+        self.blocked = bytearray(capacity)
+        self.shielded = bytearray(capacity)
+        self.damage = array('i', [0] * capacity)
+        self._heap: list[ScheduledStatus] = []
+        self._order = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def apply(self, currentRound: int, application: StatusApplication):
+        """
+        Apply status effect. Status lasts for `duration` rounds after the current round.
+        :param currentRound: round when the status is applied.
+        :param application: status to apply.
+        """
+        if application.duration <= 0:
+            return
+        status = application.status
+        slot = application.slot
+        if status == STATUS_BLOCK:
+            self.blocked[slot] += 1
+        elif status == STATUS_SHIELD:
+            self.shielded[slot] += 1
+        elif status == STATUS_DAMAGE:
+            self.damage[slot] += application.magnitude
+        else:
+            raise ValueError(f'Unknown status effect : {status}')
+        self._order += 1
+        heapq.heappush(self._heap, ScheduledStatus(
+            currentRound + application.duration, self._order, slot, status, application.magnitude
+        ))
+
+    def expire(self, currentRound: int) -> int:
+        """
+        Remove statuses which expired before the round.
+        :param currentRound: round which is starting.
+        :return: number of expired statuses.
+        """
+        heap = self._heap
+        expired = 0
+        while heap and heap[0].expiresAt < currentRound:
+            scheduled = heapq.heappop(heap)
+            if scheduled.status == STATUS_BLOCK:
+                self.blocked[scheduled.slot] -= 1
+            elif scheduled.status == STATUS_SHIELD:
+                self.shielded[scheduled.slot] -= 1
+            else:
+                self.damage[scheduled.slot] -= scheduled.magnitude
+            expired += 1
+        return expired
+
+    def apply_damage(self, state: GameState, minHp: int) -> list[int]:
+        """
+        Apply damage over time of the round. Shielded players do not take damage.
+        :param state: GameState of the session.
+        :param minHp: player dies when hp goes under this value.
+        :return: slots of players who died.
+        """
+        deaths = []
+        hp = state.hp
+        damage = self.damage
+        shielded = self.shielded
+        alive = state.alive
+        for slot in range(state.count):
+            amount = damage[slot]
+            if amount and not shielded[slot]:
+                hp[slot] -= amount
+                if hp[slot] < minHp and alive[slot]:
+                    deaths.append(slot)
+        return deaths
+
+    def clear(self):
+        self._heap.clear()
+        for i in range(len(self.blocked)):
+            self.blocked[i] = 0
+            self.shielded[i] = 0
+            self.damage[i] = 0
@@ -0,0 +1,227 @@
+"""
+Parameter sweep over balance parameters, run on a process pool.
+Each cell of the grid (parameters and seed) is simulated with BatchSimulator in a worker process,
+and its summary is cached on disk, so reruns and refined grids only simulate new cells.
+
+Run `python -m server.game.sweep --help` to sweep from command line.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Final, Iterable, NamedTuple, Optional, Sequence
+
+from .game_object import PanelItem, MAX_HP, MIN_HP, ATTACK_DAMAGE, HEAL_AMOUNT, BLOCK_DURATION
+from .simulator import BatchSimulator, SimulationConfig, compile_effects, MAX_ROUNDS, PLAYERS
+
+__all__ = (
+    'SWEEP_CACHE_DIR', 'CACHE_VERSION',
+    'SweepCell',
+    'SweepResult',
+    'ResultCache',
+    'rules_digest',
+    'grid',
+    'simulate_cell',
+    'run_sweep'
+)
+
+SWEEP_CACHE_DIR: Final[str] = 'sweep_cache'
+CACHE_VERSION: Final[int] = 1       # bump when simulation rules change, so that old results are not reused.
+GAMES_PER_CELL: Final[int] = 20000
+
+
+def rules_digest(config: SimulationConfig) -> str:
+    """
+    Hash of the rules a config is simulated with : its compiled EffectTable and the engine constants.
+    Changing an item's effects or a constant changes cell keys, so stale results are not reused
+    even if CACHE_VERSION was not bumped.
+    """
+    table = compile_effects(config)
+    rules = {
+        'selfDelta': table.selfDelta.tolist(),
+        'opponentDelta': table.opponentDelta.tolist(),
+        'statusOps': [[list(op) for op in ops] for ops in table.statusOps],
+        'hasHandler': list(table.hasHandler),
+        'minHp': table.minHp,
+        'maxHp': table.maxHp,
+        'items': [(item.name, item.value) for item in PanelItem.__members__.values()],
+        'MIN_HP': MIN_HP,
+        'BLOCK_DURATION': BLOCK_DURATION,
+        'PLAYERS': PLAYERS
+    }
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SweepCell(NamedTuple):
+    config: SimulationConfig
+    seed: int
+    games: int
+
+    @property
+    def key(self) -> str:
+        """
+        Hash of the cell's parameters and rules. Default weights are resolved, so that `weights=None` and
+        the same weights written out share a cache entry.
+        """
+        config = self.config
+        parameters = {
+            'version': CACHE_VERSION,
+            'rules': rules_digest(config),
+            'weights': [float(weight) for weight in config.itemWeights],
+            'maxHp': config.maxHp,
+            'attackDamage': config.attackDamage,
+            'healAmount': config.healAmount,
+            'hitRates': [float(rate) for rate in config.hitRates],
+            'maxRounds': config.maxRounds,
+            'seed': self.seed,
+            'games': self.games
+        }
+        return hashlib.sha256(json.dumps(parameters, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SweepResult(NamedTuple):
+    cell: SweepCell
+    summary: dict[str, float]
+    cached: bool        # True if the result was read from cache instead of simulated.
+
+
+class ResultCache:
+    """
+    Summaries of simulated cells, one json file per cell key.
+    Files are written to a temporary file and renamed, so a killed sweep never leaves half written entries.
+    """
+
+    def __init__(self, directory: str = SWEEP_CACHE_DIR):
+        self.directory = directory
+
+    def path_of(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + '.json')
+
+    def get(self, cell: SweepCell) -> Optional[dict[str, float]]:
+        try:
+            with open(self.path_of(cell.key), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, cell: SweepCell, summary: dict[str, float]):
+        path = self.path_of(cell.key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(summary, file)
+        os.replace(temporary, path)
+
+
+def grid(
+        weights: Iterable[Optional[Sequence[float]]] = (None,),
+        maxHp: Iterable[int] = (MAX_HP,),
+        attackDamage: Iterable[int] = (ATTACK_DAMAGE,),
+        healAmount: Iterable[int] = (HEAL_AMOUNT,),
+        hitRates: Iterable[tuple[float, float]] = ((0.5, 0.5),),
+        maxRounds: int = MAX_ROUNDS
+) -> list[SimulationConfig]:
+    """
+    Every combination of the given parameter values.
+    """
+    return [
+        SimulationConfig(None if w is None else tuple(w), hp, attack, heal, tuple(rates), maxRounds)
+        for w, hp, attack, heal, rates in itertools.product(weights, maxHp, attackDamage, healAmount, hitRates)
+    ]
+
+
+def simulate_cell(cell: SweepCell) -> dict[str, float]:
+    """
+    Simulate a cell. Runs in worker process.
+    """
+    return BatchSimulator(cell.config, cell.seed).run(cell.games).summary()
+
+
+def run_sweep(
+        configs: Iterable[SimulationConfig],
+        seeds: Iterable[int] = (0,),
+        games: int = GAMES_PER_CELL,
+        workers: Optional[int] = None,
+        cache: Optional[ResultCache] = None
+) -> list[SweepResult]:
+    """
+    Simulate every (config, seed) cell which is not cached yet, on a process pool.
+    :param configs: parameters to simulate.
+    :param seeds: seeds to simulate each config with.
+    :param games: games simulated per cell.
+    :param workers: number of worker processes. Default is number of cores.
+    :param cache: cache of cell results. Default cache directory is used if not given.
+    :return: results of every cell, in grid order.
+    """
+    cache = cache or ResultCache()
+    cells = [SweepCell(config, seed, games) for config in configs for seed in seeds]
+    results: dict[SweepCell, SweepResult] = {}
+    missing = []
+    for cell in cells:
+        summary = cache.get(cell)
+        if summary is None:
+            missing.append(cell)
+        else:
+            results[cell] = SweepResult(cell, summary, True)
+    if missing:
+        workers = min(len(missing), workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(simulate_cell, cell): cell for cell in missing}
+            for future in as_completed(futures):
+                cell = futures[future]
+                summary = future.result()
+                # Cached as soon as it finishes, so an interrupted sweep keeps finished cells.
+                cache.put(cell, summary)
+                results[cell] = SweepResult(cell, summary, False)
+    return [results[cell] for cell in cells]
+
+
+def _parse_weights(text: str) -> tuple[float, ...]:
+    weights = tuple(float(weight) for weight in text.split(','))
+    if len(weights) != len(PanelItem.items()):
+        raise argparse.ArgumentTypeError(f'{len(PanelItem.items())} weights are needed, got {len(weights)}')
+    return weights
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description='Sweep balance parameters of Whack A Mole with batch simulation.')
+    parser.add_argument('--weights', type=_parse_weights, nargs='+', default=[None],
+                        help='comma separated weights of ' + ', '.join(item.name for item in PanelItem.items()))
+    parser.add_argument('--max-hp', type=int, nargs='+', default=[MAX_HP])
+    parser.add_argument('--attack-damage', type=int, nargs='+', default=[ATTACK_DAMAGE])
+    parser.add_argument('--heal-amount', type=int, nargs='+', default=[HEAL_AMOUNT])
+    parser.add_argument('--max-rounds', type=int, default=MAX_ROUNDS)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0])
+    parser.add_argument('--games', type=int, default=GAMES_PER_CELL)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', default=SWEEP_CACHE_DIR, help='directory of cached results')
+    parser.add_argument('--out', default=None, help='csv file to write. Default is stdout.')
+    args = parser.parse_args(argv)
+    configs = grid(args.weights, args.max_hp, args.attack_damage, args.heal_amount, maxRounds=args.max_rounds)
+    results = run_sweep(configs, args.seeds, args.games, args.workers, ResultCache(args.cache))
+
+    out = open(args.out, 'w', newline='', encoding='utf-8') if args.out else sys.stdout
+    try:
+        writer = csv.writer(out)
+        keys = list(results[0].summary) if results else []
+        writer.writerow(['weights', 'max_hp', 'attack_damage', 'heal_amount', 'seed', 'cached'] + keys)
+        for result in results:
+            config = result.cell.config
+            writer.writerow(
+                [' '.join(f'{w:g}' for w in config.itemWeights), config.maxHp, config.attackDamage, config.healAmount,
+                 result.cell.seed, result.cached] + [result.summary[key] for key in keys]
+            )
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
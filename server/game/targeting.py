@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import enum
+from array import array
+from typing import Optional, Sequence
+
+from .state import GameState, NO_SLOT
+
+__all__ = (
+    'TEAM_COUNT',
+    'TargetMode',
+    'TargetIndex',
+    'assign_teams'
+)
+
+TEAM_COUNT = 2
+
+
+class TargetMode(enum.IntEnum):
+    NEXT_ALIVE = 0      # free for all : each player targets the next alive player.
+    LOWEST_HP = 1       # free for all : each player targets the alive player with the lowest hp.
+    TEAM = 2            # each player targets a player of the next alive team.
+
+
+class TargetIndex:
+    """
+    Keeps GameState.opponents up to date for the session's targeting rule,
+    so that resolving the target of a hit stays a single array lookup. (EffectTable.apply_round)
+
+    Targets are recomputed only when the structure changes :
+        NEXT_ALIVE  : alive players form a doubly linked ring. A death unlinks one slot, in O(1).
+        TEAM        : each team keeps its alive members. A death reassigns two teams, in O(team size).
+        LOWEST_HP   : hp changes every round, so lowest and second lowest hp are found once per round, in O(n).
+    """
+    __slots__ = ('state', 'mode', 'aliveCount', '_previous', '_members', '_teamOrder')
+
+    def __init__(self, state: GameState, mode: TargetMode = TargetMode.NEXT_ALIVE):
+        self.state = state
+        self.mode = mode
+        self.aliveCount = 0
+        self._previous = array('i', [NO_SLOT] * state.capacity)     # NEXT_ALIVE : slot -> previous alive slot.
+        self._members: dict[int, list[int]] = {}        # TEAM : team -> alive slots.
+        self._teamOrder: list[int] = []                 # TEAM : alive teams, in targeting order.
+        self.rebuild()
+
+    @property
+    def aliveTeams(self) -> int:
+        return len(self._teamOrder) if self.mode is TargetMode.TEAM else self.aliveCount
+
+    @property
+    def isOver(self) -> bool:
+        """
+        Whether only one player (or one team) is left.
+        """
+        return self.aliveTeams <= 1
+
+    def rebuild(self):
+        """
+        Build targets of every alive player from scratch. Called when players join.
+        """
+        state = self.state
+        alive = [slot for slot in range(state.count) if state.alive[slot]]
+        self.aliveCount = len(alive)
+        for slot in range(state.capacity):
+            state.opponents[slot] = NO_SLOT
+        if self.mode is TargetMode.NEXT_ALIVE:
+            count = len(alive)
+            for i, slot in enumerate(alive):
+                target = alive[(i + 1) % count]
+                if target != slot:
+                    state.opponents[slot] = target
+                    self._previous[target] = slot
+        elif self.mode is TargetMode.TEAM:
+            self._members = {}
+            for slot in alive:
+                self._members.setdefault(state.teams[slot], []).append(slot)
+            self._teamOrder = sorted(self._members)
+            for team in self._teamOrder:
+                self._assign_team(team)
+        else:
+            self.update_round()
+
+    def _assign_team(self, team: int):
+        """
+        Spread members of the team over members of the next alive team.
+        """
+        order = self._teamOrder
+        members = self._members[team]
+        if len(order) < 2:
+            for slot in members:
+                self.state.opponents[slot] = NO_SLOT
+            return
+        enemies = self._members[order[(order.index(team) + 1) % len(order)]]
+        for i, slot in enumerate(members):
+            self.state.opponents[slot] = enemies[i % len(enemies)]
+
+    def on_death(self, slot: int):
+        """
+        Remove dead player from targeting. GameState.alive must be cleared by caller.
+        :param slot: slot of the dead player.
+        """
+        state = self.state
+        opponents = state.opponents
+        self.aliveCount -= 1
+        if self.mode is TargetMode.NEXT_ALIVE:
+            previous = self._previous[slot]
+            following = opponents[slot]
+            if previous != NO_SLOT and following != NO_SLOT:
+                opponents[previous] = following if following != previous else NO_SLOT
+                self._previous[following] = previous if following != previous else NO_SLOT
+        elif self.mode is TargetMode.TEAM:
+            team = state.teams[slot]
+            members = self._members[team]
+            members.remove(slot)
+            order = self._teamOrder
+            index = order.index(team)
+            attacker = order[index - 1]     # team which targets the dead player's team.
+            if not members:
+                del self._members[team]
+                order.pop(index)
+                for remaining in self._teamOrder:
+                    if remaining == attacker or len(order) < 2:
+                        self._assign_team(remaining)
+            else:
+                self._assign_team(team)
+                if attacker != team:
+                    self._assign_team(attacker)
+        else:
+            self.update_round()
+        opponents[slot] = NO_SLOT
+
+    def update_round(self):
+        """
+        Update targets which depend on hp. Called once per round, after hp changes are applied.
+        """
+        if self.mode is not TargetMode.LOWEST_HP:
+            return
+        state = self.state
+        hp = state.hp
+        alive = state.alive
+        lowest: Optional[int] = None
+        second: Optional[int] = None
+        for slot in range(state.count):
+            if not alive[slot]:
+                continue
+            if lowest is None or hp[slot] < hp[lowest]:
+                lowest, second = slot, lowest
+            elif second is None or hp[slot] < hp[second]:
+                second = slot
+        opponents = state.opponents
+        for slot in range(state.count):
+            if not alive[slot] or lowest is None:
+                opponents[slot] = NO_SLOT
+            elif slot != lowest:
+                opponents[slot] = lowest
+            else:
+                opponents[slot] = NO_SLOT if second is None else second
+
+    def targets(self) -> Sequence[int]:
+        return self.state.opponents[:self.state.count]
+
+
+def assign_teams(count: int, teamCount: int = TEAM_COUNT) -> list[int]:
+    """
+    Spread players into teams in turn : 0, 1, ..., teamCount - 1, 0, 1, ...
+    :param count: number of players.
+    :param teamCount: number of teams.
+    :return: team number of each player.
+    """
+    return [i % teamCount for i in range(count)]
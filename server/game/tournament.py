@@ -0,0 +1,335 @@
+"""
+Tournament scheduler running on top of a SessionHost.
+Matches wait in a queue, and a match starts as soon as every pad of it is idle,
+so independent matches run at once and no pad waits for an operator.
+"""
+from __future__ import annotations
+
+import enum
+import itertools
+import threading
+from typing import Final, NamedTuple, Optional
+
+from .game_object import GameSession, GameFinishCode, TICK_RATE
+
+__all__ = (
+    'TournamentFormat',
+    'MatchResult',
+    'Match',
+    'Standing',
+    'Tournament',
+    'round_robin_rounds'
+)
+
+BYE: Final[None] = None     # empty seat of a bracket.
+MATCH_ATTEMPTS: Final[int] = 2     # times a match is played before it is recorded as no contest.
+
+
+class TournamentFormat(enum.IntEnum):
+    ROUND_ROBIN = 0         # every player meets every other player once.
+    SINGLE_ELIMINATION = 1  # loser of a match is out. Winners meet in the next round of the bracket.
+
+
+class MatchResult(NamedTuple):
+    winner: Optional[str]   # None if match was no contest.
+    loser: Optional[str]
+    rounds: int
+    hp: dict[str, int]      # player name -> hp when the match ended.
+    finishCode: Optional[int]
+
+
+class Match:
+    """
+    A match of the tournament. Players are names of clients.
+    In SINGLE_ELIMINATION, players are filled in when feeder matches finish.
+    """
+    __slots__ = ('matchId', 'round', 'players', 'waiting', 'next', 'nextSeat', 'session', 'result', 'attempts')
+
+    def __init__(self, matchId: int, round: int, players: Optional[list[Optional[str]]] = None):
+        self.matchId = matchId
+        self.round = round
+        self.players: list[Optional[str]] = players if players is not None else [BYE, BYE]
+        self.waiting = 0                        # feeder matches not finished yet. (SINGLE_ELIMINATION)
+        self.next: Optional[Match] = None       # match where winner goes. (SINGLE_ELIMINATION)
+        self.nextSeat = 0                       # seat of the winner in the next match.
+        self.session: Optional[GameSession] = None
+        self.result: Optional[MatchResult] = None
+        self.attempts = 0                       # sessions started for this match.
+
+    @property
+    def finished(self) -> bool:
+        return self.result is not None
+
+    def __repr__(self) -> str:
+        return f'Match(id={self.matchId}, round={self.round}, players={self.players}, result={self.result})'
+
+
+class Standing:
+    """
+    Record of a player. Updated when each of the player's matches finishes.
+    """
+    __slots__ = ('name', 'played', 'wins', 'losses', 'noContests', 'hpLeft', 'eliminated')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.played = 0
+        self.wins = 0
+        self.losses = 0
+        self.noContests = 0     # matches which ended without a result. Neither a win nor a loss.
+        self.hpLeft = 0         # sum of hp left at the end of matches. Breaks ties of wins.
+        self.eliminated = False
+
+    @property
+    def key(self) -> tuple[int, int, int]:
+        return -self.wins, self.losses, -self.hpLeft
+
+    def __repr__(self) -> str:
+        return f'Standing({self.name}, {self.wins}W {self.losses}L, hp={self.hpLeft})'
+
+
+def round_robin_rounds(players: list[str]) -> list[list[tuple[str, str]]]:
+    """
+    Schedule round robin with circle method. Matches in a round share no player, so they can run at once.
+    :param players: names of players.
+    :return: list of rounds, each is a list of pairs.
+    """
+    seats: list[Optional[str]] = list(players)
+    if len(seats) % 2:
+        seats.append(BYE)
+    count = len(seats)
+    rounds = []
+    for _ in range(count - 1):
+        pairs = [(seats[i], seats[count - 1 - i]) for i in range(count // 2)]
+        rounds.append([pair for pair in pairs if BYE not in pair])
+        seats.insert(1, seats.pop())
+    return rounds
+
+
+class Tournament:
+    """
+    Runs every match of a tournament on host's sessions.
+    Host calls `on_session_finished` from the game thread of a finished session,
+    and the scheduler starts every queued match whose pads became idle.
+    """
+
+    def __init__(
+            self,
+            host,
+            format: TournamentFormat = TournamentFormat.ROUND_ROBIN,
+            clients: Optional[list] = None,
+            tickRate: float = TICK_RATE
+    ):
+        """
+        :param host: SessionHost (GameManager) running the matches.
+        :param format: format of the tournament.
+        :param clients: clients taking part in. Idle clients of the host are used if not given.
+        :param tickRate: rounds per second of each match.
+        """
+        self.host = host
+        self.format = TournamentFormat(format)
+        self.tickRate = tickRate
+        clients = host.idle_clients() if clients is None else list(clients)
+        if len(clients) < 2:
+            raise ValueError(f'Tournament needs at least 2 clients, not {len(clients)}')
+        self.clients = {client.name: client for client in clients}
+        self.standings = {name: Standing(name) for name in self.clients}
+        self.matches: list[Match] = []
+        self.pending: list[Match] = []      # matches ready to play, in order.
+        self.running: dict[int, Match] = {}     # session id -> match.
+        self.cancelled = False
+        self._busy: set[str] = set()        # names of players in running matches.
+        self._lock = threading.RLock()
+        self._matchIds = itertools.count(1)
+        self._done = threading.Event()
+        if self.format is TournamentFormat.ROUND_ROBIN:
+            self._build_round_robin()
+        else:
+            self._build_bracket()
+
+    # Building
+    def _new_match(self, round: int, players: Optional[list[Optional[str]]] = None) -> Match:
+        match = Match(next(self._matchIds), round, players)
+        self.matches.append(match)
+        return match
+
+    def _build_round_robin(self):
+        for number, pairs in enumerate(round_robin_rounds(list(self.clients)), start=1):
+            for pair in pairs:
+                self.pending.append(self._new_match(number, list(pair)))
+
+    def _build_bracket(self):
+        size = 1
+        while size < len(self.clients):
+            size *= 2
+        seats: list[Optional[str]] = list(self.clients) + [BYE] * (size - len(self.clients))
+        # Spread byes, so that no first round match is between two byes.
+        seats = [seats[i // 2] if i % 2 == 0 else seats[size - 1 - i // 2] for i in range(size)]
+        current = [self._new_match(1, seats[i:i + 2]) for i in range(0, size, 2)]
+        first = list(current)
+        number = 1
+        while len(current) > 1:
+            number += 1
+            following = []
+            for i in range(0, len(current), 2):
+                match = self._new_match(number)
+                for seat, feeder in enumerate(current[i:i + 2]):
+                    feeder.next = match
+                    feeder.nextSeat = seat
+                    match.waiting += 1
+                following.append(match)
+            current = following
+        for match in first:
+            if BYE in match.players:
+                self._walkover(match)
+            else:
+                self.pending.append(match)
+
+    # Scheduling
+    @property
+    def isRunning(self) -> bool:
+        return not self._done.is_set()
+
+    @property
+    def clientList(self) -> list:
+        return list(self.clients.values())
+
+    def start(self) -> int:
+        """
+        Start every match which can be played now.
+        :return: number of started matches.
+        """
+        self.host.logger.info(f'Tournament >>> {self.format.name} of {len(self.clients)} players, {len(self.matches)} matches.')
+        return self.dispatch()
+
+    def dispatch(self) -> int:
+        """
+        Start queued matches whose players are all idle. Matches further in the queue may start first,
+        so a pad never waits for an unrelated match.
+        :return: number of started matches.
+        """
+        started = []
+        with self._lock:
+            if self.cancelled:
+                self._check_done()
+                return 0
+            busy = self.host.busy_clients()
+            for match in list(self.pending):
+                if any(name in self._busy or id(self.clients[name]) in busy for name in match.players):
+                    continue
+                self.pending.remove(match)
+                self._busy.update(match.players)
+                clients = [self.clients[name] for name in match.players]
+                match.session = self.host.create_session(clients, self.tickRate)
+                match.attempts += 1
+                self.running[match.session.sessionId] = match
+                started.append(match)
+            self._check_done()
+        for match in started:
+            self.host.write_event_log(f'Tournament : Match {match.matchId} ({" vs ".join(match.players)}) started.')
+            match.session.run()
+        return len(started)
+
+    def on_session_finished(self, session: GameSession):
+        """
+        Record the result of a finished match and start following matches. Called from session's game thread.
+        """
+        with self._lock:
+            match = self.running.pop(session.sessionId, None)
+            if match is None:
+                return
+            self._busy.difference_update(match.players)
+            info = session.gameInfo
+            if info is not None and info.finish_code is GameFinishCode.SHUTDOWN_COMMAND:
+                self.cancel()
+                return
+            state = session.state
+            hp = {name: state.hp[slot] for name, slot in state.slots.items()} if state is not None else {}
+            winner = info.winner.name if info is not None and info.winner is not None else None
+            loser = info.loser.name if info is not None and info.loser is not None else None
+            finishCode = None if info is None or info.finish_code is None else int(info.finish_code)
+            if winner is None and match.attempts < MATCH_ATTEMPTS and not self.cancelled:
+                # Match could not be played. (ex : pad disconnected) Play it again when its pads are free.
+                self.pending.insert(0, match)
+                message = f'Tournament : Match {match.matchId} ended without result. Playing it again.'
+            else:
+                # No seat order decides a match : match without result is no contest.
+                self._record(match, MatchResult(winner, loser, state.round if state is not None else 0, hp, finishCode))
+                if winner is None:
+                    message = f'Tournament : Match {match.matchId} ended without result. No contest.'
+                else:
+                    message = f'Tournament : Match {match.matchId} won by {winner}.'
+        self.host.write_event_log(message)
+        self.dispatch()
+
+    def _record(self, match: Match, result: MatchResult):
+        """
+        Store result of the match, and update standings of its players only.
+        In SINGLE_ELIMINATION, nobody goes through a match without winner : its seat in the next match is a bye.
+        """
+        match.result = result
+        for name in match.players:
+            if name is BYE:
+                continue
+            standing = self.standings[name]
+            if result.winner is None:
+                standing.noContests += 1
+            else:
+                standing.played += 1
+                standing.hpLeft += max(0, result.hp.get(name, 0))
+            if name == result.winner:
+                standing.wins += 1
+            else:
+                standing.losses += result.winner is not None
+                standing.eliminated = self.format is TournamentFormat.SINGLE_ELIMINATION
+        if match.next is not None:
+            following = match.next
+            following.players[match.nextSeat] = result.winner
+            following.waiting -= 1
+            if following.waiting == 0:
+                if BYE in following.players:
+                    self._walkover(following)
+                else:
+                    self.pending.append(following)
+
+    def _walkover(self, match: Match):
+        # Both seats are byes if both feeder matches were no contest.
+        winner = match.players[0] if match.players[0] is not BYE else match.players[1]
+        self._record(match, MatchResult(winner, None, 0, {}, None))
+
+    def _check_done(self):
+        if not self.pending and not self.running:
+            self._done.set()
+
+    def cancel(self):
+        """
+        Stop scheduling matches. Running matches are not stopped : shut them down with the host.
+        """
+        with self._lock:
+            self.cancelled = True
+            self.pending.clear()
+            if not self.running:
+                self._done.set()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every match finishes.
+        :return: True if the tournament finished.
+        """
+        return self._done.wait(timeout)
+
+    # Results
+    def ranking(self) -> list[Standing]:
+        """
+        Standings sorted by wins, losses, then hp left.
+        """
+        with self._lock:
+            return sorted(self.standings.values(), key=lambda standing: standing.key)
+
+    @property
+    def champion(self) -> Optional[str]:
+        if self.isRunning:
+            return None
+        if self.format is TournamentFormat.SINGLE_ELIMINATION:
+            final = self.matches[-1]
+            return None if final.result is None else final.result.winner
+        return self.ranking()[0].name
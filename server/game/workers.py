@@ -0,0 +1,233 @@
+"""
+Process-sharded sessions.
+Sessions are split into shards, and each shard runs in its own worker process which owns serial ports of its pads,
+so game logic of different shards does not share a GIL with each other or with UI.
+Workers stream drained events (log texts and GameSnapshots) back to UI process over a pipe, once per UI frame.
+"""
+from __future__ import annotations
+
+import enum
+import logging
+import multiprocessing
+import os
+import threading
+from multiprocessing.connection import Connection, wait
+from typing import Final, NamedTuple, Optional
+
+from .device import WhackAMoleClient, FakeWAMClient
+from .events import EventQueue, GameEvent
+from .game import SessionHost
+from .game_object import DEVICE_ERRORS, TICK_RATE
+from .recording import RECORD_DIRECTORY
+
+__all__ = (
+    'SHARD_FRAME_RATE',
+    'ClientSpec',
+    'ShardCommand',
+    'ShardHost',
+    'run_shard',
+    'ShardPool'
+)
+
+SHARD_FRAME_RATE: Final[int] = 60       # event batches sent to UI process per second.
+JOIN_TIMEOUT: Final[float] = 5.0        # seconds to wait for a worker to exit after its sessions finished.
+
+
+class ClientSpec(NamedTuple):
+    """
+    Picklable description of a client. Worker opens the serial port itself.
+    """
+    name: str
+    port: str
+    clientNumber: int
+    fake: bool = False
+
+    @classmethod
+    def from_client(cls, client) -> ClientSpec:
+        return cls(client.name, client.port, client.clientNumber, isinstance(client, FakeWAMClient))
+
+    def build(self):
+        if self.fake:
+            return FakeWAMClient(self.name, self.port, self.clientNumber)
+        return WhackAMoleClient(self.name, self.port, self.clientNumber)
+
+
+class ShardCommand(enum.IntEnum):
+    SHUTDOWN = 0
+
+
+class ShardHost(SessionHost):
+    """
+    Session host of a worker process. Events are forwarded to UI process instead of being drained by UI.
+    """
+    def __init__(self, logger, clients: list, conn: Connection, recordDirectory: Optional[str] = RECORD_DIRECTORY):
+        super().__init__(logger, clients, recordDirectory)
+        self.conn = conn
+
+    def forward_events(self) -> int:
+        """
+        Send events published since last call to UI process, in one message.
+        :return: number of sent events.
+        """
+        events = self.events.drain()
+        if events:
+            self.conn.send(events)
+        return len(events)
+
+    def serve(self, pairs: list[list], tickRate: float = TICK_RATE):
+        """
+        Run sessions of the shard until every session finishes.
+        :param pairs: clients of each session.
+        :param tickRate: rounds per second.
+        """
+        sessions = [self.create_session(clients, tickRate) for clients in pairs]
+        for session in sessions:
+            session.run()
+        interval = 1 / SHARD_FRAME_RATE
+        while any(session.is_running for session in sessions):
+            if self.conn.poll(interval):
+                command = self.conn.recv()
+                if command == ShardCommand.SHUTDOWN:
+                    self.shutdown_sessions()
+            self.forward_events()
+        for session in sessions:
+            session.join()
+        self.forward_events()
+        self.hub.stop()
+
+
+def run_shard(
+        shardId: int,
+        specs: list[list[ClientSpec]],
+        conn: Connection,
+        tickRate: float = TICK_RATE,
+        recordDirectory: Optional[str] = RECORD_DIRECTORY
+):
+    """
+    Entry point of worker process.
+    :param shardId: number of the shard.
+    :param specs: clients of each session.
+    :param conn: pipe to UI process.
+    :param tickRate: rounds per second.
+    :param recordDirectory: directory where sessions are recorded. Sessions are not recorded if None.
+    """
+    logger = logging.getLogger(f'wam.shard{shardId}')
+    try:
+        pairs = [[spec.build() for spec in pair] for pair in specs]
+        ShardHost(
+            logger, [client for pair in pairs for client in pair], conn, recordDirectory
+        ).serve(pairs, tickRate)
+    finally:
+        conn.send(None)     # end of shard.
+        conn.close()
+
+
+class ShardPool:
+    """
+    Worker processes of sharded sessions, seen from UI process.
+    Receiver thread publishes events of every worker into the given EventQueue,
+    with (shard id, session id) as event source.
+    """
+    def __init__(
+            self,
+            events: EventQueue,
+            logger,
+            workers: Optional[int] = None,
+            recordDirectory: Optional[str] = RECORD_DIRECTORY
+    ):
+        """
+
+        Args:
+            events (EventQueue) : queue where workers' events are published.
+            logger : logger of GameManager.
+            workers (Optional[int]) : number of worker processes. Default is number of cores, except one for UI.
+            recordDirectory (Optional[str]) : directory where workers record sessions. Not recorded if None.
+        """
+        self.events = events
+        self.logger = logger
+        self.workers = workers or max(1, (os.cpu_count() or 1) - 1)
+        self.recordDirectory = recordDirectory
+        self.clients: list = []
+        self._processes: dict[int, multiprocessing.Process] = {}
+        self._conns: dict[int, Connection] = {}
+        self._receiver: Optional[threading.Thread] = None
+        # Kivy and serial readers run threads in UI process, so workers are spawned instead of forked.
+        self._context = multiprocessing.get_context('spawn')
+
+    @property
+    def isRunning(self) -> bool:
+        return self._receiver is not None and self._receiver.is_alive()
+
+    def start(self, pairs: list[list], tickRate: float = TICK_RATE):
+        """
+        Split sessions into shards, and start worker processes.
+        :param pairs: clients of each session.
+        :param tickRate: rounds per second.
+        """
+        shards: list[list[list[ClientSpec]]] = [[] for _ in range(min(self.workers, len(pairs)))]
+        for i, pair in enumerate(pairs):
+            shards[i % len(shards)].append([ClientSpec.from_client(client) for client in pair])
+        self.clients = [client for pair in pairs for client in pair]
+        # Worker owns serial ports of its pads. Release them in this process.
+        for client in self.clients:
+            if isinstance(client, WhackAMoleClient):
+                client.stop_reader()
+                client.disconnect()
+        for shardId, specs in enumerate(shards):
+            receiver, sender = self._context.Pipe(duplex=True)
+            process = self._context.Process(
+                target=run_shard, args=(shardId, specs, sender, tickRate, self.recordDirectory),
+                name=f'WamShard({shardId})', daemon=True
+            )
+            process.start()
+            sender.close()
+            self._processes[shardId] = process
+            self._conns[shardId] = receiver
+        self._receiver = threading.Thread(target=self._receive_loop, name='ShardReceiver', daemon=True)
+        self._receiver.start()
+
+    def shutdown(self):
+        """
+        Request every worker to finish its sessions.
+        """
+        for conn in list(self._conns.values()):
+            try:
+                conn.send(ShardCommand.SHUTDOWN)
+            except (OSError, ValueError):
+                pass    # worker already exited.
+
+    def join(self, timeout: Optional[float] = None):
+        if self._receiver is not None:
+            self._receiver.join(timeout)
+
+    def _receive_loop(self):
+        byConn = {conn: shardId for shardId, conn in self._conns.items()}
+        while byConn:
+            for conn in wait(list(byConn)):
+                shardId = byConn[conn]
+                try:
+                    events: Optional[list[GameEvent]] = conn.recv()
+                except EOFError:
+                    events = None
+                if events is None:
+                    del byConn[conn]
+                    self._close_shard(shardId)
+                    continue
+                for event in events:
+                    self.events.publish(event.type, event.payload, (shardId, event.source))
+        # Pads are free again. Reopen their serial ports in this process.
+        for client in self.clients:
+            if isinstance(client, WhackAMoleClient) and not client.isConnected:
+                try:
+                    client.connect()
+                except DEVICE_ERRORS as e:
+                    # Pad was unplugged during sharded play. Other pads are still reopened.
+                    self.logger.warning(f'ShardPool >>> Cannot reopen {client.name} ({client.port}) : {e}')
+
+    def _close_shard(self, shardId: int):
+        conn = self._conns.pop(shardId)
+        conn.close()
+        process = self._processes.pop(shardId)
+        process.join(JOIN_TIMEOUT)
+        if process.exitcode not in (0, None):
+            self.logger.info(f'ShardPool >>> Worker {shardId} exited with code {process.exitcode}.')
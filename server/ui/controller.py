@@ -1,7 +1,7 @@
 from typing import Optional
 
-from server.game.device import FakeWAMClient
 from server.game.errors import ImproperSessionPlayers
+from server.game.events import GameEventType
 
 
 class UIController:
@@ -28,16 +28,46 @@ class UIController:
     # Control Game
     @property
     def is_running(self) -> bool:
-        return self.game_manager.current_session is not None
+        return self.game_manager.is_running
 
-    def start_game(self):
+    def start_game(self, sharded: bool = False):
+        """
+        Start game sessions for every connected pad.
+        :param sharded: if True, sessions run in worker processes instead of game threads of this process.
+        """
         if self.is_running:
             # TODO : Consider ignore `start_game` task instead of raising Exception and breaking process.
             raise ValueError('GameSession is already running')
-        self.logger.info('Create new game session.')
-        session = self.game_manager.create_session()
-        self.logger.info('Start game session.')
-        session.run()
+        self.logger.info('Create game sessions for every connected pad.')
+        if sharded:
+            self.game_manager.start_sharded_sessions()
+        else:
+            self.game_manager.start_sessions()
+        self.logger.info('Started game sessions.')
+
+    def start_tournament(self, format: int = 0):
+        """
+        Start a tournament of every connected pad. Next matches start by themselves when pads are free.
+        :param format: server.game.tournament.TournamentFormat. (0 : round robin, 1 : single elimination)
+        """
+        if self.is_running:
+            # TODO : Consider ignore `start_tournament` task instead of raising Exception and breaking process.
+            raise ValueError('GameSession is already running')
+        self.logger.info('Start tournament of every connected pad.')
+        self.game_manager.start_tournament(format)
+        self.write_text('두더지 배틀 게임 토너먼트를 시작합니다.')
+
+    def start_replay(self, path: str):
+        """
+        Replay a recorded session on screen, at the recorded speed.
+        :param path: path of the session recording. (`recordings/*.wamr`)
+        """
+        if self.is_running:
+            # TODO : Consider ignore `start_replay` task instead of raising Exception and breaking process.
+            raise ValueError('GameSession is already running')
+        self.logger.info(f'Replay recorded session {path}.')
+        self.game_manager.start_replay(path)
+        self.write_text(f'기록된 세션을 재생합니다. ({path})')
 
     def start_test_game(self):
         if self.is_running:
@@ -45,15 +75,10 @@ class UIController:
             raise ValueError('GameSession is already running')
         self.logger.info('Create new Test game session.')
         self.write_text('두더지 배틀 게임 (TEST) 의 세션을 생성중입니다...')
-        self.game_manager.clients = [
-            FakeWAMClient(name='Player0', port='FakeSerialPort/0', clientNumber=0),
-            FakeWAMClient(name='Player1', port='FakeSerialPort/1', clientNumber=1)
-        ]
+        self.game_manager.use_test_clients(2)
         self.write_text('두더지 배틀 게임 (TEST) 에 사용될 FakeWAMClient 객체를 생성했습니다.')
-        session = self.game_manager.create_session()
         self.logger.info('Start test game session.')
-        self.write_text('두더지 배틀 게임 (TEST) 의 세션을 생성했습니다.')
-        session.run()
+        self.game_manager.start_sessions()
         self.write_text('두더지 배틀 게임 (TEST) 의 세션을 시작합니다.')
 
     def stop_game(self):
@@ -61,16 +86,34 @@ class UIController:
             # TODO : Consider ignore `stop_game` task instead of raising Exception and breaking process.
             raise ValueError('GameSession is not running')
 
-        self.game_manager.current_session.shutdown()
+        self.game_manager.shutdown_sessions()
+
+    # Game Events
+    def drain_events(self, dt: float = 0):
+        """
+        Apply events published by game thread. Scheduled on UI thread with kivy Clock, once per frame.
+        :param dt: seconds since last call. (passed by kivy Clock)
+        """
+        if self.game_manager is None:
+            return
+        for event in self.game_manager.events.drain():
+            if event.type is GameEventType.LOG:
+                self.write_text(event.payload)
+            elif event.type is GameEventType.SCREEN:
+                self.update_game_info(event.payload)
+            elif event.type is GameEventType.RESULT:
+                self.update_game_info(event.payload)
+                if not self.is_running:
+                    self.handle_game_finish()
 
     # Control Window
     def write_text(self, text: str):
         self.app.write_event_log(text)
 
-    def update_game_info(self, gameInfo):
+    def update_game_info(self, snapshot):
         """
-        Update ui using gameInfo.
-        :param gameInfo: game.GameInfo object containing game's information.
+        Update ui using snapshot of the game.
+        :param snapshot: game.GameSnapshot object containing game's information. It is immutable, so it can be kept.
         """
         pass
 
@@ -2,6 +2,7 @@ from typing import Optional, Final, ClassVar
 
 import kivy
 from kivy.app import App
+from kivy.clock import Clock
 from kivy.config import Config
 from kivy.core.text import LabelBase
 from kivy.uix.label import Label
@@ -30,6 +31,9 @@ class ColorPallet:
     Black: Final[str] = '#000000'
 
 
+UI_FRAME_RATE: Final[int] = 60      # Game events are drained this many times per second.
+
+
 class WamControlBox(BoxLayout):
     def __init__(self, *, ui_controller = None, **kwargs):
         super(WamControlBox, self).__init__(**kwargs)
@@ -53,8 +57,8 @@ class WamControlBox(BoxLayout):
     def handle_btn_click(self, btn: Button):
         if self.ui_controller is None:
             self.ui_controller = self.parent.ui_controller
-        if self.ui_controller.game_manager.current_session:
-            # Session is running. Handle `stop_game`
+        if self.ui_controller.is_running:
+            # Sessions are running. Handle `stop_game`
             return self.stop_game(btn)
         else:
             # No running GameSession exists. Create new one.
@@ -141,6 +145,8 @@ class WamApp(App):
         self.icon = 'resources/icon.png'
         self.main_box = WamMainBox(ui_controller=self.ui_controller)
         self.write_event_log('두더지 잡기 배틀 GUI 실행됨.')
+        # Game thread publishes events, and UI applies them once per frame.
+        Clock.schedule_interval(self.ui_controller.drain_events, 1 / UI_FRAME_RATE)
         return self.main_box
 
     def write_event_log(self, text: str):
@@ -0,0 +1,52 @@
+"""
+Micro-benchmark of GameClientData parsing.
+Compares legacy eval() based parser with lookup-table based parser.
+
+sh > PYTHONPATH=. python test/client_data_benchmark.py
+"""
+from __future__ import annotations
+
+import timeit
+from typing import Final
+
+from server.game.game_data import GameClientData, DATA_SPLIT_CHAR
+
+FRAMES: Final[tuple[bytes, ...]] = (b'c;True;3', b'c;False', b'c;True;8', b'c;False;')
+MALFORMED_FRAMES: Final[tuple[bytes, ...]] = (b'Setting up.', b'c;Tru', b'c;True;9', b'\xff\xba')
+NUMBER: Final[int] = 100000
+
+
+def legacy_deserialize(data: str, player=None) -> GameClientData:
+    # Copy of GameClientData.deserialize before the lookup-table parser.
+    string_params: list[str] = data.split(DATA_SPLIT_CHAR)[1:]
+    is_hit = eval(string_params[0])
+    hit_index = int(string_params[1]) if len(string_params) == 2 and string_params[1].isdigit() else None
+    return GameClientData(is_hit, hit_index, player=player)
+
+
+def legacy_parse(frames: tuple[bytes, ...]):
+    for frame in frames:
+        legacy_deserialize(frame.decode('utf-8'))
+
+
+def table_parse(frames: tuple[bytes, ...]):
+    for frame in frames:
+        GameClientData.parse_frame(frame)
+
+
+def report(name: str, func, frames: tuple[bytes, ...]):
+    seconds = min(timeit.repeat(lambda: func(frames), number=NUMBER // len(frames), repeat=5))
+    per_frame = seconds / (NUMBER // len(frames) * len(frames)) * 1e9
+    print(f'{name:<24} : {per_frame:8.1f} ns/frame')
+    return per_frame
+
+
+def main():
+    legacy = report('legacy (eval)', legacy_parse, FRAMES)
+    table = report('lookup table', table_parse, FRAMES)
+    print(f'speedup : x{legacy / table:.1f}')
+    report('lookup table (rejects)', table_parse, MALFORMED_FRAMES)
+
+
+if __name__ == '__main__':
+    main()
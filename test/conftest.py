@@ -0,0 +1,10 @@
+"""
+pytest configuration. Run `python -m pytest test` from repository root.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Manual scripts which need pads attached. Run them directly.
+collect_ignore = ['client_test.py', 'serial_test.py']
@@ -0,0 +1,77 @@
+import struct
+
+import pytest
+
+from server.game.bridge import StateBridge
+from server.game.events import GameEventType
+from server.game.snapshot import GameSnapshot
+
+
+def snapshot(round=1, finished=False, names=('A', 'B')):
+    count = len(names)
+    return GameSnapshot(
+        round=round, timestamp=1.5, tickStart=2.5, names=names, hp=tuple(range(10, 10 + count)),
+        alive=bytes([1] * count), maps=bytes(range(9)) * count, mapSize=9, blocked=bytes(count),
+        finished=finished, finishCode=-2 if finished else None, winner=names[0] if finished else None
+    )
+
+
+@pytest.fixture
+def bridge():
+    bridge = StateBridge.create(sessionSlots=2)
+    yield bridge
+    bridge.close()
+
+
+def sequence_of(bridge, slot):
+    return struct.unpack_from('<I', bridge.shm.buf, bridge.slotsOffset + slot * bridge.slotSize)[0]
+
+
+def test_snapshot_round_trip(bridge):
+    written = snapshot(3)
+    assert bridge.publish(written, 'session')
+    assert bridge.read(0) == written
+    assert sequence_of(bridge, 0) == 2     # even : not being written.
+
+
+def test_finished_session_frees_its_slot(bridge):
+    bridge.publish(snapshot(), 'first')
+    assert bridge.publish(snapshot(finished=True), 'first')
+    assert bridge.publish(snapshot(), 'second')
+    assert bridge.read(0).finished      # slot freed last is reused last, so result of first is kept.
+    assert bridge.publish(snapshot(), 'third')
+    assert bridge.read(0) == bridge.read(1) == snapshot()
+
+
+def test_running_sessions_are_never_evicted(bridge):
+    assert bridge.publish(snapshot(1), 'first')
+    assert bridge.publish(snapshot(1), 'second')
+    assert not bridge.publish(snapshot(7), 'third')
+    assert [bridge.read(slot).round for slot in range(2)] == [1, 1]
+    bridge.publish(snapshot(2, finished=True), 'second')
+    bridge.drain()
+    assert bridge.publish(snapshot(8), 'third')
+    assert bridge.read(1).round == 8
+
+
+def test_drain_reports_screen_result_and_logs(bridge):
+    bridge.push_log('hello')
+    bridge.publish(snapshot(1), 'session')
+    events = bridge.drain()
+    assert [event.type for event in events] == [GameEventType.LOG, GameEventType.SCREEN]
+    assert events[0].payload == 'hello'
+    assert bridge.drain() == []
+    bridge.publish(snapshot(2, finished=True), 'session')
+    event, = bridge.drain()
+    assert event.type is GameEventType.RESULT and event.payload.winner == 'A'
+
+
+def test_log_ring_overflow_is_counted():
+    bridge = StateBridge.create(ringSize=4)
+    try:
+        for i in range(10):
+            bridge.push_log(str(i))
+        assert [event.payload for event in bridge.drain()] == ['6', '7', '8', '9']
+        assert bridge.lostEvents == 6
+    finally:
+        bridge.close()
@@ -0,0 +1,67 @@
+import pytest
+
+from server.game.capture import (
+    DIRECTION_RX, DIRECTION_TX, SLOT_SIZE, CapturedChunk, SerialCapture, read_capture, _SLOTS_OFFSET
+)
+from server.game.capture_analysis import analyze, reconstruct_frames
+from server.game.game_data import GameClientData, GameProtocolData, WireProtocol
+
+MS = 1000000
+
+
+def chunk(sequence, ms, direction, data, port='pad0'):
+    return CapturedChunk(sequence, ms * MS, direction, port, data)
+
+
+def test_capture_round_trip(tmp_path):
+    path = str(tmp_path / 'capture.wamc')
+    capture = SerialCapture(path, size=1024 * 1024)
+    pad0, pad1 = capture.register('pad0'), capture.register('pad1')
+    assert capture.register('pad0') == pad0
+    long = bytes(range(256)) * 2    # split over several slots.
+    capture.record(DIRECTION_TX, pad0, b's;0;1;2;3;4;5;6;7;0\n')
+    capture.record(DIRECTION_RX, pad1, long)
+    capture.record(DIRECTION_RX, pad0, b'c;True;3\r\n')
+    capture.close()
+    chunks = read_capture(path)
+    assert [(c.direction, c.port, c.data) for c in chunks] == [
+        (DIRECTION_TX, 'pad0', b's;0;1;2;3;4;5;6;7;0\n'),
+        (DIRECTION_RX, 'pad1', long),
+        (DIRECTION_RX, 'pad0', b'c;True;3\r\n'),
+    ]
+
+
+def test_wrapped_capture_skips_cut_frame(tmp_path):
+    path = str(tmp_path / 'capture.wamc')
+    capture = SerialCapture(path, size=_SLOTS_OFFSET + 4 * SLOT_SIZE)
+    port = capture.register('pad0')
+    for i in range(6):
+        capture.record(DIRECTION_RX, port, b'c;tr')
+        capture.record(DIRECTION_RX, port, f'ue;{i}\n'.encode('ascii'))
+    capture.close()
+    chunks = read_capture(path)
+    assert len(chunks) == 4 and chunks[0].sequence > 1
+    assert [frame.data for frame in reconstruct_frames(chunks)] == [b'c;true;5']
+
+
+def test_analyze_counts_frames_and_latency():
+    binary = GameClientData(True, 4, sequence=1).serialize_binary()
+    chunks = [
+        chunk(1, 0, DIRECTION_TX, GameProtocolData(WireProtocol.BINARY).serialize().encode('ascii') + b'\n'),
+        chunk(2, 5, DIRECTION_RX, b'p;1\r\nSetting up.\r\n'),
+        chunk(3, 10, DIRECTION_TX, b'\xf3\x81\x80\x80\x80\x80\n'),
+        chunk(4, 14, DIRECTION_RX, b'c;Tr'),
+        chunk(5, 15, DIRECTION_RX, b'ue;3\r\n'),
+        chunk(6, 25, DIRECTION_RX, binary + b'\n'),
+        chunk(7, 40, DIRECTION_RX, b'c;Fa\x00lse\r\n'),     # stray byte.
+        chunk(8, 41, DIRECTION_RX, b'c;\x01', port='pad1'),
+    ]
+    report = analyze(chunks)['pad0']
+    assert (report.rxFrames, report.txFrames) == (5, 2)
+    assert (report.clientFrames, report.protocolFrames, report.otherFrames) == (2, 1, 1)
+    assert (report.corruptFrames, report.recoverableFrames, report.strayBytes) == (1, 1, 1)
+    assert report.rxBytes == sum(len(c.data) for c in chunks if c.port == 'pad0' and c.direction == DIRECTION_RX)
+    assert report.intervals == pytest.approx((0.010,))
+    assert report.responses == pytest.approx((0.005,))
+    assert 'pad0' in report.describe()
+    assert analyze(chunks)['pad1'].rxFrames == 0
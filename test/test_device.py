@@ -0,0 +1,189 @@
+import logging
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+from serial.tools.list_ports_common import ListPortInfo
+
+from server.game import device as device_module
+from server.game.device import PadRegistry, SerialDevice, SerialHub, WhackAMoleClient
+
+pty = pytest.importorskip('pty')
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='needs posix pseudo terminals')
+
+
+class PtyDevice(SerialDevice):
+    """
+    Device on the slave side of a pseudo terminal. The test writes pad frames into the master side.
+    """
+
+    def __init__(self):
+        self.master, slave = pty.openpty()
+        super().__init__('PtyDevice', os.ttyname(slave))
+        os.close(slave)
+
+    @classmethod
+    def search(cls):
+        return []
+
+    @classmethod
+    def search_for(cls, port=None):
+        raise NotImplementedError
+
+
+@pytest.fixture
+def device():
+    device = PtyDevice()
+    yield device
+    device.disconnect()
+    os.close(device.master)
+
+
+def read_frames(device, count, timeout=2.0):
+    frames = []
+    deadline = time.monotonic() + timeout
+    while len(frames) < count and time.monotonic() < deadline:
+        frames += device.read_frames()
+    return frames
+
+
+def test_framer_joins_partial_frames(device):
+    os.write(device.master, b'c;Tr')
+    assert read_frames(device, 1, timeout=0.05) == []     # no line terminator yet.
+    os.write(device.master, b'ue;3\r\nc;fal')
+    assert read_frames(device, 1) == [b'c;True;3']
+    os.write(device.master, b'se\n\n')
+    assert read_frames(device, 2) == [b'c;false', b'']
+
+
+def test_framer_keeps_binary_bytes(device):
+    frame = bytes((0xE3, 0x81, 0x80, 0x0D | 0x80))
+    os.write(device.master, frame + b'\n' + b'a\rb\r\n')
+    assert read_frames(device, 2) == [frame, b'a\rb']
+    assert device.read_line() is None
+
+
+@pytest.fixture
+def hub():
+    hub = SerialHub('TestHub')
+    yield hub
+    hub.stop()
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+def test_hub_publishes_frames(hub):
+    device = PtyDevice()
+    device.start_reader(hub)
+    os.write(device.master, b'WAM;1\r\nWAM;')
+    assert device.receive_line(timeout=2.0) == 'WAM;1'
+    os.write(device.master, b'2\n')
+    assert device.receive_line(timeout=2.0) == 'WAM;2'
+    device.stop_reader()
+    assert len(hub) == 0
+    device.disconnect()
+    os.close(device.master)
+
+
+def test_hub_detaches_hung_up_device(hub):
+    device = PtyDevice()
+    device.start_reader(hub)
+    os.close(device.master)
+    assert wait_for(lambda: device._hub is None)
+    assert len(hub) == 0 and not device.isReading
+    device.disconnect()
+
+
+def test_hub_survives_concurrent_attach_and_detach(hub):
+    devices = [PtyDevice() for _ in range(4)]
+    errors = []
+
+    def churn(device):
+        try:
+            for _ in range(50):
+                device.start_reader(hub)
+                os.write(device.master, b'x\n')
+                device.stop_reader()
+        except Exception as e:  # noqa
+            errors.append(e)
+
+    threads = [threading.Thread(target=churn, args=(device,)) for device in devices]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert hub.isRunning and len(hub) == 0
+    device = devices[0]
+    device.start_reader(hub)
+    os.write(device.master, b'last\n')
+    assert wait_for(lambda: device.receive_line(timeout=0) == 'last')
+    for device in devices:
+        device.stop_reader()
+        device.disconnect()
+        os.close(device.master)
+
+
+def pty_port(serialNumber):
+    master, slave = pty.openpty()
+    port = ListPortInfo(os.ttyname(slave), skip_link_detection=True)
+    port.vid, port.pid, port.serial_number = 0x2341, 0x0043, serialNumber
+    return master, slave, port
+
+
+def test_search_revalidates_registry(tmp_path, monkeypatch, caplog):
+    pad = pty_port('PAD')       # known pad, still answers.
+    moved = pty_port('MOVED')   # known pad whose port now belongs to another device.
+    fresh = pty_port('FRESH')   # unknown pad.
+    registry = PadRegistry(str(tmp_path / 'pads.json'))
+    for _, _, port in (pad, moved):
+        registry.add(port)
+    registry.pads['2341:0043:GONE'] = {'description': 'unplugged pad', 'last_device': '/dev/null'}
+    monkeypatch.setattr(device_module, 'comports', lambda include_links=False: [pad[2], moved[2], fresh[2]])
+    monkeypatch.setattr(WhackAMoleClient, 'KNOWN_PROBE_TIMEOUT', 0.1)
+    monkeypatch.setattr(WhackAMoleClient, 'PROBE_TIMEOUT', 0.3)
+    # Pads keep sending client data. Ports are flushed when opened, so the prefix is written repeatedly.
+    stop = threading.Event()
+
+    def stream():
+        while not stop.wait(0.01):
+            os.write(pad[0], b'c;0\n')
+            os.write(fresh[0], b'c;0\n')
+
+    streamer = threading.Thread(target=stream, daemon=True)
+    streamer.start()
+    try:
+        with caplog.at_level(logging.DEBUG, logger='wam.device'):
+            clients = WhackAMoleClient.search(registry)
+    finally:
+        stop.set()
+        streamer.join()
+    try:
+        assert [client.port for client in clients] == [pad[2].device, fresh[2].device]
+        assert pad[2] in registry and fresh[2] in registry
+        assert moved[2] not in registry
+        assert '2341:0043:GONE' not in registry.pads
+        assert set(PadRegistry.load(registry.path).pads) == set(registry.pads)
+        # Each probe is logged as one record, so parallel probes do not interleave.
+        probes = [record.getMessage() for record in caplog.records if record.levelno == logging.DEBUG]
+        assert sorted(message.splitlines()[0] for message in probes) == sorted(
+            f'Found Serial Port : {port.name} ({port.device})' for port in (pad[2], moved[2], fresh[2])
+        )
+        assert 'Finish wrapping 2 clients.' in caplog.text
+    finally:
+        for client in clients:
+            client.disconnect()
+            WhackAMoleClient.registeredClients.discard(client)
+        for master, slave, _ in (pad, moved, fresh):
+            os.close(master)
+            os.close(slave)
@@ -0,0 +1,71 @@
+from collections import namedtuple
+
+import pytest
+
+from server.game.effects import EffectOp, EffectTable, EffectTarget, StatusApplication
+from server.game.state import GameState
+from server.game.status import STATUS_BLOCK
+
+Item = namedtuple('Item', 'name value effects')
+
+BLANK = Item('BLANK', 0, ())
+HEAL = Item('HEAL', 1, (EffectOp(EffectTarget.SELF, hpDelta=20),))
+ATTACK = Item('ATTACK', 2, (EffectOp(EffectTarget.OPPONENT, hpDelta=-10),))
+BLOCK = Item('BLOCK', 3, (EffectOp(EffectTarget.OPPONENT, status=STATUS_BLOCK, duration=3),))
+SPECIAL = Item('SPECIAL', 5, ())
+ITEMS = (BLANK, HEAL, ATTACK, BLOCK, SPECIAL)
+
+
+@pytest.fixture
+def table():
+    return EffectTable.compile(ITEMS, 0, 100, hasCustomHandler=lambda item: item is SPECIAL)
+
+
+def new_state(hp=(100, 100)):
+    state = GameState(len(hp), 100)
+    for slot, value in enumerate(hp):
+        state.add_player(f'P{slot}')
+        state.hp[slot] = value
+    return state
+
+
+def test_compile(table):
+    assert len(table.selfDelta) == SPECIAL.value + 1
+    assert table.selfDelta[HEAL.value] == 20 and table.opponentDelta[ATTACK.value] == -10
+    assert table.statusOps[BLOCK.value] == BLOCK.effects
+    assert list(table.hasHandler) == [0, 0, 0, 0, 0, 1]
+
+
+def test_hits_are_resolved_together(table):
+    state = new_state((95, 50))
+    result = table.apply_round(state, [0, 1], [ATTACK.value, HEAL.value])
+    # hp is clamped once, after every delta of the round is summed.
+    assert list(state.hp) == [95, 60]
+    assert result.deaths == [] and result.statuses == [] and result.handlers == []
+
+
+def test_heal_is_clamped(table):
+    state = new_state((90, 100))
+    table.apply_round(state, [0, 1], [HEAL.value, BLANK.value])
+    assert list(state.hp) == [100, 100]
+
+
+def test_shield_blocks_damage_only(table):
+    state = new_state((50, 50))
+    table.apply_round(state, [0, 1], [ATTACK.value, ATTACK.value], shielded=bytearray((1, 0)))
+    assert list(state.hp) == [50, 40]
+    table.apply_round(state, [0, 1], [HEAL.value, BLANK.value], shielded=bytearray((1, 0)))
+    assert list(state.hp) == [70, 40]
+
+
+def test_deaths_in_hit_order(table):
+    state = new_state((5, 5))
+    result = table.apply_round(state, [1, 0], [ATTACK.value, ATTACK.value])
+    assert result.deaths == [0, 1]
+
+
+def test_statuses_and_handlers(table):
+    state = new_state()
+    result = table.apply_round(state, [0, 1], [BLOCK.value, SPECIAL.value])
+    assert result.statuses == [StatusApplication(1, 0, STATUS_BLOCK, 3, 0)]
+    assert result.handlers == [(1, SPECIAL.value)]
@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason='needs posix pseudo terminals')
+
+from server.game.emulator import PadBehavior, VirtualPad, run_load_test  # noqa: E402
+from server.game.game_data import (  # noqa: E402
+    GameClientData, GameProtocolData, GameRoundData, GameSeedData, GameServerData, GameServerDeltaData, WireProtocol
+)
+from server.game.map_generator import SharedMapGenerator  # noqa: E402
+
+
+@pytest.fixture
+def pad():
+    pad = VirtualPad(PadBehavior(reactionTime=0.0, jitter=0.0, hitRate=1.0), seed=0)
+    yield pad
+    pad.close()
+
+
+def written(pad):
+    """
+    Bytes the pad wrote, as read by the server end.
+    """
+    os.set_blocking(pad._slave, False)
+    try:
+        return os.read(pad._slave, 4096)
+    except BlockingIOError:
+        return b''
+
+
+def line(text):
+    return text.encode('ascii') + b'\n'
+
+
+def test_negotiation_answer(pad):
+    assert pad.receive(line(GameProtocolData(WireProtocol.BINARY).serialize()), 0.0) is None
+    assert pad.protocol is WireProtocol.BINARY
+    assert written(pad) == b'p;1\r\n'
+
+
+def test_text_pad_stays_silent():
+    pad = VirtualPad(PadBehavior(protocol=WireProtocol.TEXT))
+    try:
+        pad.receive(line(GameProtocolData(WireProtocol.SEEDED).serialize()), 0.0)
+        assert pad.protocol is WireProtocol.TEXT
+    finally:
+        pad.close()
+
+
+def test_binary_map_is_answered_with_its_sequence(pad):
+    pad.protocol = WireProtocol.BINARY
+    mapData = [0, 1, 2, 4, 5, 0, 1, 2, 4]
+    answerAt = pad.receive(GameServerData(mapData, sequence=5).serialize_binary() + b'\n', 1.0)
+    assert answerAt == 1.0 and pad.mapData == mapData
+    pad.answer(pad.token)
+    answer = GameClientData.parse_frame(written(pad).rstrip(b'\n'))
+    assert answer.sequence == 5 and answer.isHit and mapData[answer.hitIndex] not in (0, 3)
+
+
+def test_delta_on_another_base_is_ignored(pad):
+    mapData = [0] * 9
+    pad.receive(GameServerData(mapData, sequence=1).serialize_binary() + b'\n', 0.0)
+    changed = [1] + [0] * 8
+    pad.receive(GameServerDeltaData.between(mapData, changed, 3, 2).serialize_binary() + b'\n', 0.0)
+    assert pad.mapData == mapData and pad.sequence == 1
+    pad.receive(GameServerDeltaData.between(mapData, changed, 2, 1).serialize_binary() + b'\n', 0.0)
+    assert pad.mapData == changed and pad.sequence == 2
+
+
+def test_seeded_rounds(pad):
+    items, weights = (0, 1, 2, 4, 5), (50, 15, 5, 20, 10)
+    pad.receive(line(GameSeedData(7, list(zip(items, weights))).serialize()), 0.0)
+    pad.receive(GameRoundData(130).serialize_binary() + b'\n', 0.0)
+    assert pad.mapData == SharedMapGenerator(items, weights, 7).map_for_round(130)
+    assert pad.sequence == 130 % 128
+
+
+def test_frames_split_across_reads(pad):
+    frame = GameServerData([1] * 9, sequence=9).serialize_binary() + b'\n'
+    assert pad.receive(frame[:3], 0.0) is None
+    assert pad.receive(frame[3:], 0.0) is not None
+    assert pad.maps == 1
+
+
+def test_unknown_frames_are_counted(pad):
+    pad.receive(b'x;1\n\xff\xff\n', 0.0)
+    assert pad.malformed == 2 and pad.maps == 0
+
+
+def test_load_test_plays_rounds():
+    report = run_load_test(4, PadBehavior(reactionTime=0.01, jitter=0.005), duration=0.5, tickRate=20, seed=0)
+    summary = report.summary()
+    assert summary['rounds'] > 0 and summary['answers'] > 0
+    assert summary['malformed'] == 0
+    assert all(stats.protocol is WireProtocol.SEEDED for stats in report.padStats)
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+
+from server.game.bridge import StateBridge
+from server.game.engine import EngineCommand, EngineCommandType, EngineProcess, handle_command
+
+
+class RecordingManager:
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    def __init__(self):
+        self.calls = []
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, command):
+        self.sent.append(command)
+
+
+@pytest.mark.parametrize('commandType, method, args', [
+    (EngineCommandType.START, 'start_sessions', (5.0,)),
+    (EngineCommandType.START_SHARDED, 'start_sharded_sessions', (2, 5.0)),
+    (EngineCommandType.SHUTDOWN, 'shutdown_sessions', ()),
+    (EngineCommandType.START_TOURNAMENT, 'start_tournament', (1, 5.0)),
+    (EngineCommandType.START_REPLAY, 'start_replay', ('recordings/a.wamr', True)),
+    (EngineCommandType.USE_TEST_CLIENTS, 'use_test_clients', (2,)),
+])
+def test_commands_reach_game_manager(commandType, method, args):
+    manager = RecordingManager()
+    handle_command(manager, EngineCommand(commandType, args))
+    assert manager.calls == [(method, args)]
+
+
+def test_replay_in_split_mode_is_sent_to_engine():
+    bridge = StateBridge.create()
+    try:
+        engine = EngineProcess(logging.getLogger('test.engine'), bridge)
+        engine._conn = RecordingConnection()
+        engine.start_replay('recordings/a.wamr')
+        assert engine._conn.sent == [EngineCommand(EngineCommandType.START_REPLAY, ('recordings/a.wamr', True))]
+        assert engine.is_running        # until engine handles the command.
+        bridge.set_handled_commands(1)
+        assert not engine.is_running
+    finally:
+        bridge.close()
@@ -0,0 +1,68 @@
+import threading
+
+from server.game.events import EventQueue, GameEventType
+
+
+def test_events_keep_published_order():
+    events = EventQueue()
+    events.publish(GameEventType.LOG, 'first', source=1)
+    events.publish(GameEventType.LOG, 'second', source=2)
+    assert [event.payload for event in events.drain()] == ['first', 'second']
+    assert len(events) == 0 and events.drain() == []
+
+
+def test_screens_are_coalesced_per_source():
+    events = EventQueue()
+    for number in range(5):
+        events.publish(GameEventType.SCREEN, number, source='a')
+    events.publish(GameEventType.SCREEN, 0, source='b')
+    events.publish(GameEventType.LOG, 'log', source='a')
+    drained = events.drain()
+    assert [(event.type, event.payload, event.source) for event in drained] == [
+        (GameEventType.LOG, 'log', 'a'),
+        (GameEventType.SCREEN, 4, 'a'),
+        (GameEventType.SCREEN, 0, 'b'),
+    ]
+
+
+def test_result_replaces_last_screen():
+    events = EventQueue()
+    events.publish(GameEventType.SCREEN, 'screen', source='a')
+    events.publish(GameEventType.RESULT, 'result', source='a')
+    assert [event.payload for event in events.drain()] == ['result']
+
+
+def test_oldest_events_are_dropped():
+    events = EventQueue(maxSize=3)
+    for i in range(5):
+        events.publish(GameEventType.LOG, i)
+    assert events.dropped == 2
+    assert [event.payload for event in events.drain()] == [2, 3, 4]
+
+
+def test_concurrent_publishers():
+    events = EventQueue(maxSize=100000)
+    drained = []
+    done = threading.Event()
+
+    def publish(source):
+        for i in range(1000):
+            events.publish(GameEventType.LOG, i, source=source)
+
+    def drain():
+        while not done.is_set():
+            drained.extend(events.drain())
+        drained.extend(events.drain())
+
+    reader = threading.Thread(target=drain)
+    reader.start()
+    writers = [threading.Thread(target=publish, args=(source,)) for source in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    done.set()
+    reader.join()
+    assert len(drained) == 4000
+    for source in range(4):
+        assert [event.payload for event in drained if event.source == source] == list(range(1000))
@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from server.game.game_data import (
+    BinaryFrameError, CLIENT_FRAME_TABLE, CLIENT_SCHEMA, GameClientData, GameRoundData, GameServerData, GameServerDeltaData, MalformedFrameError,
+    MAP_SIZE, SEQUENCE_MOD
+)
+
+
+def random_map(rng):
+    return [rng.randrange(8) for _ in range(MAP_SIZE)]
+
+
+@pytest.mark.parametrize('hitIndex', [None, *range(MAP_SIZE)])
+@pytest.mark.parametrize('sequence', [0, 1, SEQUENCE_MOD - 1])
+def test_client_binary_round_trip(hitIndex, sequence):
+    frame = GameClientData(hitIndex is not None, hitIndex, sequence=sequence).serialize_binary()
+    assert len(frame) == GameClientData.binaryLength
+    data = GameClientData.parse_frame(frame)
+    assert (data.isHit, data.hitIndex, data.sequence) == (hitIndex is not None, hitIndex, sequence)
+
+
+def test_server_binary_round_trip():
+    rng = random.Random(4)
+    for sequence in range(SEQUENCE_MOD + 2):
+        mapData = random_map(rng)
+        frame = GameServerData(mapData, sequence=sequence).serialize_binary()
+        assert len(frame) == GameServerData.binaryLength
+        data = GameServerData.deserialize_binary(frame)
+        assert data.mapData == mapData
+        assert data.sequence == sequence % SEQUENCE_MOD
+
+
+def test_round_binary_round_trip():
+    for roundNumber in (0, 1, 127, 128, GameRoundData.ROUND_MOD - 1):
+        data = GameRoundData.deserialize_binary(GameRoundData(roundNumber).serialize_binary())
+        assert data.roundNumber == roundNumber
+        assert data.sequence == roundNumber % SEQUENCE_MOD
+
+
+def test_binary_frames_never_contain_line_separator():
+    rng = random.Random(0)
+    frames = [GameServerData(random_map(rng), sequence=s).serialize_binary() for s in range(SEQUENCE_MOD)]
+    frames += [GameClientData(True, i, sequence=i).serialize_binary() for i in range(MAP_SIZE)]
+    assert all(b'\n' not in frame and b'\r' not in frame for frame in frames)
+    assert all(byte & 0x80 for frame in frames for byte in frame)
+
+
+@pytest.mark.parametrize('frame', [
+    b'\xe3\x80',                    # too short.
+    b'\xe3\x80\xff\xff',            # hit mask wider than the map.
+    b'\xe3\x80\x01\x80',            # payload byte without binary flag.
+])
+def test_invalid_binary_client_frames(frame):
+    assert GameClientData.parse_frame(frame) is None
+    with pytest.raises(BinaryFrameError):
+        GameClientData.deserialize_binary(frame)
+
+
+def test_delta_between_and_apply():
+    rng = random.Random(5)
+    for _ in range(100):
+        baseMap, mapData = random_map(rng), random_map(rng)
+        delta = GameServerDeltaData.between(baseMap, mapData, 3, 2)
+        assert delta.apply(baseMap) == mapData
+        assert len(delta.changes) == sum(old != new for old, new in zip(baseMap, mapData))
+
+
+@pytest.mark.parametrize('changes', [[], [(0, 7)], [(i, i % 8) for i in range(MAP_SIZE)]])
+def test_delta_round_trip(changes):
+    delta = GameServerDeltaData(changes, SEQUENCE_MOD - 1, SEQUENCE_MOD - 2)
+    for data in (
+            GameServerDeltaData.deserialize(delta.serialize()),
+            GameServerDeltaData.deserialize_binary(delta.serialize_binary())
+    ):
+        assert (data.changes, data.sequence, data.baseSequence) == (changes, delta.sequence, delta.baseSequence)
+
+
+@pytest.mark.parametrize('data', ['d;1;0;9', 'd;1;0;123', 'd;x;0', 's;1;0'])
+def test_invalid_delta_text(data):
+    with pytest.raises(MalformedFrameError):
+        GameServerDeltaData.deserialize(data)
+
+
+def test_invalid_delta_binary():
+    frame = GameServerDeltaData([], 1, 0).serialize_binary() + bytes((0x80 | (MAP_SIZE << 3),))
+    with pytest.raises(BinaryFrameError):
+        GameServerDeltaData.deserialize_binary(frame)
+
+
+@pytest.mark.parametrize('frame, expected', [
+    (b'c;True;3', (True, 3)),
+    (b'c;true;0', (True, 0)),
+    (b'c;False', (False, None)),
+    (b'c;false;', (False, None)),
+    (b'c;True;8', (True, 8)),
+])
+def test_client_frame_table(frame, expected):
+    assert CLIENT_FRAME_TABLE[frame] == expected
+    data = GameClientData.parse_frame(frame)
+    assert (data.isHit, data.hitIndex, data.sequence) == (*expected, None)
+    assert GameClientData.deserialize(frame.decode('ascii') + '\r\n').hitIndex == expected[1]
+
+
+def test_client_frame_table_matches_schema():
+    for frame, parsed in CLIENT_FRAME_TABLE.items():
+        assert CLIENT_SCHEMA.parse(frame) == parsed
+
+
+@pytest.mark.parametrize('frame', [b'c;True;9', b'c;yes', b'c;True;3;4', b's;True;3', b'', b'c;1'])
+def test_invalid_client_text_frames(frame):
+    assert GameClientData.parse_frame(frame) is None
+    with pytest.raises(MalformedFrameError):
+        GameClientData.deserialize(frame.decode('ascii'))
+
+
+def test_client_text_round_trip():
+    for hitIndex in (None, *range(MAP_SIZE)):
+        text = GameClientData(hitIndex is not None, hitIndex).serialize()
+        assert GameClientData.deserialize(text).hitIndex == hitIndex
@@ -0,0 +1,89 @@
+from collections import Counter
+
+import pytest
+
+from server.game import map_generator
+from server.game.game_data import GameSeedData
+from server.game.map_generator import BATCH_SIZE, MAP_SIZE, MapGenerator, SharedMapGenerator, derive_seed, mix32
+
+ITEMS = (0, 1, 2, 4, 5)
+WEIGHTS = (50, 15, 5, 20, 10)
+USE_NUMPY = [False, pytest.param(True, marks=pytest.mark.skipif(map_generator.np is None, reason='numpy not installed'))]
+
+
+@pytest.mark.parametrize('useNumpy', USE_NUMPY)
+@pytest.mark.parametrize('weights', [WEIGHTS, (0.5, 0.15, 0.05, 0.2, 0.1)])
+def test_same_seed_same_maps(useNumpy, weights):
+    first = MapGenerator(ITEMS, weights, seed=7, useNumpy=useNumpy).next_maps(BATCH_SIZE + 3)
+    second = MapGenerator(ITEMS, weights, seed=7, useNumpy=useNumpy).next_maps(BATCH_SIZE + 3)
+    assert first == second
+    assert all(len(tiles) == MAP_SIZE and set(tiles) <= set(ITEMS) for tiles in first)
+
+
+@pytest.mark.parametrize('useNumpy', USE_NUMPY)
+def test_maps_follow_weights(useNumpy):
+    generator = MapGenerator(ITEMS, WEIGHTS, seed=1, useNumpy=useNumpy)
+    counts = Counter(tile for tiles in generator.next_maps(2000) for tile in tiles)
+    total = sum(counts.values())
+    for item, weight in zip(ITEMS, WEIGHTS):
+        assert counts[item] / total == pytest.approx(weight / sum(WEIGHTS), abs=0.02)
+
+
+def test_zero_weight_item_never_drawn():
+    generator = MapGenerator(ITEMS, (50, 0, 5, 20, 10), seed=3, useNumpy=False)
+    assert all(1 not in tiles for tiles in generator.next_maps(500))
+
+
+def test_maps_are_not_shared():
+    generator = MapGenerator(ITEMS, WEIGHTS, seed=2)
+    first = generator.next_map()
+    copy = list(first)
+    generator.next_maps(BATCH_SIZE)
+    assert first == copy
+
+
+def test_invalid_weights():
+    with pytest.raises(ValueError):
+        MapGenerator(ITEMS, WEIGHTS[:-1])
+
+
+# Test vector of client/map_generator.h. Values were checked against the firmware code compiled with g++.
+SEED = 1200724404
+VECTORS = {
+    0: [1, 5, 0, 0, 0, 0, 4, 0, 0],
+    1: [4, 5, 1, 5, 0, 5, 5, 0, 5],
+    2: [0, 4, 1, 4, 1, 0, 5, 4, 1],
+    127: [0, 0, 0, 0, 0, 0, 0, 5, 0],
+    16383: [0, 0, 5, 0, 2, 0, 1, 0, 0],
+    0xFFFFFFFF: [5, 5, 2, 4, 2, 5, 4, 4, 0],
+}
+
+
+def test_mix32():
+    assert mix32(0) == 0
+    assert mix32(1) == 1364076727
+    assert mix32(0xDEADBEEF) == 233162409
+
+
+def test_derive_seed():
+    assert derive_seed(12345, 0) == SEED
+    assert derive_seed(12345, 1) != SEED
+
+
+@pytest.mark.parametrize('roundNumber', VECTORS)
+def test_shared_map_generator_vector(roundNumber):
+    generator = SharedMapGenerator(ITEMS, WEIGHTS, SEED)
+    assert generator.map_for_round(roundNumber) == VECTORS[roundNumber]
+
+
+def test_seed_data_round_trip():
+    data = GameSeedData.deserialize(GameSeedData(SEED, list(zip(ITEMS, WEIGHTS))).serialize())
+    generator = SharedMapGenerator([item for item, _ in data.itemWeights], [w for _, w in data.itemWeights], data.seed)
+    assert generator.map_for_round(1) == VECTORS[1]
+
+
+def test_shared_map_generator_needs_integer_weights():
+    with pytest.raises(ValueError):
+        SharedMapGenerator(ITEMS, (0.5, 0.15, 0.05, 0.2, 0.1), SEED)
+    with pytest.raises(ValueError):
+        SharedMapGenerator(ITEMS, (0, 0, 0, 0, 0), SEED)
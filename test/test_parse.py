@@ -0,0 +1,63 @@
+import pytest
+
+from server.game.parse import FrameParseException, FrameSchema, FrameSchemaSet, SchemaCompileException
+
+
+@pytest.mark.parametrize('frame, expected', [
+    (b'c;True;3', (True, 3)),
+    (b'c;false', (False, None)),
+    (b'c;false;', (False, None)),
+    (b'c;True;-2', (True, -2)),
+])
+def test_optional_field(frame, expected):
+    assert FrameSchema.compile('c;bool;int?').parse(frame) == expected
+
+
+@pytest.mark.parametrize('frame', [b'c', b'c;maybe', b'c;True;x', b'c;True;1;2', b'd;True;1'])
+def test_frame_does_not_fit(frame):
+    schema = FrameSchema.compile('c;bool;int?')
+    assert schema.parse(frame) is None
+    with pytest.raises(FrameParseException):
+        schema.parse_expr(frame.decode('ascii'))
+
+
+def test_field_types():
+    schema = FrameSchema.compile('str;bool;bool;int;float;list')
+    assert schema.prefix is None
+    assert schema.parse(b'"text";false;true;10;10.3;["1",2]') == ('text', False, True, 10, 10.3, ['1', 2])
+    assert schema.parse(b'text;false;true;10;.5;[]') == ('text', False, True, 10, 0.5, [])
+    assert schema.parse(b'text;false;true;10;1.;[') is None
+
+
+def test_rest_field_keeps_separators():
+    schema = FrameSchema.compile('c;str*')
+    assert schema.parse(b'c;Client Received > s;0;1') == ('Client Received > s;0;1',)
+
+
+def test_literal_field():
+    schema = FrameSchema.compile('p;v;int')
+    assert schema.parse(b'p;v;2') == ('v', 2)
+    assert schema.parse(b'p;w;2') is None
+
+
+@pytest.mark.parametrize('source', ['c;int?;bool', 'c;str*;int', 'c;;int'])
+def test_invalid_schema(source):
+    with pytest.raises(SchemaCompileException):
+        FrameSchema.compile(source)
+
+
+def test_schema_set_matches_by_prefix():
+    schemas = FrameSchemaSet.compile((
+        ('client', 'c;bool;int?'),
+        ('client_echo', 'c;str*'),
+        ('parse_test', 'str;bool;bool;int;float;list'),
+    ))
+    names = {
+        b'c;True;3': 'client',
+        b'c;Client Received > s;0;1': 'client_echo',
+        b'"text";false;true;10;10.3;["1",2]': 'parse_test',
+    }
+    for frame, name in names.items():
+        schema, _ = schemas.match(frame)
+        assert schema.name == name
+    assert schemas.match(b'Setting up.') is None
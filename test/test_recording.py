@@ -0,0 +1,86 @@
+import logging
+
+import pytest
+
+from server.game.device import FakeWAMClient
+from server.game.game import SessionHost
+from server.game.game_object import GameFinishCode
+from server.game.recording import (
+    INPUT_HIT, INPUT_RESPONDED, RecordedFinish, RecordedInput, Recording, RecordingHeader, SessionRecorder
+)
+from server.game.replay import replay
+
+
+def write_recording(path, finishCode, rounds=()):
+    recorder = SessionRecorder(str(path))
+    recorder.write_header(RecordingHeader(7, 10.0, 0, 30, 9, 0.0, ('A', 'B'), (0, 0)))
+    for roundNumber, (maps, inputs, hpDeltas) in enumerate(rounds, 1):
+        recorder.write_round(roundNumber, 0, maps, inputs, hpDeltas)
+    recorder.write_finish(RecordedFinish(finishCode, -1, -1, len(rounds), 1.5))
+    recorder.close()
+    return str(path)
+
+
+@pytest.mark.parametrize('finishCode', [None, *GameFinishCode])
+def test_finish_code_round_trip(tmp_path, finishCode):
+    code = None if finishCode is None else int(finishCode)
+    with Recording(write_recording(tmp_path / 'finish.wamr', code)) as recording:
+        assert recording.finish.finishCode == code
+        assert recording.finish.rounds == 0
+
+
+def test_round_round_trip(tmp_path):
+    maps = bytes(range(9)) + bytes(9)
+    inputs = (RecordedInput(INPUT_RESPONDED | INPUT_HIT, 4, 3, 4, 123), RecordedInput(0, None, None, 0, 0))
+    path = write_recording(tmp_path / 'round.wamr', 0, [(maps, inputs, (0, -3))])
+    with Recording(path) as recording:
+        assert len(recording) == 1
+        recorded = recording[0]
+        assert recorded.maps == maps
+        assert recorded.inputs == inputs
+        assert recorded.hpDeltas == (0, -3)
+        assert recording.header.names == ('A', 'B')
+
+
+def test_truncated_tail_is_ignored(tmp_path):
+    path = write_recording(tmp_path / 'cut.wamr', 0, [(bytes(18), (RecordedInput(0, None, None, 0, 0),) * 2, (0, 0))])
+    with open(path, 'r+b') as file:
+        file.truncate(file.seek(0, 2) - 3)
+    with Recording(path) as recording:
+        assert len(recording) == 1
+        assert recording.finish is None
+
+
+def test_empty_recording_is_rejected(tmp_path):
+    path = tmp_path / 'empty.wamr'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        Recording(str(path))
+
+
+def test_replay_invalid_player_count_finish(tmp_path):
+    path = write_recording(tmp_path / 'invalid.wamr', int(GameFinishCode.INVALID_PLAYER_COUNT))
+    report = replay(path)
+    assert report.finishCode == GameFinishCode.INVALID_PLAYER_COUNT
+    assert report.matches
+
+
+def test_shutdown_session_is_recorded_and_replayed(tmp_path):
+    clients = [FakeWAMClient(f'Player{i}', f'FakeSerialPort/{i}', i) for i in range(2)]
+    host = SessionHost(logging.getLogger('test.recording'), clients, recordDirectory=str(tmp_path))
+    session = host.create_session(tickRate=200)
+    session.run()
+    while session.state.round < 5 and session.is_running:
+        session.join(0.01)
+    host.shutdown_sessions()
+    session.join(5)
+    assert not session.is_running
+    assert session.gameInfo.finish_code is GameFinishCode.SHUTDOWN_COMMAND
+
+    path, = tmp_path.glob('*.wamr')
+    with Recording(str(path)) as recording:
+        assert recording.finish.finishCode == GameFinishCode.SHUTDOWN_COMMAND
+        assert len(recording) > 0
+    report = replay(str(path))
+    assert report.finishCode == GameFinishCode.SHUTDOWN_COMMAND
+    assert report.matches
@@ -0,0 +1,148 @@
+import collections
+import logging
+import time
+
+import pytest
+
+from server.game.device import FakeWAMClient
+from server.game.game import SessionHost
+from server.game.game_data import GameClientData, WireProtocol
+from server.game.scheduler import TickScheduler
+
+
+class QueuedClient(FakeWAMClient):
+    """
+    Client whose frames are queued by the test, as if published by a background reader.
+    """
+
+    def __init__(self, name, port, clientNumber):
+        super().__init__(name, port, clientNumber)
+        self.protocol = WireProtocol.BINARY
+        self.inbox = collections.deque()
+
+    def receive_frame(self, timeout=None):
+        return self.inbox.popleft() if self.inbox else None
+
+    def receive_frames(self):
+        frames = list(self.inbox)
+        self.inbox.clear()
+        return frames
+
+
+@pytest.fixture
+def player():
+    clients = [QueuedClient(f'Player{i}', f'QueuedPort/{i}', i) for i in range(2)]
+    host = SessionHost(logging.getLogger('test.input'), clients, recordDirectory=None)
+    session = host.create_session(clients)
+    session.getPlayers()
+    return session.players[0]
+
+
+def hit(index, sequence):
+    return GameClientData(True, index, sequence=sequence).serialize_binary()
+
+
+def test_answer_to_current_map(player):
+    player.sendData()
+    player.client.inbox.append(hit(2, player.sequence))
+    data = player.receiveData(0)
+    assert (data.hitIndex, data.sequence) == (2, player.sequence)
+    assert player.acknowledged
+
+
+def test_backlog_is_drained_to_newest_frame(player):
+    player.sendData()
+    player.client.inbox.extend([hit(1, player.sequence), hit(2, player.sequence), hit(5, player.sequence)])
+    assert player.receiveData(0).hitIndex == 5
+    assert not player.client.inbox
+    assert player.receiveData(0) is None
+
+
+def test_frames_older_than_previous_map_are_dropped(player):
+    player.sendData()
+    stale = player.sequence
+    player.sendData()
+    player.sendData()
+    player.client.inbox.append(hit(3, stale))
+    assert player.receiveData(0) is None
+
+
+def test_late_binary_answer_is_resolved_against_previous_map(player):
+    player.sendData()
+    answered = player.sequence
+    player.client.inbox.append(hit(4, answered))
+    player.sendData()
+    data = player.receiveData(0)
+    assert data.sequence == answered == player.previousSequence
+    assert player.itemAt(4, data.sequence) == player.state.item_at(player.slot, 4, True)
+
+
+def test_late_text_answer_is_dropped(player):
+    player.client.protocol = WireProtocol.TEXT
+    player.sendData()
+    player.client.inbox.append(b'c;True;3')
+    player.sendData()
+    assert player.receiveData(0) is None
+    player.client.inbox.append(b'c;True;6')
+    assert player.receiveData(0).hitIndex == 6
+
+
+def test_malformed_frames_are_skipped(player):
+    player.sendData()
+    player.client.inbox.extend([b'Setting up.', b'\xff\xba', b'c;True;7'])
+    assert player.receiveData(0).hitIndex == 7
+
+
+def test_scheduler_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TickScheduler(0)
+
+
+def test_scheduler_deadlines_do_not_drift():
+    scheduler = TickScheduler(200)
+    scheduler.start()
+    first = scheduler.deadline
+    for _ in range(5):
+        scheduler.wait()
+    assert scheduler.deadline == pytest.approx(first + 5 * scheduler.period)
+    assert scheduler.stats.ticks == 5
+
+
+def test_scheduler_skips_missed_ticks():
+    scheduler = TickScheduler(100, margin=0.002)
+    scheduler.start()
+    assert scheduler.inputDeadline == pytest.approx(scheduler.deadline - 0.002)
+    first = scheduler.deadline
+    time.sleep(scheduler.period * 3.5)
+    scheduler.wait()
+    assert scheduler.stats.overruns == 1
+    assert scheduler.deadline > time.perf_counter()
+    periods = (scheduler.deadline - first) / scheduler.period
+    assert periods == pytest.approx(round(periods))     # still on the original grid.
+
+
+class SilentClient(QueuedClient):
+    """
+    Client which blocks until timeout when nothing is queued, like a background reader of a silent pad.
+    """
+
+    def receive_frame(self, timeout=None):
+        if not self.inbox:
+            time.sleep(max(0.0, timeout or 0.0))
+        return super().receive_frame(timeout)
+
+
+def test_inputs_share_one_deadline():
+    clients = [SilentClient(f'Player{i}', f'SilentPort/{i}', i) for i in range(3)]
+    host = SessionHost(logging.getLogger('test.input'), clients, recordDirectory=None)
+    session = host.create_session(clients)
+    session.getPlayers()
+    for player in session.players:
+        player.sendData()
+    clients[1].inbox.append(hit(6, session.players[1].sequence))
+    begin = time.monotonic()
+    data = session.waitForClientData(timeout=0.2)
+    # Silent players do not wait one timeout each.
+    assert time.monotonic() - begin < 0.35
+    assert [d.isHit for d in data] == [False, True, False]
+    assert data[1].hitIndex == 6
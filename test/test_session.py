@@ -0,0 +1,65 @@
+import logging
+
+import serial
+
+from server.game.device import FakeWAMClient
+from server.game.events import GameEventType
+from server.game.game import SessionHost
+from server.game.game_object import GameFinishCode
+from server.game.recording import Recording
+
+
+class UnpluggedClient(FakeWAMClient):
+    """
+    Client whose port fails after a few writes.
+    """
+
+    def __init__(self, name, port, clientNumber, writes):
+        super().__init__(name, port, clientNumber)
+        self.writes = writes
+        self.readerStopped = False
+
+    def write_frame(self, frame):
+        self.write_line(frame)
+
+    def write_line(self, line, encoding='utf-8'):
+        self.writes -= 1
+        if self.writes < 0:
+            raise serial.SerialException('write failed: [Errno 5] Input/output error')
+        super().write_line(line, encoding)
+
+    def stop_reader(self):
+        self.readerStopped = True
+
+
+def test_pad_disconnect_ends_session_cleanly(tmp_path):
+    clients = [UnpluggedClient('Player0', 'Port/0', 0, writes=5), UnpluggedClient('Player1', 'Port/1', 1, writes=1000)]
+    host = SessionHost(logging.getLogger('test.session'), clients, recordDirectory=str(tmp_path))
+    finished = []
+    host.finishListeners.append(finished.append)
+    session = host.create_session(tickRate=200)
+    session.run()
+    session.join(5)
+
+    assert not session.is_running
+    assert session.gameInfo.finish_code is GameFinishCode.PAD_DISCONNECTED
+    assert finished == [session]
+    assert not host.sessions
+    assert all(client.readerStopped for client in clients)
+    path, = tmp_path.glob('*.wamr')
+    with Recording(str(path)) as recording:
+        assert recording.finish.finishCode == GameFinishCode.PAD_DISCONNECTED
+
+
+def test_session_with_one_player_is_invalid():
+    clients = [FakeWAMClient('Player0', 'Port/0', 0)]
+    host = SessionHost(logging.getLogger('test.session'), clients, recordDirectory=None)
+    session = host.create_session(clients, tickRate=200)
+    session.run()
+    session.join(5)
+    assert not session.is_running
+    assert session.gameInfo.finish_code is GameFinishCode.INVALID_PLAYER_COUNT
+    assert not host.sessions
+    # Consumers see the session finish, even though it never started.
+    result, = [event for event in host.events.drain() if event.type is GameEventType.RESULT]
+    assert result.payload.finished and result.payload.finishCode == GameFinishCode.INVALID_PLAYER_COUNT
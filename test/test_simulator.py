@@ -0,0 +1,37 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from server.game.effects import EffectOp, EffectTable, EffectTarget
+from server.game.game_object import PanelItem, MAX_HP, MIN_HP, item_effects
+from server.game.simulator import BatchSimulator, SimulationConfig
+
+
+def test_item_effects_defaults_are_live_effects():
+    for item, effects in item_effects().items():
+        assert item.effects == effects
+
+
+def test_compile_uses_given_effects():
+    effects = {PanelItem.ATTACK_OPPONENT: (EffectOp(EffectTarget.OPPONENT, hpDelta=-7),)}
+    table = EffectTable.compile(PanelItem.__members__.values(), MIN_HP, MAX_HP, effects=effects)
+    assert table.opponentDelta[PanelItem.ATTACK_OPPONENT.value] == -7
+    # Items missing from the mapping keep their own effects.
+    assert table.selfDelta[PanelItem.HEAL_SELF.value] == PanelItem.HEAL_SELF.effects[0].hpDelta
+
+
+@pytest.mark.parametrize('attackDamage, healAmount', [(20, 10), (15, 15), (0, 5)])
+def test_simulator_tunes_parameters(attackDamage, healAmount):
+    simulator = BatchSimulator(SimulationConfig(attackDamage=attackDamage, healAmount=healAmount), seed=0)
+    assert simulator._selfDelta[PanelItem.HEAL_SELF.value] == healAmount
+    assert simulator._opponentDelta[PanelItem.HEAL_OPPONENT.value] == healAmount
+    assert simulator._opponentDelta[PanelItem.ATTACK_OPPONENT.value] == -attackDamage
+    assert simulator._selfDelta[PanelItem.ATTACK_OPPONENT.value] == 0
+
+
+def test_simulator_is_deterministic():
+    config = SimulationConfig(maxRounds=500)
+    first = BatchSimulator(config, seed=1).run(500)
+    second = BatchSimulator(config, seed=1).run(500)
+    assert np.array_equal(first.winners, second.winners)
+    assert np.array_equal(first.rounds, second.rounds)
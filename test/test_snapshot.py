@@ -0,0 +1,64 @@
+import logging
+import time
+
+import pytest
+
+from server.game.device import FakeWAMClient
+from server.game.game import SessionHost
+from server.game.game_object import GameFinishCode
+from server.game.snapshot import GameSnapshot
+
+
+class SnapshotHost(SessionHost):
+    """
+    Host which keeps every snapshot published by its sessions.
+    """
+
+    def __init__(self, clients):
+        super().__init__(logging.getLogger('test.snapshot'), clients, recordDirectory=None)
+        self.screens = []
+        self.results = []
+
+    def update_screen(self, snapshot=None, session=None):
+        self.screens.append(snapshot)
+        super().update_screen(snapshot, session)
+
+    def show_result(self, snapshot=None, session=None):
+        self.results.append(snapshot)
+        super().show_result(snapshot, session)
+
+
+@pytest.fixture(scope='module')
+def host():
+    clients = [FakeWAMClient(f'Player{i}', f'Port/{i}', i) for i in range(2)]
+    host = SnapshotHost(clients)
+    session = host.create_session(clients, tickRate=1000)
+    session.run()
+    deadline = time.monotonic() + 5
+    while len(host.screens) < 50 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    host.shutdown_sessions()
+    session.join(5)
+    assert not session.is_running
+    return host
+
+
+def test_snapshot_every_round(host):
+    rounds = [snapshot.round for snapshot in host.screens]
+    assert rounds == sorted(rounds) and len(set(rounds)) == len(rounds)
+    assert all(isinstance(snapshot, GameSnapshot) for snapshot in host.screens)
+
+
+def test_snapshots_are_immutable(host):
+    snapshot = host.screens[0]
+    assert isinstance(snapshot.hp, tuple) and isinstance(snapshot.maps, bytes) and isinstance(snapshot.alive, bytes)
+    assert len(snapshot.map_of(1)) == snapshot.mapSize
+    # Later rounds did not change snapshots taken before them.
+    assert any(earlier.hp != later.hp for earlier, later in zip(host.screens, host.screens[1:]))
+
+
+def test_result_snapshot(host):
+    result, = host.results
+    assert result.finished and result.finishCode == GameFinishCode.SHUTDOWN_COMMAND
+    assert result.round >= host.screens[-1].round
+    assert result.winner is None and result.names == host.screens[0].names
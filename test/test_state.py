@@ -0,0 +1,55 @@
+import struct
+
+import pytest
+
+from server.game.state import GameState, NO_SLOT
+
+
+@pytest.fixture
+def state():
+    state = GameState(3, 100)
+    for name in ('A', 'B'):
+        state.add_player(name)
+    return state
+
+
+def test_add_player(state):
+    assert state.count == 2 and state.slots == {'A': 0, 'B': 1}
+    assert list(state.hp[:2]) == [100, 100] and list(state.alive[:2]) == [1, 1]
+    assert list(state.opponents) == [1, 0, NO_SLOT]
+    with pytest.raises(ValueError):
+        state.add_player('A')
+    state.add_player('C')
+    with pytest.raises(ValueError):
+        state.add_player('D')
+
+
+def test_maps_and_previous_maps(state):
+    state.set_map(1, range(9))
+    state.begin_round()
+    state.set_map(1, [7] * 9)
+    assert state.round == 1
+    assert bytes(state.map_of(1)) == bytes([7] * 9)
+    assert bytes(state.map_of(1, previous=True)) == bytes(range(9))
+    assert state.item_at(1, 4) == 7 and state.item_at(1, 4, previous=True) == 4
+    with pytest.raises(TypeError):
+        state.map_of(1)[0] = 1      # read-only view.
+
+
+def test_copy_is_independent(state):
+    copy = state.copy()
+    state.hp[0] = 1
+    state.set_map(0, [1] * 9)
+    state.add_player('C')
+    assert copy.hp[0] == 100 and bytes(copy.map_of(0)) == bytes(9) and copy.count == 2
+
+
+def test_to_bytes(state):
+    state.hp[1] = 42
+    state.set_map(0, [1] * 9)
+    data = state.to_bytes()
+    header = struct.calcsize('<IBB')
+    assert struct.unpack_from('<IBB', data) == (0, 2, 9)
+    assert struct.unpack_from('<2i', data, header) == (100, 42)
+    assert data[header + 8:header + 10] == b'\x01\x01'
+    assert data[header + 10:] == bytes([1] * 9 + [0] * 9)
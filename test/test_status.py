@@ -0,0 +1,59 @@
+import pytest
+
+from server.game.effects import StatusApplication
+from server.game.state import GameState
+from server.game.status import STATUS_BLOCK, STATUS_DAMAGE, STATUS_SHIELD, StatusEngine
+
+
+def test_status_lasts_for_duration():
+    statuses = StatusEngine(2)
+    statuses.apply(1, StatusApplication(1, 0, STATUS_BLOCK, 3))
+    for currentRound in (2, 3, 4):
+        assert statuses.expire(currentRound) == 0
+        assert statuses.blocked[1] == 1
+    assert statuses.expire(5) == 1
+    assert statuses.blocked[1] == 0 and len(statuses) == 0
+
+
+def test_overlapping_statuses_are_counted():
+    statuses = StatusEngine(2)
+    statuses.apply(1, StatusApplication(0, 1, STATUS_SHIELD, 1))
+    statuses.apply(1, StatusApplication(0, 1, STATUS_SHIELD, 3))
+    statuses.expire(3)
+    assert statuses.shielded[0] == 1
+    statuses.expire(5)
+    assert statuses.shielded[0] == 0
+
+
+def test_damage_over_time():
+    state = GameState(2, 100)
+    state.add_player('P0')
+    state.add_player('P1')
+    state.hp[1] = 12
+    statuses = StatusEngine(2)
+    statuses.apply(1, StatusApplication(1, 0, STATUS_DAMAGE, 2, magnitude=5))
+    statuses.apply(1, StatusApplication(1, 0, STATUS_DAMAGE, 1, magnitude=2))
+    assert statuses.apply_damage(state, 0) == []
+    assert state.hp[1] == 5
+    statuses.expire(3)
+    assert statuses.damage[1] == 5
+    assert statuses.apply_damage(state, 0) == []
+    assert statuses.apply_damage(state, 0) == [1]
+
+
+def test_shield_prevents_damage_over_time():
+    state = GameState(1, 100)
+    state.add_player('P0')
+    statuses = StatusEngine(1)
+    statuses.apply(1, StatusApplication(0, 0, STATUS_DAMAGE, 2, magnitude=5))
+    statuses.apply(1, StatusApplication(0, 0, STATUS_SHIELD, 2))
+    statuses.apply_damage(state, 0)
+    assert state.hp[0] == 100
+
+
+def test_invalid_statuses():
+    statuses = StatusEngine(1)
+    statuses.apply(1, StatusApplication(0, 0, STATUS_BLOCK, 0))
+    assert len(statuses) == 0
+    with pytest.raises(ValueError):
+        statuses.apply(1, StatusApplication(0, 0, 'freeze', 1))
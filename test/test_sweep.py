@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from server.game import simulator, sweep
+from server.game.game_object import item_effects
+from server.game.simulator import SimulationConfig
+from server.game.sweep import SweepCell, ResultCache
+
+
+def test_key_resolves_default_weights():
+    config = SimulationConfig()
+    written = config._replace(weights=config.itemWeights)
+    assert SweepCell(config, 0, 100).key == SweepCell(written, 0, 100).key
+
+
+def test_key_changes_with_effects(monkeypatch):
+    cell = SweepCell(SimulationConfig(), 0, 100)
+    key = cell.key
+    monkeypatch.setattr(
+        simulator, 'item_effects',
+        lambda attackDamage, healAmount: item_effects(attackDamage, healAmount, blockDuration=5)
+    )
+    assert cell.key != key
+
+
+def test_key_changes_with_engine_constants(monkeypatch):
+    cell = SweepCell(SimulationConfig(), 0, 100)
+    key = cell.key
+    monkeypatch.setattr(sweep, 'MIN_HP', sweep.MIN_HP + 1)
+    assert cell.key != key
+
+
+def test_cached_results_are_reused(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    config = SimulationConfig(maxRounds=200)
+    first = sweep.run_sweep([config], seeds=(0,), games=200, workers=1, cache=cache)
+    second = sweep.run_sweep([config], seeds=(0,), games=200, workers=1, cache=cache)
+    assert not first[0].cached and second[0].cached
+    assert first[0].summary == second[0].summary
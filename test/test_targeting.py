@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from server.game.state import GameState, NO_SLOT
+from server.game.targeting import TargetIndex, TargetMode, assign_teams
+
+
+def new_state(count, teams=None):
+    state = GameState(count, 100)
+    for slot in range(count):
+        state.add_player(f'P{slot}', team=teams[slot] if teams else 0)
+    return state
+
+
+def kill(index, slot):
+    index.state.alive[slot] = 0
+    index.on_death(slot)
+
+
+def expected_targets(state, mode):
+    """
+    Targets computed from scratch, with the rules of each mode.
+    """
+    alive = [slot for slot in range(state.count) if state.alive[slot]]
+    targets = [NO_SLOT] * state.count
+    if mode is TargetMode.NEXT_ALIVE:
+        for i, slot in enumerate(alive):
+            target = alive[(i + 1) % len(alive)]
+            targets[slot] = target if target != slot else NO_SLOT
+    elif mode is TargetMode.TEAM:
+        order = sorted({state.teams[slot] for slot in alive})
+        for i, team in enumerate(order):
+            if len(order) < 2:
+                break
+            members = [slot for slot in alive if state.teams[slot] == team]
+            enemies = [slot for slot in alive if state.teams[slot] == order[(i + 1) % len(order)]]
+            for j, slot in enumerate(members):
+                targets[slot] = enemies[j % len(enemies)]
+    else:
+        ranked = sorted(alive, key=lambda slot: (state.hp[slot], slot))
+        for slot in alive:
+            others = [other for other in ranked if other != slot]
+            targets[slot] = others[0] if others else NO_SLOT
+    return targets
+
+
+@pytest.mark.parametrize('mode', list(TargetMode))
+@pytest.mark.parametrize('seed', range(5))
+def test_targets_match_brute_force(mode, seed):
+    rng = random.Random(seed)
+    count = rng.randint(2, 9)
+    state = new_state(count, assign_teams(count, rng.randint(2, 3)))
+    index = TargetIndex(state, mode)
+    order = list(range(count))
+    rng.shuffle(order)
+    for slot in order:
+        for other in range(count):
+            state.hp[other] = rng.randrange(1, 100)
+        index.update_round()
+        assert list(index.targets()) == expected_targets(state, mode)
+        if index.isOver:
+            break
+        kill(index, slot)
+        assert list(index.targets()) == expected_targets(state, mode)
+        assert state.opponents[slot] == NO_SLOT
+
+
+def test_next_alive_is_over_with_one_player():
+    index = TargetIndex(new_state(3))
+    kill(index, 1)
+    assert list(index.targets()) == [2, NO_SLOT, 0]
+    kill(index, 0)
+    assert index.isOver and list(index.targets()) == [NO_SLOT] * 3
+
+
+def test_team_is_over_with_one_team():
+    index = TargetIndex(new_state(4, [0, 1, 0, 1]), TargetMode.TEAM)
+    assert list(index.targets()) == [1, 0, 3, 2]
+    kill(index, 1)
+    assert list(index.targets()) == [3, NO_SLOT, 3, 0]
+    kill(index, 3)
+    assert index.isOver and index.aliveTeams == 1
@@ -0,0 +1,125 @@
+import itertools
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from server.game.device import FakeWAMClient
+from server.game.game_object import GameFinishCode
+from server.game.tournament import Tournament, TournamentFormat, round_robin_rounds
+
+
+class StubHost:
+    """
+    Host whose sessions are finished by the test.
+    """
+
+    def __init__(self, count):
+        self.logger = logging.getLogger('test.tournament')
+        self.clients = [FakeWAMClient(f'P{i}', f'Port/{i}', i) for i in range(count)]
+        self.sessions = {}
+        self._ids = itertools.count(1)
+
+    def idle_clients(self):
+        busy = self.busy_clients()
+        return [client for client in self.clients if id(client) not in busy]
+
+    def busy_clients(self):
+        return {id(client) for session in self.sessions.values() for client in session.clients}
+
+    def create_session(self, clients, tickRate):
+        session = SimpleNamespace(sessionId=next(self._ids), clients=clients, run=lambda: None)
+        self.sessions[session.sessionId] = session
+        return session
+
+    def write_event_log(self, text=None, session=None):
+        pass
+
+    def finish(self, tournament, session, winner=None, code=GameFinishCode.PLAYER_WIN):
+        del self.sessions[session.sessionId]
+        names = [client.name for client in session.clients]
+        player = lambda name: None if name is None else SimpleNamespace(name=name)
+        loser = None if winner is None else next(name for name in names if name != winner)
+        session.gameInfo = SimpleNamespace(finish_code=code, winner=player(winner), loser=player(loser))
+        session.state = SimpleNamespace(hp=[10, 0], slots={name: slot for slot, name in enumerate(names)}, round=5)
+        tournament.on_session_finished(session)
+
+
+def running(tournament):
+    return sorted((match.session for match in tournament.running.values()), key=lambda session: session.sessionId)
+
+
+@pytest.mark.parametrize('count', [2, 3, 4, 5, 8])
+def test_round_robin_meets_everyone_once(count):
+    players = [f'P{i}' for i in range(count)]
+    rounds = round_robin_rounds(players)
+    pairs = [frozenset(pair) for matches in rounds for pair in matches]
+    assert len(pairs) == len(set(pairs)) == count * (count - 1) // 2
+    for matches in rounds:
+        seated = [name for pair in matches for name in pair]
+        assert len(seated) == len(set(seated))
+
+
+def test_round_robin_runs_independent_matches_at_once():
+    host = StubHost(4)
+    tournament = Tournament(host, TournamentFormat.ROUND_ROBIN)
+    assert tournament.start() == 2
+    while tournament.running:
+        for session in running(tournament):
+            host.finish(tournament, session, winner=session.clients[0].name)
+    assert not tournament.isRunning
+    assert sum(standing.wins for standing in tournament.standings.values()) == 6
+    assert tournament.champion == tournament.ranking()[0].name
+
+
+def test_bracket_with_byes_produces_champion():
+    host = StubHost(5)
+    tournament = Tournament(host, TournamentFormat.SINGLE_ELIMINATION)
+    tournament.start()
+    while tournament.running:
+        for session in running(tournament):
+            host.finish(tournament, session, winner=min(client.name for client in session.clients))
+    assert tournament.champion == 'P0'
+    assert [name for name, standing in tournament.standings.items() if not standing.eliminated] == ['P0']
+
+
+def test_match_without_winner_is_replayed_then_no_contest():
+    host = StubHost(2)
+    tournament = Tournament(host, TournamentFormat.SINGLE_ELIMINATION)
+    tournament.start()
+    session, = running(tournament)
+    host.finish(tournament, session, code=GameFinishCode.PAD_DISCONNECTED)
+    assert tournament.isRunning
+    session, = running(tournament)
+    host.finish(tournament, session, code=GameFinishCode.PAD_DISCONNECTED)
+    assert not tournament.isRunning
+    assert tournament.champion is None
+    for standing in tournament.standings.values():
+        assert (standing.wins, standing.losses, standing.noContests) == (0, 0, 1)
+        assert standing.eliminated
+
+
+def test_no_contest_gives_bye_to_next_match():
+    host = StubHost(4)
+    tournament = Tournament(host, TournamentFormat.SINGLE_ELIMINATION)
+    tournament.start()
+    first, second = running(tournament)
+    for _ in range(2):
+        host.finish(tournament, first, code=GameFinishCode.PAD_DISCONNECTED)
+        first = next((session for session in running(tournament) if session.clients == first.clients), None)
+    winner = second.clients[1].name
+    host.finish(tournament, second, winner=winner)
+    assert not tournament.isRunning
+    assert tournament.champion == winner
+
+
+def test_cancel_finishes_when_last_match_ends():
+    host = StubHost(4)
+    tournament = Tournament(host, TournamentFormat.ROUND_ROBIN)
+    tournament.start()
+    first, second = running(tournament)
+    tournament.cancel()
+    host.finish(tournament, first, winner=first.clients[0].name)
+    assert tournament.isRunning
+    host.finish(tournament, second, winner=second.clients[0].name)
+    assert tournament.join(1)
@@ -0,0 +1,67 @@
+import logging
+import os
+import sys
+import time
+
+import pytest
+
+from server.game.device import FakeWAMClient, WhackAMoleClient
+from server.game.events import EventQueue, GameEventType
+from server.game.snapshot import GameSnapshot
+from server.game.workers import ClientSpec, ShardPool
+
+
+def test_client_spec_round_trip():
+    spec = ClientSpec.from_client(FakeWAMClient('Player0', 'Port/0', 0))
+    assert spec.fake
+    client = spec.build()
+    assert isinstance(client, FakeWAMClient) and (client.name, client.port, client.clientNumber) == spec[:3]
+
+
+def test_sessions_run_on_worker_processes(tmp_path):
+    clients = [FakeWAMClient(f'Player{i}', f'Port/{i}', i) for i in range(4)]
+    events = EventQueue()
+    pool = ShardPool(events, logging.getLogger('test.workers'), workers=2, recordDirectory=str(tmp_path))
+    pool.start([clients[:2], clients[2:]], tickRate=200)
+    drained = []
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        drained += events.drain()
+        if {event.source[0] for event in drained if event.type is GameEventType.SCREEN} == {0, 1}:
+            break
+        time.sleep(0.02)
+    pool.shutdown()
+    pool.join(30)
+    assert not pool.isRunning
+    drained += events.drain()
+
+    screens = [event for event in drained if event.type is GameEventType.SCREEN]
+    results = [event for event in drained if event.type is GameEventType.RESULT]
+    assert {event.source[0] for event in screens} == {0, 1}
+    assert sorted(event.source[0] for event in results) == [0, 1]
+    assert all(isinstance(event.payload, GameSnapshot) and event.payload.finished for event in results)
+    assert len(list(tmp_path.glob('*.wamr'))) == 2
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason='needs posix pseudo terminals')
+def test_unplugged_pad_does_not_stop_reconnects(caplog):
+    ptys = [os.openpty() for _ in range(2)]
+    clients = [WhackAMoleClient(f'Player{i}', os.ttyname(slave), i) for i, (_, slave) in enumerate(ptys)]
+    try:
+        for client in clients:
+            client.disconnect()
+        # First pad is unplugged while its port is held by a worker.
+        for fd in ptys[0]:
+            os.close(fd)
+        pool = ShardPool(EventQueue(), logging.getLogger('test.workers'), workers=1)
+        pool.clients = clients
+        with caplog.at_level(logging.WARNING, logger='test.workers'):
+            pool._receive_loop()
+        assert not clients[0].isConnected and clients[1].isConnected
+        assert 'Cannot reopen Player0' in caplog.text
+    finally:
+        for client in clients:
+            client.disconnect()
+            WhackAMoleClient.registeredClients.discard(client)
+        for fd in ptys[1]:
+            os.close(fd)